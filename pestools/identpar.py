@@ -3,30 +3,55 @@ __author__ = 'aleaf'
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from pyemu import errvar
 from pest import Pest
 import plots
 
 class IdentPar:
 
-    def __init__(self, jco, par_info_file=None):
-        """Computes parameter identifiability for a PEST jco file,
-        using the errvar class in pyemu (https://github.com/jtwhite79/pyemu)
+    def __init__(self, jco, par_info_file=None, pest=None):
+        """Computes parameter identifiability for a PEST jco file from the
+        singular value decomposition of the weighted jco (Q^(1/2)*J)
+
+        pest : Pest, optional
+            Pest session to share loaded artifacts with, including the SVD
+            of the weighted jco.  A new session is created for jco if not
+            provided.
         """
 
-        self._Pest = Pest(jco, par_info_file=par_info_file)
+        if pest is None:
+            pest = Pest(jco, par_info_file=par_info_file)
+        self._Pest = pest
         self.parinfo = self._Pest.parinfo
 
-        self.la = errvar(jco)
         self.parinfo = None
         if par_info_file is not None:
             self.parinfo = pd.read_csv(par_info_file, index_col='Name')
         self.ident_df = None
+        self._qhalfx = None
+        self._cumulative = None
+
+    @property
+    def qhalfx(self):
+        """Weighted jco from the Pest session
+        """
+        return self._Pest.qhalfx
+
+    @property
+    def cumulative(self):
+        """Cumulative sums of the squared right singular vectors, one row
+        per parameter.  Column i is the identifiability of each parameter
+        using i + 1 singular values.
+        """
+        qhalfx = self.qhalfx
+        if self._cumulative is None or qhalfx is not self._qhalfx:
+            self._qhalfx = qhalfx
+            self._cumulative = np.cumsum(qhalfx.v.x**2, axis=1)
+        return self._cumulative
 
     def plot_singular_spectrum(self):
         """see http://nbviewer.ipython.org/github/jtwhite79/pyemu/blob/master/examples/error_variance_example.ipynb
         """
-        s = self.la.qhalfx.s
+        s = self.qhalfx.s
 
         figure = plt.figure(figsize=(10, 5))
         ax = plt.subplot(111)
@@ -38,11 +63,41 @@ class IdentPar:
         ax.set_ylim(0,10)
         plt.show()
 
+    def identifiability(self, nsingular=None):
+        """Parameter identifiabilities for one or more numbers of singular
+        values.  The SVD is only computed once, so sweeping nsingular only
+        indexes the cumulative sums.
+
+        Parameters
+        ----------
+        nsingular: int or list of int, optional
+            number(s) of singular values to include.  Default is every
+            number of singular values.
+
+        Returns
+        -------
+        Pandas DataFrame
+            identifiability of each parameter (rows) for each number of
+            singular values (columns)
+        """
+        cumulative = self.cumulative
+        if nsingular is None:
+            nsingular = range(1, cumulative.shape[1] + 1)
+        nsingular = np.atleast_1d(nsingular).astype(int)
+        if nsingular.min() < 1 or nsingular.max() > cumulative.shape[1]:
+            raise ValueError('IdentPar.identifiability(): nsingular must be '
+                             'between 1 and ' + str(cumulative.shape[1]))
+        return pd.DataFrame(cumulative[:, nsingular - 1],
+                            index=self.qhalfx.col_names, columns=nsingular)
+
     def get_identifiability_dataframe(self, nsingular):
 
-        self.ident_df = self.la.get_identifiability_dataframe(nsingular)
+        v = self.qhalfx.v
+        self.ident_df = pd.DataFrame(v.x[:, :nsingular]**2, index=v.row_names,
+                                     columns=v.col_names[:nsingular])
         if self.parinfo is not None:
-            self.ident_points = pd.DataFrame({'ident_sum': self.ident_df.sum(axis=1)}).join(self.parinfo)
+            ident_sum = self.identifiability(nsingular)[nsingular]
+            self.ident_points = pd.DataFrame({'ident_sum': ident_sum}).join(self.parinfo)
 
     def plot_bar(self, nsingular=None, nbars=20):
         """Computes a stacked bar chart showing the most identifiable parameters
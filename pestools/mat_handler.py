@@ -1,10 +1,20 @@
+import os
 import copy
-import struct
+import shutil
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 import numpy as np
 import pandas
 import scipy.linalg as la
+import scipy.sparse as sp
+import scipy.sparse.linalg as sla
 import pst_handler as phand
 
+#--number of Cholesky factors of blocks of a cov kept for condition_on()
+BLOCK_FACTOR_CACHE_SIZE = 4
+
 def concat(mats):
     """Concatenate matrix objects.  Tries either axis.
     Args:
@@ -61,21 +71,89 @@ def concat(mats):
 
 def get_common_elements(list1, list2):
     """find the common elements in two lists.  used to support auto align
-        might be faster with sets
     Args:
         list1 : a list of objects
         list2 : a list of objects
     Returns:
-        list of common objects shared by list1 and list2
+        list of common objects shared by list1 and list2, in list1 order
+    Raises:
+        None
+    """
+    set2 = set(list2)
+    return [item for item in list1 if item in set2]
+
+
+def get_ascii_dimensions(filename):
+    """read the dimensions from the header line of a pest-compatible ASCII
+        matrix/vector file without loading the matrix
+    Args:
+        filename : [str] name of the file to read
+    Returns:
+        nrow, ncol, icode : [int] number of rows, columns and the
+            pest-style info code
     Raises:
         None
     """
-    result = []
-    for item in list1:
-        if item in list2:
-            result.append(item)
-    return result
+    f = open(filename, 'r')
+    raw = f.readline().strip().split()
+    f.close()
+    return int(raw[0]), int(raw[1]), int(raw[2])
+
 
+def normal_matrix(jco, weights, block_size=10000, nthreads=None):
+    """build the weighted normal matrix J^T * Q * J, with Q = diag(weights**2),
+        without forming Q.  Zero-weight rows are skipped and the product is
+        accumulated over blocks of rows, which are spread over a pool of
+        threads (numpy and scipy release the GIL in the products)
+    Args:
+        jco : [matrix, numpy.ndarray or scipy.sparse matrix] the jacobian
+        weights : [numpy.ndarray] observation weights (not squared), in the
+            same order as the rows of jco
+        block_size : [int] number of rows per block
+        nthreads : [int] number of threads. None to use the cpu count
+    Returns:
+        numpy.ndarray : ncol x ncol normal matrix
+    Raises:
+        AssertionError if weights and jco rows don't agree
+    """
+    if isinstance(jco, matrix):
+        x = jco.x
+    else:
+        x = jco
+    if sp.issparse(x):
+        x = x.tocsr()
+    weights = np.asarray(weights, dtype=np.float64).flatten()
+    assert weights.shape[0] == x.shape[0], \
+        "normal_matrix(): len(weights) != jco rows: " + \
+        str(weights.shape[0]) + ' ' + str(x.shape[0])
+    nz_rows = np.nonzero(weights)[0]
+    blocks = [nz_rows[start:start + block_size]
+              for start in xrange(0, nz_rows.shape[0], block_size)]
+    if nthreads is None:
+        nthreads = multiprocessing.cpu_count()
+    nthreads = max(1, min(nthreads, len(blocks)))
+
+    def accumulate(thread_blocks):
+        normal = np.zeros((x.shape[1], x.shape[1]))
+        for rows in thread_blocks:
+            if sp.issparse(x):
+                wx = sp.diags(weights[rows], 0) * x[rows, :]
+                normal += wx.T.dot(wx).toarray()
+            else:
+                wx = x[rows, :] * weights[rows, np.newaxis]
+                normal += np.dot(wx.T, wx)
+        return normal
+
+    if nthreads == 1:
+        return accumulate(blocks)
+    pool = ThreadPool(nthreads)
+    try:
+        partials = pool.map(accumulate, [blocks[i::nthreads]
+                                         for i in xrange(nthreads)])
+    finally:
+        pool.close()
+        pool.join()
+    return np.sum(partials, axis=0)
 
 
 class matrix(object):
@@ -91,7 +169,7 @@ class matrix(object):
                  autoalign=True):
         """constructor for matrix objects
         Args:
-            x : numpy array for the matrix entries
+            x : numpy array or scipy.sparse matrix for the matrix entries
             row_names : list of matrix row names
             col_names : list of matrix column names
             isdigonal : bool to determine if the matrix is diagonal
@@ -103,15 +181,16 @@ class matrix(object):
             AssertionErrors is x.shape  len(row_names) and len(col_names)
                 don't agree
         """
-        self.col_names, self.row_names = [], []
-        [self.col_names.append(c.lower()) for c in col_names]
-        [self.row_names.append(r.lower()) for r in row_names]
+        self.__name_index = {0: None, 1: None}
+        self.col_names = [c.lower() for c in col_names]
+        self.row_names = [r.lower() for r in row_names]
         self.__x = None
         self.__u = None
         self.__s = None
         self.__v = None
         if x is not None:
-            x = np.atleast_2d(x)
+            if not sp.issparse(x):
+                x = np.atleast_2d(x)
             if isdiagonal and len(row_names) > 0:
                 assert len(row_names) == x.shape[0],\
                     'matrix.__init__(): diagonal shape[1] != len(row_names) ' +\
@@ -134,6 +213,13 @@ class matrix(object):
         self.char = np.uint8
         self.isdiagonal = bool(isdiagonal)
         self.autoalign = bool(autoalign)
+        #--optional persistent store for the SVD components
+        self.svd_cache = None
+        #--optional identity of the entries of x (e.g. the jco file and the
+        #--weights applied to it), used as the svd_cache key in place of
+        #--hashing the entries.  Cleared when x is changed in place
+        self.svd_cache_id = None
+        self.set_svd_mode()
 
         self.binary_header_dt = np.dtype([('itemp1', self.integer),
                                           ('itemp2', self.integer),
@@ -231,10 +317,8 @@ class matrix(object):
                                                   str(self.shape) + ' ' + \
                                                   str(other.shape)
                 if self.isdiagonal:
-                    elem_sub = -1.0 * other
-                    for j in xrange(self.shape[0]):
-                        elem_sub[j, j] += self.x[j]
-                    return matrix(x=elem_sub, row_names=self.row_names,
+                    return matrix(x=self.__diag_add(self.x, other, -1.0),
+                                  row_names=self.row_names,
                                   col_names=self.col_names)
                 else:
                     return matrix(x=self.x - other, row_names=self.row_names,
@@ -262,16 +346,12 @@ class matrix(object):
                                   row_names=first.row_names,
                                   col_names=first.col_names)
                 elif first.isdiagonal:
-                    elem_sub = -1.0 * second.newx
-                    for j in xrange(first.shape[0]):
-                        elem_sub[j, j] += first.x[j, 0]
-                    return matrix(x=elem_sub, row_names=first.row_names,
+                    return matrix(x=self.__diag_add(first.x, second.x, -1.0),
+                                  row_names=first.row_names,
                                   col_names=first.col_names)
                 elif second.isdiagonal:
-                    elem_sub = first.newx
-                    for j in xrange(second.shape[0]):
-                        elem_sub[j, j] -= second.x[j, 0]
-                    return matrix(x=elem_sub, row_names=first.row_names,
+                    return matrix(x=self.__diag_add(-second.x, first.x, 1.0),
+                                  row_names=first.row_names,
                                   col_names=first.col_names)
                 else:
                     return matrix(x=first.x - second.x,
@@ -289,17 +369,19 @@ class matrix(object):
         Raises:
             AssertionError if other is not aligned with self
             Exception is other is not in supported types
-            NotImplementedError for diagonal matrices
         """
         if np.isscalar(other):
-            return matrix(x=self.x + other)
+            return matrix(x=self.x + other, row_names=self.row_names,
+                          col_names=self.col_names,
+                          isdiagonal=self.isdiagonal)
         if isinstance(other, np.ndarray):
             assert self.shape == other.shape, \
                 "matrix.__add__(): shape mismatch: "+\
                 str(self.shape) + ' ' + str(other.shape)
             if self.isdiagonal:
-                raise NotImplementedError("matrix.__add__ not supported for" +
-                                          "diagonal self")
+                return matrix(x=self.__diag_add(self.x, other, 1.0),
+                              row_names=self.row_names,
+                              col_names=self.col_names)
             else:
                 return matrix(x=self.x + other, row_names=self.row_names,
                               col_names=self.col_names)
@@ -323,16 +405,12 @@ class matrix(object):
                               row_names=first.row_names,
                               col_names=first.col_names)
             elif first.isdiagonal:
-                ox = second.newx
-                for j in xrange(first.shape[0]):
-                    ox[j, j] += first.__x[j]
-                return matrix(x=ox, row_names=first.row_names,
+                return matrix(x=self.__diag_add(first.x, second.x, 1.0),
+                              row_names=first.row_names,
                               col_names=first.col_names)
             elif second.isdiagonal:
-                x = first.x
-                for j in xrange(second.shape[0]):
-                    x[j, j] += second.x[j]
-                return matrix(x=x, row_names=first.row_names,
+                return matrix(x=self.__diag_add(second.x, first.x, 1.0),
+                              row_names=first.row_names,
                               col_names=first.col_names)
             else:
                 return matrix(x=first.x + second.x, row_names=first.row_names,
@@ -354,13 +432,18 @@ class matrix(object):
             Exception is other is not in supported types
         """
         if np.isscalar(other):
-            return matrix(x=self.__x.copy() * other)
+            return matrix(x=self.__x * other, row_names=self.row_names,
+                          col_names=self.col_names,
+                          isdiagonal=self.isdiagonal)
         elif isinstance(other, np.ndarray):
             assert self.shape[1] == other.shape[0], \
                 "matrix.__mul__(): matrices are not aligned: "+\
                 str(self.shape) + ' ' + str(other.shape)
             if self.isdiagonal:
-                return matrix(x=np.dot(np.diag(self.__x).transpose(), other))
+                #--broadcast the diagonal down the rows of other
+                return matrix(x=self.__x * other)
+            elif self.issparse:
+                return matrix(x=self.__x.dot(other))
             else:
                 return matrix(x=np.dot(self.__x, other))
         elif isinstance(other, matrix):
@@ -393,18 +476,31 @@ class matrix(object):
                                    col_names=second.col_names)
                 elem_prod.isdiagonal = True
                 return elem_prod
+            elif first.isdiagonal and second.issparse:
+                return matrix(x=sp.diags(first.x[:, 0], 0) * second.x,
+                              row_names=first.row_names,
+                              col_names=second.col_names)
             elif first.isdiagonal:
-                ox = second.newx
-                for j in range(first.shape[0]):
-                    ox[j, :] *= first.x[j]
-                return matrix(x=ox, row_names=first.row_names,
+                #--scale the rows of second by broadcasting
+                return matrix(x=first.x * second.x, row_names=first.row_names,
+                              col_names=second.col_names)
+            elif second.isdiagonal and first.issparse:
+                return matrix(x=first.x * sp.diags(second.x[:, 0], 0),
+                              row_names=first.row_names,
                               col_names=second.col_names)
             elif second.isdiagonal:
-                x = first.newx
-                ox = second.x
-                for j in range(first.shape[1]):
-                    x[:, j] *= ox[j]
-                return matrix(x=x, row_names=first.row_names,
+                #--scale the columns of first by broadcasting
+                return matrix(x=first.x * second.x.transpose(),
+                              row_names=first.row_names,
+                              col_names=second.col_names)
+            elif first.issparse:
+                return matrix(first.x.dot(second.x),
+                              row_names=first.row_names,
+                              col_names=second.col_names)
+            elif second.issparse:
+                #--dense * sparse: let the sparse operand drive the product
+                return matrix(second.x.T.dot(first.x.T).T,
+                              row_names=first.row_names,
                               col_names=second.col_names)
             else:
                 return matrix(np.dot(first.x, second.x),
@@ -419,8 +515,154 @@ class matrix(object):
         raise NotImplementedError()
 
 
+    def __iadd__(self, other):
+        """in-place addition overload.  self.x is updated in place when other
+            is a scalar, an array or an aligned matrix of the same shape,
+            otherwise falls back to __add__
+        Args:
+            other : [scalar,numpy.ndarray,matrix object]
+        Returns:
+            matrix object
+        Raises:
+            see __add__
+        """
+        if self.__inplace_elementwise(other, np.add):
+            return self
+        return self.__add__(other)
+
+
+    def __isub__(self, other):
+        """in-place subtraction overload.  self.x is updated in place when
+            other is a scalar, an array or an aligned matrix of the same
+            shape, otherwise falls back to __sub__
+        Args:
+            other : [scalar,numpy.ndarray,matrix object]
+        Returns:
+            matrix object
+        Raises:
+            see __sub__
+        """
+        if self.__inplace_elementwise(other, np.subtract):
+            return self
+        return self.__sub__(other)
+
+
+    def __imul__(self, other):
+        """in-place multiplication overload.  self.x is updated in place
+            when other is a scalar or an aligned diagonal matrix (column
+            scaling), otherwise falls back to __mul__
+        Args:
+            other : [scalar,matrix object]
+        Returns:
+            matrix object
+        Raises:
+            see __mul__
+        """
+        if np.isscalar(other):
+            if self.issparse and self.__x.data.flags.writeable and \
+                    np.result_type(self.__x.dtype, other) == self.__x.dtype:
+                self.__x.data *= other
+                self.__x_changed()
+                return self
+            elif self.__inplace_elementwise(other, np.multiply):
+                return self
+        elif isinstance(other, matrix) and other.isdiagonal \
+                and self.shape[1] == other.shape[0] \
+                and self.__inplace_ok(other.x) \
+                and (self.mult_isaligned(other) or not self.autoalign
+                     or not other.autoalign):
+            if self.isdiagonal:
+                np.multiply(self.__x, other.x, out=self.__x)
+            else:
+                np.multiply(self.__x, other.x.transpose(), out=self.__x)
+            self.col_names = list(other.col_names)
+            self.__x_changed()
+            return self
+        return self.__mul__(other)
+
+
+    def __inplace_ok(self, other_x):
+        """private check that self.x is a writeable dense array that can hold
+            the result of an operation with other_x without changing dtype
+        """
+        return isinstance(self.__x, np.ndarray) \
+            and self.__x.flags.writeable \
+            and np.result_type(self.__x, other_x) == self.__x.dtype
+
+
+    def __inplace_elementwise(self, other, ufunc):
+        """private in-place kernel for element-wise operations
+        Args:
+            other : [scalar,numpy.ndarray,matrix object]
+            ufunc : numpy ufunc to apply, e.g. np.add
+        Returns:
+            bool : True if self.x was updated, False if the operation can't
+                be done in place
+        Raises:
+            None
+        """
+        if isinstance(other, matrix):
+            if other.issparse or self.shape != other.shape:
+                return False
+            if self.autoalign and other.autoalign \
+                    and not self.element_isaligned(other):
+                return False
+            if self.isdiagonal and not other.isdiagonal:
+                return False
+            other_x = other.x
+        elif np.isscalar(other):
+            other_x = other
+        elif isinstance(other, np.ndarray):
+            if self.isdiagonal or self.shape != other.shape:
+                return False
+            other_x = other
+        else:
+            return False
+        if not self.__inplace_ok(other_x):
+            return False
+        if isinstance(other, matrix) and other.isdiagonal \
+                and not self.isdiagonal:
+            idx = np.arange(other.shape[0])
+            self.__x[idx, idx] = ufunc(self.__x[idx, idx], other_x[:, 0])
+        else:
+            ufunc(self.__x, other_x, out=self.__x)
+        self.__x_changed()
+        return True
+
+
+    def __diag_add(self, diag, other, sign):
+        """private kernel for diag + sign * other, where diag is the column
+            vector of a diagonal matrix and other is a full matrix.
+            Only the result is allocated
+        """
+        if sp.issparse(other):
+            return sp.diags(diag[:, 0], 0) + sign * other
+        out = np.multiply(other, sign)
+        idx = np.arange(diag.shape[0])
+        out[idx, idx] += diag[:, 0]
+        return out
+
+
+    def __reset_svd(self):
+        """private method to drop SVD components
+        """
+        self.__u, self.__s, self.__v = None, None, None
+
+
+    def __x_changed(self):
+        """private method to drop the SVD components and the svd_cache_id
+            after the entries of self.x are changed in place
+        """
+        self.__reset_svd()
+        self.svd_cache_id = None
+
+
     def __set_svd(self):
-        """private method to set SVD components
+        """private method to set SVD components.  If self.svd_cache is set,
+            the components are loaded from the cache when available and
+            stored in it after they are computed.  The cache key is built
+            from self.svd_cache_id if it is set, otherwise from the entries
+            of self.x
         Args:
             None
         Returns:
@@ -428,21 +670,23 @@ class matrix(object):
         Raises:
             Exception is SVD process fails
         """
-        if self.isdiagonal:
-            x = np.diag(self.x.flatten())
+        key, cached = None, None
+        if self.svd_cache is not None:
+            settings = (self.isdiagonal, self.svd_mode, self.nsing,
+                        self.energy, self.oversample, self.n_iter, self.seed)
+            if self.svd_cache_id is not None:
+                key = self.svd_cache.id_key(self.svd_cache_id, self.shape,
+                                            self.row_names, self.col_names,
+                                            *settings)
+            else:
+                key = self.svd_cache.key(self.x, *settings)
+            cached = self.svd_cache.load(key)
+        if cached is not None:
+            u, s, v = cached
         else:
-            #--just a pointer to x
-            x = self.x
-        try:
-            u, s, v = la.svd(x, full_matrices=True)
-            v = v.transpose()
-        except:
-            try:
-                v, s, u = la.svd(x.transpose(), full_matrices=True)
-                u = u.transpose()
-            except:
-                raise Exception("matrix.__set_svd(): " +
-                                "unable to compute SVD of self.x")
+            u, s, v = self.__compute_svd()
+            if key is not None:
+                self.svd_cache.store(key, u, s, v)
         col_names = []
         [col_names.append("left_sing_vec_" + str(i + 1))
          for i in xrange(u.shape[1])]
@@ -456,11 +700,178 @@ class matrix(object):
                           autoalign=False)
         col_names = []
         [col_names.append("right_sing_vec_" + str(i + 1))
-         for i in xrange(v.shape[0])]
+         for i in xrange(v.shape[1])]
         self.__v = matrix(v, row_names=self.col_names, col_names=col_names,
                           autoalign=False)
 
 
+    def set_svd_mode(self, mode='full', nsing=None, energy=None,
+                     oversample=10, n_iter=4, seed=None):
+        """set how the SVD components are computed.  Resets any components
+            that have already been computed
+        Args:
+            mode : [str] 'full' for the complete decomposition (u is
+                nrow x nrow), 'economy' for the exact thin decomposition,
+                'lanczos' for the ARPACK iterative solver or 'randomized'
+                for a randomized range finder
+            nsing : [int] number of singular triplets to keep.  None to
+                keep all of them
+            energy : [float] fraction (0 to 1) of the squared Frobenius norm
+                of x that the kept singular values must capture.  Combined
+                with nsing, the smaller rank is used
+            oversample : [int] extra random vectors for the 'randomized'
+                mode
+            n_iter : [int] number of power iterations for the 'randomized'
+                mode
+            seed : [int] random seed for the 'randomized' mode
+        Returns:
+            None
+        Raises:
+            Exception if mode is not recognized or the arguments don't agree
+        """
+        if mode not in ['full', 'economy', 'lanczos', 'randomized']:
+            raise Exception("matrix.set_svd_mode(): unrecognized mode: " +
+                            str(mode))
+        if nsing is not None and nsing < 1:
+            raise Exception("matrix.set_svd_mode(): nsing must be > 0")
+        if energy is not None and not 0.0 < energy <= 1.0:
+            raise Exception("matrix.set_svd_mode(): energy must be in (0,1]")
+        if mode == 'full' and (nsing is not None or energy is not None):
+            raise Exception("matrix.set_svd_mode(): nsing and energy " +
+                            "require a truncated mode")
+        self.svd_mode = mode
+        self.nsing = nsing
+        self.energy = energy
+        self.oversample = int(oversample)
+        self.n_iter = int(n_iter)
+        self.seed = seed
+        self.__reset_svd()
+
+
+    def __compute_svd(self):
+        """private method to compute the SVD components of x using
+            self.svd_mode
+        Args:
+            None
+        Returns:
+            u, s, v : [numpy.ndarray] left singular vectors, singular values
+                and right singular vectors (not transposed)
+        Raises:
+            Exception is SVD process fails
+        """
+        if self.svd_mode in ['lanczos', 'randomized']:
+            return self.__truncate(*self.__iterative_svd())
+        if self.isdiagonal:
+            x = np.diag(self.x.flatten())
+        elif self.issparse:
+            #--dense lapack svd is needed for the exact decomposition
+            x = self.x.toarray()
+        else:
+            #--just a pointer to x
+            x = self.x
+        full_matrices = self.svd_mode == 'full'
+        try:
+            u, s, v = la.svd(x, full_matrices=full_matrices)
+            v = v.transpose()
+        except:
+            try:
+                v, s, u = la.svd(x.transpose(), full_matrices=full_matrices)
+                u = u.transpose()
+            except:
+                raise Exception("matrix.__set_svd(): " +
+                                "unable to compute SVD of self.x")
+        return self.__truncate(u, s, v)
+
+
+    def __iterative_svd(self):
+        """private method to compute the leading singular triplets with
+            either ARPACK or a randomized range finder.  If an energy
+            threshold is set, the rank is doubled until the threshold is met
+        Args:
+            None
+        Returns:
+            u, s, v : [numpy.ndarray] singular values in descending order
+        Raises:
+            None
+        """
+        if self.isdiagonal:
+            x = sp.diags(self.x.flatten(), 0).tocsr()
+        else:
+            x = self.x
+        max_rank = min(x.shape)
+        if self.nsing is not None:
+            k = min(self.nsing, max_rank)
+        else:
+            k = min(50, max_rank)
+        if self.energy is not None:
+            fro2 = self.__frobenius2()
+        while True:
+            if self.svd_mode == 'lanczos':
+                u, s, v = self.__lanczos(x, k)
+            else:
+                u, s, v = self.__randomized(x, k)
+            if self.energy is None or k >= max_rank or \
+                    (self.nsing is not None and k >= self.nsing) or \
+                    np.sum(s ** 2) >= self.energy * fro2:
+                return u, s, v
+            k = min(2 * k, max_rank)
+
+
+    def __lanczos(self, x, k):
+        """private method for the ARPACK truncated SVD.  ARPACK needs
+            k < min(x.shape), so the exact economy SVD is used otherwise
+        """
+        if k >= min(x.shape):
+            if sp.issparse(x):
+                x = x.toarray()
+            u, s, v = la.svd(x, full_matrices=False)
+            return u[:, :k], s[:k], v[:k, :].transpose()
+        u, s, v = sla.svds(x, k=k)
+        order = np.argsort(s)[::-1]
+        return u[:, order], s[order], v[order, :].transpose()
+
+
+    def __randomized(self, x, k):
+        """private method for the randomized range finder SVD
+            (Halko et al., 2011)
+        """
+        state = np.random.RandomState(self.seed)
+        l = min(k + self.oversample, min(x.shape))
+        q = x.dot(state.standard_normal((x.shape[1], l)))
+        q, r = la.qr(q, mode='economic')
+        for i in xrange(self.n_iter):
+            q, r = la.qr(x.T.dot(q), mode='economic')
+            q, r = la.qr(x.dot(q), mode='economic')
+        b = np.asarray(x.T.dot(q)).transpose()
+        ub, s, v = la.svd(b, full_matrices=False)
+        u = np.dot(q, ub)
+        return u[:, :k], s[:k], v[:k, :].transpose()
+
+
+    def __frobenius2(self):
+        """private method for the squared Frobenius norm of x
+        """
+        if self.issparse:
+            return self.x.multiply(self.x).sum()
+        return np.sum(self.x ** 2)
+
+
+    def __truncate(self, u, s, v):
+        """private method to truncate the SVD components to the rank
+            requested by self.nsing and self.energy
+        """
+        k = s.shape[0]
+        if self.nsing is not None:
+            k = min(k, self.nsing)
+        if self.energy is not None:
+            captured = np.cumsum(s ** 2) / self.__frobenius2()
+            k = min(k, np.searchsorted(captured, self.energy *
+                                       (1.0 - 1.0e-12)) + 1)
+        if k == s.shape[0] and self.svd_mode == 'full':
+            return u, s, v
+        return u[:, :k], s[:k], v[:, :k]
+
+
     def mult_isaligned(self, other):
         """check if matrices are aligned for multiplication
         Args:
@@ -500,6 +911,104 @@ class matrix(object):
             return False
 
 
+    @property
+    def row_names(self):
+        """the list of row names
+        """
+        return self.__row_names
+
+
+    @row_names.setter
+    def row_names(self, names):
+        self.__row_names = names
+        self.__name_index[0] = None
+
+
+    @property
+    def col_names(self):
+        """the list of column names
+        """
+        return self.__col_names
+
+
+    @col_names.setter
+    def col_names(self, names):
+        self.__col_names = names
+        self.__name_index[1] = None
+
+
+    def __lookup(self, names, axis):
+        """private method to find the positions of names along an axis using
+            a hashed name index.  The index is built on first use and is
+            dropped when the names along the axis are reset (every method
+            that changes names goes through the row_names and col_names
+            setters) or change length.  The positions found are checked
+            against the names, so an index that is out of date because the
+            list was reordered in place is rebuilt.  Names renamed in place
+            are only found once the names are reset, e.g.
+            m.row_names = m.row_names
+        Args:
+            names : [enumerable] lower case names to find
+            axis : [int] the axis to search
+        Returns:
+            numpy.ndarray : positions of names, -1 where a name is not found
+        Raises:
+            None
+        """
+        if axis == 0:
+            axis_names = self.__row_names
+        else:
+            axis_names = self.__col_names
+        names = list(names)
+        index = self.__name_index[axis]
+        if index is None or index[0] != len(axis_names):
+            index = self.__index_names(axis_names, axis)
+        idxs = self.__find(index, names)
+        found = np.flatnonzero(idxs >= 0)
+        if [axis_names[i] for i in idxs[found]] != [names[i] for i in found]:
+            index = self.__index_names(axis_names, axis)
+            idxs = self.__find(index, names)
+        return idxs
+
+
+    def __index_names(self, axis_names, axis):
+        """private method to build the hashed name index of an axis
+        Args:
+            axis_names : [list] the names along the axis
+            axis : [int] the axis
+        Returns:
+            tuple : (number of names, pandas.Index of the unique names,
+                positions of the unique names)
+        Raises:
+            None
+        """
+        #--duplicate names resolve to their first position
+        first = ~pandas.Series(axis_names, dtype=object).duplicated().values
+        index = (len(axis_names),
+                 pandas.Index(np.array(axis_names, dtype=object)[first]),
+                 np.flatnonzero(first))
+        self.__name_index[axis] = index
+        return index
+
+
+    def __find(self, index, names):
+        """private method to look names up in a hashed name index
+        Args:
+            index : [tuple] name index from __index_names
+            names : [list] names to find
+        Returns:
+            numpy.ndarray : positions of names, -1 where a name is not found
+        Raises:
+            None
+        """
+        pos = index[1].get_indexer(names)
+        idxs = np.empty(pos.shape[0], dtype=np.int64)
+        idxs.fill(-1)
+        found = pos >= 0
+        idxs[found] = index[2][pos[found]]
+        return idxs
+
+
     @property
     def newx(self):
         """return a copy of x
@@ -514,6 +1023,62 @@ class matrix(object):
         return self.__x
 
 
+    def set_read_only(self):
+        """make the entries of self read-only, for matrices that are shared
+            (e.g. the artifacts of a Pest session).  Writing into x then
+            raises, and the in-place operators allocate new entries instead
+            of updating x
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.__x is None:
+            return
+        if self.issparse:
+            self.__x.data.flags.writeable = False
+        else:
+            self.__x.flags.writeable = False
+
+
+    def view(self):
+        """get a matrix of the same type that shares the entries of self,
+            read-only, and has its own copies of the names.  Reordering or
+            dropping rows and columns of the view (align, drop) doesn't
+            change self, and the in-place operators on the view allocate new
+            entries
+        Args:
+            None
+        Returns:
+            matrix
+        Raises:
+            None
+        """
+        if self.issparse and self.__x.format in ['csr', 'csc']:
+            data = self.__x.data.view()
+            data.flags.writeable = False
+            x = type(self.__x)((data, self.__x.indices, self.__x.indptr),
+                               shape=self.__x.shape)
+        elif self.issparse:
+            x = self.__x.copy()
+            x.data.flags.writeable = False
+        else:
+            x = self.__x.view()
+            x.flags.writeable = False
+        return type(self)(x=x, row_names=list(self.row_names),
+                          col_names=list(self.col_names),
+                          isdiagonal=self.isdiagonal, autoalign=self.autoalign)
+
+
+    @property
+    def issparse(self):
+        """flag for a scipy.sparse backed matrix
+        """
+        return sp.issparse(self.__x)
+
+
     @property
     def shape(self):
         """get the shape of x
@@ -632,7 +1197,8 @@ class matrix(object):
     def indices(self, names, axis=None):
         """get the row and col indices of names
         Args:
-            names : [enumerable] column and/or row names
+            names : [enumerable] column and/or row names.  numpy string
+                arrays are looked up without a python loop
             axis : [int] the axis to search.
         Returns:
             numpy.ndarray : indices of names.  if axis is None, two ndarrays
@@ -641,31 +1207,41 @@ class matrix(object):
             Exception if a name is not found
             Exception if axis not in [0,1]
         """
-        row_idxs, col_idxs = [], []
-        for name in names:
-            if name.lower() not in self.col_names \
-                    and name.lower() not in self.row_names:
-                raise Exception('matrix.indices(): name not found: ' + name)
-            if name.lower() in self.col_names:
-                col_idxs.append(self.col_names.index(name))
-            if name.lower() in self.row_names:
-                row_idxs.append(self.row_names.index(name))
+        if axis not in [None, 0, 1]:
+            raise Exception("matrix.indices(): " +
+                            "axis argument must 0 or 1, not:" + str(axis))
+        if isinstance(names, np.ndarray):
+            names = np.char.lower(names.astype(str))
+        else:
+            names = [name.lower() for name in names]
+        row_idxs, col_idxs = None, None
+        if axis in [None, 0]:
+            row_idxs = self.__lookup(names, 0)
+        if axis in [None, 1]:
+            col_idxs = self.__lookup(names, 1)
+        #--only search the other axis to report a name that is not found
+        if axis == 0 and np.any(row_idxs < 0):
+            col_idxs = self.__lookup(names, 1)
+        elif axis == 1 and np.any(col_idxs < 0):
+            row_idxs = self.__lookup(names, 0)
+        if row_idxs is not None and col_idxs is not None:
+            missing = np.flatnonzero((row_idxs < 0) & (col_idxs < 0))
+            if missing.shape[0] > 0:
+                raise Exception('matrix.indices(): name not found: ' +
+                                names[missing[0]])
         if axis is None:
-            return np.array(row_idxs, dtype=np.int32),\
-                np.array(col_idxs, dtype=np.int32)
+            return row_idxs[row_idxs >= 0].astype(np.int32),\
+                col_idxs[col_idxs >= 0].astype(np.int32)
         elif axis == 0:
-            if len(row_idxs) != len(names):
+            if np.any(row_idxs < 0):
                 raise Exception("matrix.indices(): " +
                                 "not all names found in row_names")
-            return np.array(row_idxs, dtype=np.int32)
-        elif axis == 1:
-            if len(col_idxs) != len(names):
+            return row_idxs.astype(np.int32)
+        else:
+            if np.any(col_idxs < 0):
                 raise Exception("matrix.indices(): " +
                                 "not all names found in col_names")
-            return np.array(col_idxs, dtype=np.int32)
-        else:
-            raise Exception("matrix.indices(): " +
-                            "axis argument must 0 or 1, not:" + str(axis))
+            return col_idxs.astype(np.int32)
 
 
     def align(self, names, axis=None):
@@ -680,7 +1256,7 @@ class matrix(object):
             Exception if axis not in [0,1]
             AssertionError if name(s) not found
         """
-        if not isinstance(names, list):
+        if isinstance(names, basestring):
             names = [names]
         row_idxs,col_idxs = self.indices(names)
         if self.isdiagonal or isinstance(self, cov):
@@ -691,9 +1267,8 @@ class matrix(object):
             else:
                 self.__x = self.__x[row_idxs, :]
                 self.__x = self.__x[:, col_idxs]
-            row_names = []
-            [row_names.append(self.row_names[i]) for i in row_idxs]
-            self.row_names, self.col_names = row_names, row_names
+            row_names = [self.row_names[i] for i in row_idxs]
+            self.row_names, self.col_names = row_names, list(row_names)
 
         else:
             if axis is None:
@@ -703,16 +1278,12 @@ class matrix(object):
                 assert row_idxs.shape[0] == self.shape[0], \
                     "matrix.align(): not all names found in self.row_names"
                 self.__x = self.__x[row_idxs, :]
-                row_names = []
-                [row_names.append(self.row_names[i]) for i in row_idxs]
-                self.row_names = row_names
+                self.row_names = [self.row_names[i] for i in row_idxs]
             elif axis == 1:
                 assert col_idxs.shape[0] == self.shape[1], \
                     "matrix.align(): not all names found in self.col_names"
                 self.__x = self.__x[:, col_idxs]
-                col_names = []
-                [col_names.append(self.col_names[i]) for i in row_idxs]
-                self.col_names = col_names
+                self.col_names = [self.col_names[i] for i in col_idxs]
             else:
                 raise Exception("matrix.align(): axis argument to align()" +
                                 " must be either 0 or 1")
@@ -733,9 +1304,9 @@ class matrix(object):
             raise Exception("matrix.get(): must pass at least" +
                             " row_names or col_names")
 
-        if row_names is not None and not isinstance(row_names, list):
+        if isinstance(row_names, basestring):
             row_names = [row_names]
-        if col_names is not None and not isinstance(col_names, list):
+        if isinstance(col_names, basestring):
             col_names = [col_names]
 
         if isinstance(self,cov):
@@ -756,18 +1327,27 @@ class matrix(object):
             return cov(x=extract, names=names, isdiagonal=self.isdiagonal)
         if self.isdiagonal:
             extract = np.diag(self.__x[:, 0])
+        elif self.issparse:
+            #--sparse fancy indexing already returns a new matrix
+            extract = self.__x
         else:
             extract = self.__x.copy()
         if row_names is not None:
             row_idxs = self.indices(row_names, axis=0)
-            extract = np.atleast_2d(extract[row_idxs, :].copy())
+            if sp.issparse(extract):
+                extract = extract[row_idxs, :]
+            else:
+                extract = np.atleast_2d(extract[row_idxs, :].copy())
             if drop:
                 self.drop(row_names, axis=0)
         else:
             row_names = self.row_names
         if col_names is not None:
             col_idxs = self.indices(col_names, axis=1)
-            extract = np.atleast_2d(extract[:, col_idxs].copy())
+            if sp.issparse(extract):
+                extract = extract[:, col_idxs]
+            else:
+                extract = np.atleast_2d(extract[:, col_idxs].copy())
             if drop:
                 self.drop(col_names, axis=1)
         else:
@@ -790,38 +1370,69 @@ class matrix(object):
         """
         if axis is None:
             raise Exception("matrix.drop(): axis arg is required")
-        if not isinstance(names, list):
+        if isinstance(names, basestring):
             names = [names]
         idxs = self.indices(names, axis=axis)
 
         if self.isdiagonal or isinstance(self, cov):
             self.__x = np.delete(self.__x, idxs, 0)
-            idxs = np.sort(idxs)
-            for idx in idxs[::-1]:
-                del self.row_names[idx]
-                del self.col_names[idx]
+            self.row_names = self.__keep_names(self.row_names, idxs)
+            self.col_names = self.__keep_names(self.col_names, idxs)
         elif axis == 0:
             if idxs.shape[0] == self.shape[0]:
                 raise Exception("matrix.drop(): can't drop all rows")
             elif idxs.shape == 0:
                 raise Exception("matrix.drop(): nothing to drop on axis 0")
-            self.__x = np.delete(self.__x, idxs, 0)
-            idxs = np.sort(idxs)
-            for idx in idxs[::-1]:
-                del self.row_names[idx]
+            self.__delete(idxs, 0)
+            self.row_names = self.__keep_names(self.row_names, idxs)
         elif axis == 1:
             if idxs.shape[0] == self.shape[1]:
                 raise Exception("matrix.drop(): can't drop all cols")
             if idxs.shape == 0:
                 raise Exception("matrix.drop(): nothing to drop on axis 1")
-            self.__x = np.delete(self.__x, idxs, 1)
-            idxs = np.sort(idxs)
-            for idx in idxs[::-1]:
-                del self.col_names[idx]
+            self.__delete(idxs, 1)
+            self.col_names = self.__keep_names(self.col_names, idxs)
         else:
             raise Exception("matrix.drop(): axis argument must be 0 or 1")
 
 
+    def __delete(self, idxs, axis):
+        """private method to remove rows or columns of x in place of
+            np.delete, which does not support scipy.sparse matrices
+        Args:
+            idxs : [numpy.ndarray] indices to remove
+            axis : [int] the axis to remove from
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.issparse:
+            keep = np.setdiff1d(np.arange(self.__x.shape[axis]), idxs)
+            if axis == 0:
+                self.__x = self.__x[keep, :]
+            else:
+                self.__x = self.__x[:, keep]
+        else:
+            self.__x = np.delete(self.__x, idxs, axis)
+
+
+    def __keep_names(self, names, idxs):
+        """private method to get a new list of names without the entries at
+            idxs
+        Args:
+            names : [list] names
+            idxs : [numpy.ndarray] indices to remove
+        Returns:
+            list
+        Raises:
+            None
+        """
+        keep = np.ones(len(names), dtype=bool)
+        keep[idxs] = False
+        return [name for name, k in zip(names, keep) if k]
+
+
     def extract(self, row_names=None, col_names=None):
         """wrapper method that gets then drops elements
         """
@@ -841,43 +1452,60 @@ class matrix(object):
         Raises:
             None
         """
+        #--get the indices and values of non-zero entries
+        if self.issparse:
+            coo = self.x.tocoo()
+            nz = coo.data != 0.0
+            row_idxs, col_idxs, flat = coo.row[nz], coo.col[nz], coo.data[nz]
+        else:
+            row_idxs, col_idxs = np.nonzero(self.x)
+            #--flatten the array
+            flat = self.x[row_idxs, col_idxs].flatten()
+        nnz = flat.shape[0] #number of non-zero entries
         f = open(filename, 'wb')
-        nnz = np.count_nonzero(self.x) #number of non-zero entries
         #--write the header
         header = np.array((-self.shape[1], -self.shape[0], nnz),
                           dtype=self.binary_header_dt)
         header.tofile(f)
-        #--get the indices of non-zero entries
-        row_idxs, col_idxs = np.nonzero(self.x)
-        icount = row_idxs + 1 + col_idxs * self.shape[0]
-        #--flatten the array
-        flat = self.x[row_idxs, col_idxs].flatten()
-        #--zip up the index position and value pairs
-        data = np.array(zip(icount, flat), dtype=self.binary_rec_dt)
+        #--fill the index position and value fields of the records
+        data = np.empty(nnz, dtype=self.binary_rec_dt)
+        data['j'] = row_idxs + 1 + col_idxs * self.shape[0]
+        data['dtemp'] = flat
         #--write
         data.tofile(f)
-
-        for name in self.col_names:
-            if len(name) > self.par_length:
-                name = name[:self.par_length - 1]
-            elif len(name) < self.par_length:
-                for i in range(len(name), self.par_length):
-                    name = name + ' '
-            f.write(name)
-        for name in self.row_names:
-            if len(name) > self.obs_length:
-                name = name[:self.obs_length - 1]
-            elif len(name) < self.obs_length:
-                for i in range(len(name), self.obs_length):
-                    name = name + ' '
-            f.write(name)
+        #--write the parameter and observation names as fixed-width blocks
+        f.write(self.__name_block(self.col_names, self.par_length))
+        f.write(self.__name_block(self.row_names, self.obs_length))
         f.close()
 
 
-    def from_binary(self, filename):
+    def __name_block(self, names, length):
+        """private method to build a block of blank-padded, fixed-width
+            names for the pest binary file
+        Args:
+            names : [enumerable] names to write
+            length : [int] width of each name. longer names are truncated
+        Returns:
+            str
+        Raises:
+            None
+        """
+        block = np.array(names, dtype='S' + str(length))
+        return np.char.ljust(block, length).tostring()
+
+
+    def from_binary(self, filename, mmap=False, sparse=False,
+                    chunk_size=1000000):
         """load from pest-compatible binary file
         Args:
             filename : [str] filename to save binary file
+            mmap : [bool] flag to memory-map the data records and name
+                tables instead of reading them into memory.  Only the
+                matrix itself is allocated
+            sparse : [bool] flag to keep the non-zero records as a
+                scipy.sparse CSC matrix instead of filling a dense array
+            chunk_size : [int] number of data records to process at a time
+                when filling the matrix
         Returns:
             None
         Raises:
@@ -887,27 +1515,37 @@ class matrix(object):
         #--the header datatype
         itemp1, itemp2, icount = np.fromfile(f, self.binary_header_dt, 1)[0]
         if itemp1 >= 0:
+            f.close()
             raise TypeError('matrix.from_binary(): Jco produced by ' +
                             'deprecated version of PEST,' +
                             'Use JCOTRANS to convert to new format')
         ncol, nrow = abs(itemp1), abs(itemp2)
-        self.__x = np.zeros((nrow, ncol))
-        #--read all data records
-        #--using this a memory hog, but really fast
-        data = np.fromfile(f, self.binary_rec_dt, icount)
-        icols = ((data['j'] - 1) / nrow) + 1
-        irows = data['j'] - ((icols - 1) * nrow)
-        self.__x[irows - 1, icols - 1] = data["dtemp"]
+        rec_offset = self.binary_header_dt.itemsize
+        name_offset = rec_offset + icount * self.binary_rec_dt.itemsize
+        par_dt = np.dtype('S' + str(self.par_length))
+        obs_dt = np.dtype('S' + str(self.obs_length))
+        if mmap:
+            f.close()
+            data = np.memmap(filename, dtype=self.binary_rec_dt, mode='r',
+                             offset=rec_offset, shape=(icount,))
+            par_names = np.memmap(filename, dtype=par_dt, mode='r',
+                                  offset=name_offset, shape=(ncol,))
+            obs_names = np.memmap(filename, dtype=obs_dt, mode='r',
+                                  offset=name_offset + ncol * par_dt.itemsize,
+                                  shape=(nrow,))
+        else:
+            #--read all data records
+            #--using this a memory hog, but really fast
+            data = np.fromfile(f, self.binary_rec_dt, icount)
+            par_names = np.fromfile(f, par_dt, ncol)
+            obs_names = np.fromfile(f, obs_dt, nrow)
+            f.close()
+        self.__x = self.__fill_from_records(data, nrow, ncol, chunk_size,
+                                            sparse)
         #--read obs and parameter names
-        for j in xrange(self.shape[1]):
-            name = struct.unpack(str(self.par_length) + "s",
-                                 f.read(self.par_length))[0].strip().lower()
-            self.col_names.append(name)
-        for i in xrange(self.shape[0]):
-            name = struct.unpack(str(self.obs_length) + "s",
-                                 f.read(self.obs_length))[0].strip().lower()
-            self.row_names.append(name)
-        f.close()
+        self.col_names = [name.strip().lower() for name in par_names]
+        self.row_names = [name.strip().lower() for name in obs_names]
+        del data, par_names, obs_names
         assert len(self.row_names) == self.shape[0],\
           "matrix.from_binary() len(row_names) (" + str(len(self.row_names)) +\
           ") != self.shape[0] (" + str(self.shape[0]) + ")"
@@ -915,6 +1553,46 @@ class matrix(object):
           "matrix.from_binary() len(col_names) (" + str(len(self.col_names)) +\
           ") != self.shape[1] (" + str(self.shape[1]) + ")"
 
+
+    def __fill_from_records(self, data, nrow, ncol, chunk_size,
+                            sparse=False):
+        """private method to build the matrix entries from pest binary
+            (index, value) records.  The records are processed chunk_size at
+            a time so the transient index arrays stay bounded
+        Args:
+            data : [numpy.ndarray] records with binary_rec_dt dtype
+            nrow : [int] number of rows
+            ncol : [int] number of columns
+            chunk_size : [int] number of records to process at a time
+            sparse : [bool] flag to return a scipy.sparse CSC matrix
+        Returns:
+            numpy.ndarray or scipy.sparse.csc_matrix
+        Raises:
+            None
+        """
+        chunk_size = max(int(chunk_size), 1)
+        nrec = data.shape[0]
+        if sparse:
+            irows = np.empty(nrec, dtype=self.integer)
+            icols = np.empty(nrec, dtype=self.integer)
+            vals = np.empty(nrec, dtype=self.double)
+        else:
+            x = np.zeros((nrow, ncol), dtype=self.double)
+        for start in xrange(0, nrec, chunk_size):
+            chunk = data[start:start + chunk_size]
+            #--pest stores a 1-based, column-major position
+            j = chunk['j'] - 1
+            if sparse:
+                end = start + chunk.shape[0]
+                irows[start:end] = j % nrow
+                icols[start:end] = j // nrow
+                vals[start:end] = chunk['dtemp']
+            else:
+                x[j % nrow, j // nrow] = chunk['dtemp']
+        if sparse:
+            return sp.csc_matrix((vals, (irows, icols)), shape=(nrow, ncol))
+        return x
+
     def to_ascii(self, out_filename, icode=2):
         """write a pest-compatible ASCII matrix/vector file
         Args:
@@ -931,6 +1609,8 @@ class matrix(object):
                     format(nrow, ncol, icode))
         if self.isdiagonal:
             x = np.diag(self.__x[:, 0])
+        elif self.issparse:
+            x = self.__x.toarray()
         else:
             x = self.__x
         np.savetxt(f_out, x, fmt='%15.7E', delimiter='')
@@ -948,10 +1628,11 @@ class matrix(object):
             f_out.close()
 
 
-    def from_ascii(self, filename):
+    def from_ascii(self, filename, chunk_size=1000000):
         """load a pest-compatible ASCII matrix/vector file
         Args:
             filename : [str] name of the file to read
+            chunk_size : [int] number of values to convert to float at a time
         Returns:
             None
         Raises:
@@ -961,37 +1642,25 @@ class matrix(object):
         raw = f.readline().strip().split()
         nrow, ncol, icode = int(raw[0]), int(raw[1]), int(raw[2])
         #x = np.fromfile(f, dtype=self.double, count=nrow * ncol, sep=' ')
-        # this painfully slow and ungly read is needed to catch the
-        # fortran floating points that have 3-digit exponents,
-        # which leave out the base (e.g. 'e') : "-1.23455+300"
+        # np.fromfile can't catch the fortran floating points that have
+        # 3-digit exponents, which leave out the base (e.g. 'e') :
+        # "-1.23455+300", so the values are split line by line but
+        # converted in bulk, chunk_size values at a time
+        ntot = nrow * ncol
+        x = np.empty(ntot, dtype=self.double)
         count = 0
-        x = []
-        while True:
+        tokens = []
+        while count < ntot:
             line = f.readline()
             if line == '':
                 raise Exception("matrix.from_ascii() error: EOF")
-            raw = line.strip().split()
-            for r in raw:
-                try:
-                    x.append(float(r))
-                except:
-                    # overflow
-                    if '+' in r:
-                        x.append(1.0e+30)
-                    # underflow
-                    elif '-' in r:
-                        x.append(0.0)
-                    else:
-                        raise Exception("matrix.from_ascii() error: " +
-                                        " can't cast " + r + " to float")
-                count += 1
-                if count == (nrow * ncol):
-                    break
-            if count == (nrow * ncol):
-                    break
-        x = np.array(x,dtype=self.double)
-        x.resize(nrow, ncol)
-        self.__x = x
+            tokens.extend(line.split())
+            if len(tokens) >= chunk_size or count + len(tokens) >= ntot:
+                tokens = tokens[:ntot - count]
+                x[count:count + len(tokens)] = self.__parse_floats(tokens)
+                count += len(tokens)
+                tokens = []
+        self.__x = x.reshape(nrow, ncol)
         line = f.readline().strip().lower()
         if not line.startswith('*'):
             raise Exception('matrix.from_ascii(): error loading ascii file," +\
@@ -1023,6 +1692,44 @@ class matrix(object):
         f.close()
 
 
+    def __parse_floats(self, tokens):
+        """private method to convert a list of strings to floats in bulk.
+            fortran floating points with 3-digit exponents that leave out the
+            base (e.g. "-1.23455+300") are treated as overflow (1.0e+30) or
+            underflow (0.0)
+        Args:
+            tokens : [list] strings to convert
+        Returns:
+            numpy.ndarray
+        Raises:
+            Exception if a string can't be cast to float
+        """
+        try:
+            return np.array(tokens, dtype=self.double)
+        except ValueError:
+            pass
+        tokens = np.array(tokens)
+        no_base = np.char.find(np.char.lower(tokens), 'e') < 0
+        # overflow
+        over = no_base & (np.char.find(tokens, '+', 1) > 0)
+        # underflow
+        under = no_base & ~over & (np.char.find(tokens, '-', 1) > 0)
+        tokens[over | under] = '0'
+        try:
+            x = tokens.astype(self.double)
+        except ValueError:
+            for r in tokens:
+                try:
+                    float(r)
+                except ValueError:
+                    raise Exception("matrix.from_ascii() error: " +
+                                    " can't cast " + r + " to float")
+            raise Exception("matrix.from_ascii() error: " +
+                            " can't cast tokens to float")
+        x[over] = 1.0e+30
+        return x
+
+
     def to_dataframe(self):
         """return a pandas dataframe of the matrix object
         Args:
@@ -1034,6 +1741,8 @@ class matrix(object):
         """
         if self.isdiagonal:
             x = np.diag(self.__x[:, 0])
+        elif self.issparse:
+            x = self.__x.toarray()
         else:
             x = self.__x
         return pandas.DataFrame(data=x,index=self.row_names,columns=self.col_names)
@@ -1050,35 +1759,235 @@ class matrix(object):
         """
         if self.isdiagonal:
             x = np.diag(self.__x[:, 0])
+        elif self.issparse:
+            x = self.__x.toarray()
         else:
             x = self.__x
         return pandas.DataFrame(data=x,index=self.row_names,columns=self.col_names)
 
-    def to_sparse(self,trunc = 0.0):
-        """get the CSR sparse matrix representation of matrix
+    def to_sparse(self, trunc=0.0, fmt='csr', chunk_size=1000000):
+        """get the sparse matrix representation of matrix, keeping only
+            entries with an absolute value greater than trunc
         Args:
-            None
+            trunc : [float] magnitude threshold
+            fmt : [str] 'csr' or 'csc'
+            chunk_size : [int] approximate number of entries to threshold
+                at once, to limit the size of temporary arrays
         Returns:
             scipy sparse matrix object
         Raises:
-            Exception rethrow on scipy.sparse import failure
+            Exception if fmt is not supported
         """
-        try:
-            import scipy.sparse as sparse
-        except:
-            raise Exception("mat.to_sparse() error importing scipy.sparse")
-        iidx, jidx = [], []
-        data = []
+        if fmt not in ['csr', 'csc']:
+            raise Exception("matrix.to_sparse(): unsupported fmt: " + str(fmt))
         nrow, ncol = self.shape
-        for i in xrange(nrow):
-            for j in xrange(ncol):
-                val = self.x[i,j]
-                if val > trunc:
-                    iidx.append(i)
-                    jidx.append(j)
-                    data.append(val)
-        # csr_matrix( (data,(row,col)), shape=(3,3)
-        return sparse.csr_matrix((data, (iidx, jidx)), shape=(self.shape))
+        if self.isdiagonal:
+            vals = self.x[:, 0]
+            idxs = np.where(np.abs(vals) > trunc)[0]
+            x = sp.coo_matrix((vals[idxs], (idxs, idxs)), shape=(nrow, ncol))
+        elif self.issparse:
+            x = self.x.tocoo(copy=True)
+            keep = np.abs(x.data) > trunc
+            x = sp.coo_matrix((x.data[keep], (x.row[keep], x.col[keep])),
+                              shape=(nrow, ncol))
+        else:
+            iidx, jidx, data = [], [], []
+            step = max(1, chunk_size // max(1, ncol))
+            for start in xrange(0, nrow, step):
+                block = self.x[start:start + step, :]
+                i, j = np.nonzero(np.abs(block) > trunc)
+                iidx.append(i + start)
+                jidx.append(j)
+                data.append(block[i, j])
+            if len(data) == 0:
+                x = sp.coo_matrix((nrow, ncol), dtype=self.x.dtype)
+            else:
+                x = sp.coo_matrix((np.concatenate(data),
+                                   (np.concatenate(iidx),
+                                    np.concatenate(jidx))),
+                                  shape=(nrow, ncol))
+        if fmt == 'csc':
+            return x.tocsc()
+        return x.tocsr()
+
+
+
+class svd_cache(object):
+    """a persistent store of SVD components on disk.  Each entry is keyed
+        on a hash of the matrix entries that were decomposed, or, for a
+        matrix with an svd_cache_id, on the id and the matrix names (see
+        id_key()), so a large weighted jco (e.g. Q^1/2 J) can be keyed on
+        the jco file and the weights applied without hashing its entries.
+        Entries are saved as uncompressed .npy files and memory-mapped on
+        load.  The least recently used entries are evicted to keep the
+        cache within max_bytes and max_entries
+    """
+    def __init__(self, cache_dir, max_bytes=None, max_entries=None):
+        """constructor for svd_cache
+        Args:
+            cache_dir : [str] directory to store the cache entries in
+            max_bytes : [int] maximum total size of the cache on disk.
+                None for no limit
+            max_entries : [int] maximum number of cached decompositions.
+                None for no limit
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.components = ['u', 's', 'v']
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+
+    def key(self, x, *args):
+        """get the cache key for a matrix
+        Args:
+            x : [numpy.ndarray or scipy.sparse matrix] the matrix entries
+            args : anything else that changes the decomposition
+        Returns:
+            str : hex digest
+        Raises:
+            None
+        """
+        h = hashlib.sha1()
+        if sp.issparse(x):
+            x = x.tocsc()
+            arrays = [x.data, x.indices, x.indptr]
+        else:
+            arrays = [x]
+        h.update(str(x.shape) + str(x.dtype))
+        for arr in arrays:
+            h.update(np.ascontiguousarray(arr).data)
+        for arg in args:
+            h.update(str(arg))
+        return h.hexdigest()
+
+
+    def id_key(self, cache_id, shape, row_names, col_names, *args):
+        """get the cache key for a matrix from an identity of its entries
+            (e.g. the file they were read from) rather than the entries
+            themselves.  The names are part of the key so a matrix that
+            was reordered or had rows dropped gets a different key
+        Args:
+            cache_id : [str] identity of the matrix entries
+            shape : [tuple] matrix shape
+            row_names : [list] row names
+            col_names : [list] column names
+            args : anything else that changes the decomposition
+        Returns:
+            str : hex digest
+        Raises:
+            None
+        """
+        h = hashlib.sha1()
+        h.update(str(cache_id) + str(shape))
+        h.update('\n'.join(row_names))
+        h.update('\n'.join(col_names))
+        for arg in args:
+            h.update(str(arg))
+        return h.hexdigest()
+
+
+    def load(self, key):
+        """load the SVD components for a key
+        Args:
+            key : [str] cache key
+        Returns:
+            u, s, v : [numpy.ndarray] read-only memory-mapped arrays, or None
+                if key is not in the cache
+        Raises:
+            None
+        """
+        path = os.path.join(self.cache_dir, key)
+        files = [os.path.join(path, c + '.npy') for c in self.components]
+        if not all([os.path.exists(f) for f in files]):
+            return None
+        #--mark the entry as recently used
+        os.utime(path, None)
+        return tuple([np.load(f, mmap_mode='r') for f in files])
+
+
+    def store(self, key, u, s, v):
+        """save SVD components to the cache, then evict old entries
+        Args:
+            key : [str] cache key
+            u, s, v : [numpy.ndarray] the SVD components
+        Returns:
+            None
+        Raises:
+            None
+        """
+        path = os.path.join(self.cache_dir, key)
+        if os.path.exists(path):
+            return
+        #--write to a temporary directory first so a partial entry is
+        #--never picked up by load()
+        tmp_path = path + '.tmp' + str(os.getpid())
+        if not os.path.exists(tmp_path):
+            os.makedirs(tmp_path)
+        for c, arr in zip(self.components, [u, s, v]):
+            np.save(os.path.join(tmp_path, c + '.npy'), arr)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            #--another process stored the same entry first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+            return
+        self.evict()
+
+
+    @property
+    def entries(self):
+        """list of (last used time, size in bytes, path) for each entry,
+            least recently used first
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, key)
+            if '.tmp' in key or not os.path.isdir(path):
+                continue
+            size = sum([os.path.getsize(os.path.join(path, f))
+                        for f in os.listdir(path)])
+            entries.append((os.path.getmtime(path), size, path))
+        entries.sort()
+        return entries
+
+
+    def evict(self):
+        """remove the least recently used entries until the cache is within
+            max_bytes and max_entries
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        entries = self.entries
+        total = sum([e[1] for e in entries])
+        while len(entries) > 0:
+            over_bytes = self.max_bytes is not None and \
+                total > self.max_bytes
+            over_entries = self.max_entries is not None and \
+                len(entries) > self.max_entries
+            if not over_bytes and not over_entries:
+                break
+            mtime, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+    def clear(self):
+        """remove all entries from the cache
+        """
+        for mtime, size, path in self.entries:
+            shutil.rmtree(path, ignore_errors=True)
 
 
 
@@ -1131,6 +2040,7 @@ class cov(matrix):
         """
         self.__identity = None
         self.__zero = None
+        self.__reset_factor()
         if len(names) != 0 and len(row_names) == 0:
             row_names = names
         if len(names) != 0 and len(col_names) == 0:
@@ -1161,35 +2071,203 @@ class cov(matrix):
         return self.__zero
 
 
+    def __iadd__(self, other):
+        self.__reset_factor()
+        return super(cov, self).__iadd__(other)
+
+
+    def __isub__(self, other):
+        self.__reset_factor()
+        return super(cov, self).__isub__(other)
+
+
+    def __imul__(self, other):
+        self.__reset_factor()
+        return super(cov, self).__imul__(other)
+
+
+    def __reset_factor(self):
+        """private method to drop the cached Cholesky factors
+        """
+        self.__factor = None
+        self.__factor_x = None
+        self.__block_factors = OrderedDict()
+
+
+    def __check_factor(self):
+        """private method to drop the cached Cholesky factors if x has been
+            replaced since they were computed
+        """
+        x = super(cov, self).x
+        if self.__factor_x is not x:
+            self.__reset_factor()
+            self.__factor_x = x
+
+
+    @property
+    def x(self):
+        """return a reference to x.  While a Cholesky factor of self is
+            cached (see cov.chol, cov.inv, cov.solve and cov.condition_on),
+            a read-only view is returned so the factor can't go stale
+            through edits of x.  Change self with the in-place operators
+            (+=, -=, *=), which drop the factors, or replace it with a new
+            cov; arrays obtained from x before a factor was cached must not
+            be edited
+        """
+        x = super(cov, self).x
+        if isinstance(x, np.ndarray) and self.__factor_x is x and \
+                (self.__factor is not None or len(self.__block_factors) > 0):
+            x = x.view()
+            x.flags.writeable = False
+        return x
+
+
+    @property
+    def chol(self):
+        """the cached (lower) Cholesky factor of self, as returned by
+            scipy.linalg.cho_factor.  None if self is diagonal or not
+            positive definite
+        """
+        if self.isdiagonal:
+            return None
+        self.__check_factor()
+        if self.__factor is None:
+            try:
+                self.__factor = la.cho_factor(self.x, lower=True)
+            except la.LinAlgError:
+                self.__factor = False
+        if self.__factor is False:
+            return None
+        return self.__factor
+
+
+    def __block_factor(self, idxs):
+        """private method to get the cached Cholesky factor of the block of
+            self at idxs.  Only the BLOCK_FACTOR_CACHE_SIZE most recently
+            used blocks are kept.  None if the block is not positive
+            definite
+        """
+        self.__check_factor()
+        key = tuple(idxs)
+        if key in self.__block_factors:
+            #--mark as most recently used
+            factor = self.__block_factors.pop(key)
+        else:
+            try:
+                factor = la.cho_factor(self.x[np.ix_(idxs, idxs)], lower=True)
+            except la.LinAlgError:
+                factor = False
+        self.__block_factors[key] = factor
+        while len(self.__block_factors) > BLOCK_FACTOR_CACHE_SIZE:
+            self.__block_factors.popitem(last=False)
+        if factor is False:
+            return None
+        return factor
+
+
+    @property
+    def inv(self):
+        """inversion operation.  uses the cached Cholesky factor if self is
+            positive definite, otherwise a general inverse
+        Args:
+            None
+        Returns
+            inverse of self
+        Raises:
+            None
+        """
+        if self.isdiagonal or self.chol is None:
+            return super(cov, self).inv
+        x = la.cho_solve(self.chol, np.eye(self.shape[0]))
+        return cov(x=x, row_names=self.row_names, col_names=self.col_names,
+                   autoalign=self.autoalign)
+
+
+    def solve(self, other):
+        """solve self * x = other for x without forming the inverse of self
+        Args:
+            other : [numpy.ndarray or matrix] if matrix, rows are aligned to
+                self.col_names
+        Returns:
+            numpy.ndarray or matrix, same type as other
+        Raises:
+            AssertionError if other is not aligned with self
+        """
+        if isinstance(other, matrix):
+            rhs = other.get(row_names=self.col_names, col_names=other.col_names)
+            x = self.solve(rhs.x)
+            return matrix(x=x, row_names=self.col_names,
+                          col_names=other.col_names)
+        if sp.issparse(other):
+            other = other.toarray()
+        assert other.shape[0] == self.shape[0], \
+            "cov.solve(): shape mismatch: " + str(self.shape) + ' ' + \
+            str(other.shape)
+        if self.isdiagonal:
+            return other / self.x.reshape((-1,) + (1,) * (other.ndim - 1))
+        if self.chol is None:
+            return la.solve(self.x, other)
+        return la.cho_solve(self.chol, other)
+
+
     def condition_on(self,conditioning_elements):
         """get a new covariance object that is conditional on knowing some
             elements.  uses Schur's complement for conditional covariance
-            propagation
+            propagation: C11 - C12 * C22^-1 * C21, with C22^-1 * C21
+            found by solving against the cached Cholesky factor of C22
         Args:
             conditioning_elements : [enumerable] names of elements to
                                     condition on
         Returns:
             Cov object
         Raises:
-            AssertionError is conditioning element not found
-        """
-        for iname, name in enumerate(conditioning_elements):
-            conditioning_elements[iname] = name.lower()
-            assert name.lower() in self.col_names,\
-                "cov.condition_on() name not found: " + name
-        keep_names = []
-        for name in self.col_names:
-            if name not in conditioning_elements:
-                keep_names.append(name)
+            Exception is conditioning element not found
+        """
+        if isinstance(conditioning_elements, basestring):
+            conditioning_elements = [conditioning_elements]
+        cond_idxs = self.indices(conditioning_elements, axis=1)
+        keep = np.ones(self.shape[1], dtype=bool)
+        keep[cond_idxs] = False
+        keep_idxs = np.where(keep)[0]
+        keep_names = [self.col_names[i] for i in keep_idxs]
         #C11
-        new_cov = self.get(keep_names)
         if self.isdiagonal:
-            return new_cov
-        #C22^1
-        cond_cov = self.get(conditioning_elements).inv()
+            return cov(x=self.x[keep_idxs].copy(), names=keep_names,
+                       isdiagonal=True)
+        new_x = self.x[np.ix_(keep_idxs, keep_idxs)]
         #C12
-        upper_off_diag = self.get(keep_names, conditioning_elements)
-        return new_cov - (upper_off_diag * cond_cov * upper_off_diag.T)
+        upper_off_diag = self.x[np.ix_(keep_idxs, cond_idxs)]
+        #C22^-1 * C21
+        factor = self.__block_factor(cond_idxs)
+        if factor is None:
+            solved = la.solve(self.x[np.ix_(cond_idxs, cond_idxs)],
+                              upper_off_diag.transpose())
+        else:
+            solved = la.cho_solve(factor, upper_off_diag.transpose())
+        new_x -= np.dot(upper_off_diag, solved)
+        return cov(x=new_x, names=keep_names)
+
+
+    def posterior(self, jco, obs_cov):
+        """get the posterior covariance of self (as the prior parameter
+            covariance) given a jacobian and an observation noise covariance:
+            (J^T * obs_cov^-1 * J + self^-1)^-1
+        Args:
+            jco : [matrix] jacobian, rows are observations, columns are
+                parameters
+            obs_cov : [cov] observation noise covariance
+        Returns:
+            Cov object
+        Raises:
+            Exception if names are not found in jco
+        """
+        j = jco.get(row_names=obs_cov.row_names, col_names=self.col_names)
+        normal = j.T * obs_cov.inv * j
+        x = normal.x
+        if sp.issparse(x):
+            x = x.toarray()
+        x = x + self.inv.x
+        return cov(x=x, names=self.col_names, autoalign=self.autoalign).inv
 
 
     def to_uncfile(self, unc_file, covmat_file="cov.mat", var_mult=1.0):
@@ -1380,7 +2458,7 @@ class cov(matrix):
                                             "unrecognized keyword in" +
                                             "std block: " + line2)
                     if var != 1.0:
-                        cov.__x *= var
+                        cov._matrix__x *= var
                     for name in cov.row_names:
                         if name in self.row_names:
                             raise Exception("cov.from_uncfile():" +
@@ -1388,9 +2466,8 @@ class cov(matrix):
                     self.row_names.extend(cov.row_names)
                     self.col_names.extend(cov.col_names)
 
-                    for i, rname in enumerate(cov.row_names):
-                        self._matrix__x[idx + i,
-                                        idx:idx + cov.shape[0]] = cov.x[i, :]
+                    self._matrix__x[idx:idx + cov.shape[0],
+                                    idx:idx + cov.shape[0]] = cov.x
                     idx += cov.shape[0]
                 else:
                     raise Exception('cov.from_uncfile(): ' +
@@ -1428,9 +2505,9 @@ class cov(matrix):
                         if line2.strip().lower().startswith("end"):
                             break
                         if line2.startswith('file'):
-                            cov = matrix()
-                            cov.from_ascii(line2.split()[1])
-                            nentries += len(cov.row_names)
+                            nrow, ncol, icode = \
+                                get_ascii_dimensions(line2.split()[1])
+                            nentries += nrow
                         elif line2.startswith('variance_multiplier'):
                             var = float(line2.split()[1])
                         else:
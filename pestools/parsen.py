@@ -16,8 +16,9 @@ from pst_handler import pst as Pst
 class ParSen(object):
 
     def __init__(self, basename=None, parameter_data=None, res_df=None, 
-                 jco_df=None, drop_regul=False, drop_groups=None, 
-                 keep_groups=None, keep_obs=None, remove_obs=None):
+                 jco_df=None, jco=None, sparse=False, drop_regul=False,
+                 drop_groups=None, keep_groups=None, keep_obs=None,
+                 remove_obs=None):
 
         ''' Create ParSen class
 
@@ -38,7 +39,14 @@ class ParSen(object):
             read in based on base name of pest file provided. Providing a
             jco_df offers some efficiencies if working interactively.
             Otherwise the jco is read in every time ParSen class is initialized.
-            
+
+        jco : Jco, optional
+            Jco matrix object, dense or sparse.  Used instead of jco_df, and
+            a sparse Jco is never densified.
+
+        sparse : {False, True}, optional
+            Flag to keep the jacobian read from basename+'.jco' as a sparse
+            matrix.  Only used if neither jco_df nor jco are provided.
             
         res_df : DataFrame, optional
             Residual DataFrame used to define the weights to 
@@ -91,6 +99,7 @@ class ParSen(object):
         sum_group()
         plot_sum_group()
         plot_mean_group()
+        update_weights()
 
 
 
@@ -105,13 +114,21 @@ class ParSen(object):
                 self.directory = os.getcwd()   
 
 
-        if jco_df is None:
-            jco_file = os.path.join(self.directory, self.basename + '.jco')
-            jco = Jco()
-            jco.from_binary(jco_file)
-            self.jco_df = jco.to_dataframe()
-        else:
+        if jco_df is not None:
             self.jco_df = jco_df
+            self._jco = Jco(x=jco_df.values, row_names=list(jco_df.index),
+                            col_names=list(jco_df.columns))
+        else:
+            if jco is None:
+                jco_file = os.path.join(self.directory, self.basename + '.jco')
+                jco = Jco()
+                jco.from_binary(jco_file, sparse=sparse)
+            self._jco = jco
+            # Sparse jacobians are not densified into a DataFrame
+            if jco.issparse:
+                self.jco_df = None
+            else:
+                self.jco_df = jco.to_dataframe()
         
         if res_df is None:
             res_file = os.path.join(self.directory, self.basename + '.res')
@@ -119,8 +136,9 @@ class ParSen(object):
             self.res_df = pst.load_resfile(res_file)
         else:
             self.res_df = res_df
-        # Set index of res_df
-        self.res_df.set_index('name', drop=False, inplace = True)
+        # Set index of res_df (not in place, res_df may be shared with a
+        # Pest session)
+        self.res_df = self.res_df.set_index('name', drop=False)
 
         
         if parameter_data is None:
@@ -133,21 +151,21 @@ class ParSen(object):
        
         # Build pars_dict
         # key is PARNME value is PARGP
-        self._pars_dict = {}
-        for index, row in self.parameter_data.iterrows():
-            self._pars_dict[row['parnme'].lower()] = row['pargp'].lower()
-
-        # Build _obs_data
-        weights = []
-        ob_groups = []
-        obs = []
-        for ob in self.jco_df.index:
-            weight = self.res_df.loc[ob.lower()]['weight']
-            ob_group = self.res_df.loc[ob.lower()]['group']
-            weights.append(weight)
-            ob_groups.append(ob_group)
-            obs.append(ob)
-        self._obs_data = pd.DataFrame({'OBSNME': obs, 'OBGNME': ob_groups, 'WEIGHT': weights, 'ParSen_Weight' : weights})
+        self._pars_dict = dict(zip(self.parameter_data['parnme'].str.lower(),
+                                   self.parameter_data['pargp'].str.lower()))
+
+        # Build _obs_data by aligning the residuals to the jco rows
+        obs = [ob.lower() for ob in self._jco.row_names]
+        aligned = self.res_df.reindex(obs)
+        missing = aligned['weight'].isnull().values
+        if missing.any():
+            raise KeyError('ParSen: jco observations not found in residuals: '
+                           + str(list(np.array(obs)[missing][:10])))
+        self._obs_data = pd.DataFrame({'OBSNME': self._jco.row_names,
+                                       'OBGNME': np.asarray(aligned['group'],
+                                                            dtype=object),
+                                       'WEIGHT': aligned['weight'].values,
+                                       'ParSen_Weight': aligned['weight'].values})
         self._obs_data.set_index('OBSNME', inplace=True)
         
         if drop_regul is True:
@@ -164,38 +182,312 @@ class ParSen(object):
         # Fill DataFrame
         self.df = self.calc_sensitivity()
 
+    @property
+    def df(self):
+        '''
+        DataFrame of parameter sensitivity
+        '''
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        # Rankings are for this DataFrame only
+        self._ranks = {}
+        self._members = None
+
+    def _rank(self, n=None, group=None):
+        ''' Rank parameters by sensitivity
+
+        The full ranking of each group is computed once per sensitivity
+        DataFrame and reused.  Until a group has been fully ranked, a
+        request for a few parameters is answered with a partial sort.
+
+        Parameters
+        ----------
+        n : {None, int}, optional
+            If None all parameters, if greater than 0 the n most sensitive
+            parameters, if less than 0 the n least sensitive parameters
+
+        group : str, optional
+            Only rank parameters in this (lower case) parameter group
+
+        Returns
+        -------
+        array
+            Positions in ParSen.df, most sensitive first
+        '''
+        if self._members is None:
+            self._members = pd.Series(np.arange(len(self._df)))\
+                .groupby(self._df['Parameter Group'].values).indices
+        if group is None:
+            members = np.arange(len(self._df))
+        else:
+            members = np.asarray(self._members.get(group, []), dtype=int)
+
+        k = len(members) if n is None else min(abs(n), len(members))
+        if k == 0:
+            return members[:0]
+        if group not in self._ranks and 10 * k < len(members):
+            # Partial sort of only the k parameters wanted
+            key = self.__rank_key(members)
+            if n > 0:
+                part = np.argpartition(key, k - 1)[:k]
+            else:
+                part = np.argpartition(key, len(key) - k)[len(key) - k:]
+            return members[part[np.argsort(key[part], kind='mergesort')]]
+
+        if group not in self._ranks:
+            key = self.__rank_key(members)
+            self._ranks[group] = members[np.argsort(key, kind='mergesort')]
+        order = self._ranks[group]
+        if n is None or n > 0:
+            return order[:k]
+        return order[len(order) - k:]
+
+    def __rank_key(self, members):
+        '''
+        Sort key for most sensitive first, with missing values last
+        '''
+        key = -self._df['Sensitivity'].values[members].astype(float)
+        key[np.isnan(key)] = np.inf
+        return key
+
     def calc_sensitivity(self):
-        # Get count of non-zero weights
-        weights = self._obs_data['ParSen_Weight'].values
-        n_nonzero_weights = np.count_nonzero(weights)
+        # Weights the running sums are based on
+        weights = self._obs_data['ParSen_Weight'].values.astype(float)
+        self._sum_weights = weights
 
         # Calculate sensitivities
-        # Could probally speed this up with some of the Matix class methods
-        # - for another time..
-        sensitivities = []
-        for col in self.jco_df:
-            sen = np.linalg.norm(np.asarray(self.jco_df[col])*weights)/n_nonzero_weights
-            sensitivities.append(sen)
+        # Composite sensitivity of each parameter is the norm of its weighted
+        # jco column, reduced for all columns at once.  The sums of squares
+        # are kept so update_weights() can adjust them incrementally.
+        x = self._jco.x
+        if self._jco.issparse:
+            # Column sums of squared weighted entries without densifying
+            self._sum_sq = np.asarray(x.multiply(x).T.dot(weights**2))
+        else:
+            self._sum_sq = np.einsum('ij,ij,i->j', x, x, weights**2)
+        return self._sensitivity_df()
+
+    def update_weights(self, weights, calc_sensitivity=True):
+        ''' Change the weights of some observations
+
+        Only the jco rows of the changed observations are used to update
+        the per-parameter sums of squared weighted sensitivities, so the
+        cost is proportional to the number of observations changed rather
+        than the size of the jco.
+
+        Parameters
+        ----------
+        weights : dict or Pandas Series
+            New weights, keyed by observation name
+
+        calc_sensitivity : {True, False}, optional
+            Update ParSen.df with the new sensitivities
+        '''
+        weights = pd.Series(weights, dtype=float)
+        rows = self._obs_rows.reindex([ob.lower() for ob in weights.index])
+        if rows.isnull().any():
+            raise KeyError('ParSen.update_weights(): observations not in jco: '
+                           + str(list(weights.index[rows.isnull().values])))
+        rows = rows.values.astype(int)
+
+        # Later entries win if an observation is given twice
+        rows, last = np.unique(rows[::-1], return_index=True)
+        self._set_weights(rows, weights.values[::-1][last])
+
+        if calc_sensitivity is True:
+            self.df = self._sensitivity_df()
+
+    def _set_weights(self, rows, new):
+        ''' Set the ParSen weights of the observations at jco rows
+
+        Once the sensitivities have been calculated, the running sums of
+        squares are updated with the change in the squared weights, so
+        they always match the ParSen weights.
+
+        Parameters
+        ----------
+        rows : array
+            Unique jco row positions
+
+        new : array
+            New weight for each row
+        '''
+        if hasattr(self, '_sum_sq'):
+            old = self._sum_weights[rows]
+            x = self._jco_rows[rows]
+            if self._jco.issparse:
+                delta = np.asarray(x.multiply(x).T.dot(new**2 - old**2))
+            else:
+                delta = np.dot(new**2 - old**2, x**2)
+            # Guard against round-off taking a sum below zero
+            self._sum_sq = np.maximum(self._sum_sq + delta, 0.0)
+            self._sum_weights[rows] = new
+
+        par_weights = self._obs_data['ParSen_Weight'].values.copy()
+        par_weights[rows] = new
+        self._obs_data['ParSen_Weight'] = par_weights
+
+    @property
+    def _obs_rows(self):
+        '''
+        Series of jco row position, indexed by lower case observation name
+        '''
+        if not hasattr(self, '_obs_rows_series'):
+            self._obs_rows_series = pd.Series(
+                np.arange(len(self._jco.row_names)),
+                index=[ob.lower() for ob in self._jco.row_names])
+        return self._obs_rows_series
+
+    @property
+    def _jco_rows(self):
+        '''
+        jco array that supports fast row selection
+        '''
+        if not hasattr(self, '_jco_rows_x'):
+            x = self._jco.x
+            self._jco_rows_x = x.tocsr() if self._jco.issparse else x
+        return self._jco_rows_x
+
+    def _sensitivity_df(self):
+        '''
+        Build DataFrame of sensitivities from the running sums of squares
+        '''
+        # Get count of non-zero weights
+        n_nonzero_weights = np.count_nonzero(self._sum_weights)
+        sensitivities = np.sqrt(self._sum_sq)/n_nonzero_weights
 
         # Build Group Array
-        par_groups = []
-        for par in self.jco_df.columns:
-            par_group = self._pars_dict[par]
-            par_groups.append(par_group)
+        par_groups = [self._pars_dict[par] for par in self._jco.col_names]
 
         # Build pandas data frame of parameter sensitivities
         sen_data = {'Sensitivity': sensitivities, 'Parameter Group': par_groups}
-        df = pd.DataFrame(sen_data, index=self.jco_df.columns)
+        df = pd.DataFrame(sen_data, index=self._jco.col_names)
         return df
 
+    def scenarios(self, scenarios, chunk_size=10000):
+        ''' Calculate sensitivities for several observation subsets at once
+
+        The squared jco is reduced against a (scenarios x obs) matrix of
+        squared weights one block of observations at a time, so the jco
+        is only passed over once.  The current weights (after drop_regul,
+        drop_groups, etc.) are the starting point for every scenario, and
+        _obs_data is not modified.
+
+        Parameters
+        ----------
+        scenarios : dict or list of (name, selection) tuples
+            Selection is either a list of observation groups to keep, or an
+            array of weight multipliers (e.g. a boolean mask) with one entry
+            per observation, in the order of ParSen._obs_data.  An empty
+            selection keeps no observations, and gives a column of NaN.
+            Use an OrderedDict or a list of tuples to control the column
+            order.
+
+        chunk_size : int, optional
+            Number of observations to reduce at once
+
+        Returns
+        -------
+        Pandas DataFrame
+            Sensitivity of each parameter (rows) for each scenario (columns)
+
+        Raises
+        ------
+        ValueError
+            If a mask does not have one entry per observation
+        '''
+        if isinstance(scenarios, dict):
+            scenarios = scenarios.items()
+        weights = self._obs_data['ParSen_Weight'].values.astype(float)
+        ob_groups = self._obs_data['OBGNME'].str.lower().values
+
+        names = []
+        weights_sq = np.zeros((len(scenarios), len(weights)))
+        for i, (name, selection) in enumerate(scenarios):
+            # An empty selection is a list of no groups
+            if len(selection) == 0 or isinstance(selection[0], basestring):
+                mask = np.in1d(ob_groups, [g.lower() for g in selection])
+            else:
+                mask = np.asarray(selection, dtype=float)
+                if mask.shape != weights.shape:
+                    raise ValueError('ParSen.scenarios(): mask for '
+                                     + str(name) + ' has shape '
+                                     + str(mask.shape) + ', expected '
+                                     + str(weights.shape))
+            weights_sq[i] = (weights * mask)**2
+            names.append(name)
+
+        x = self._jco.x
+        if self._jco.issparse:
+            x = x.tocsr()
+        sum_sq = np.zeros((len(names), x.shape[1]))
+        for start in range(0, x.shape[0], chunk_size):
+            block = x[start:start+chunk_size]
+            if self._jco.issparse:
+                sum_sq += block.multiply(block).T.dot(
+                    weights_sq[:, start:start+chunk_size].T).T
+            else:
+                sum_sq += np.dot(weights_sq[:, start:start+chunk_size],
+                                 block**2)
+
+        n_nonzero_weights = np.count_nonzero(weights_sq, axis=1)\
+            .astype(float)
+        n_nonzero_weights[n_nonzero_weights == 0] = np.nan
+        sensitivities = np.sqrt(sum_sq)/n_nonzero_weights[:, np.newaxis]
+        return pd.DataFrame(sensitivities.T, index=self._jco.col_names,
+                            columns=names)
+
+    def group_scenarios(self, leave_one_out=False):
+        ''' Build scenarios for ParSen.scenarios() from the observation groups
+
+        Parameters
+        ----------
+        leave_one_out : {False, True}, optional
+            If False, one scenario per group with only that group.  If True,
+            one scenario per group with every group except that one (which
+            keeps no observations if there is only one group).
+
+        Returns
+        -------
+        list of (name, groups) tuples
+        '''
+        groups = sorted(self._obs_data['OBGNME'].str.lower().unique())
+        if leave_one_out:
+            return [('without ' + g, [o for o in groups if o != g])
+                    for g in groups]
+        return [(g, [g]) for g in groups]
+
+    def _in_groups(self, groups):
+        '''
+        Boolean mask of observations in groups
+        '''
+        return self._obs_data['OBGNME'].str.lower()\
+            .isin([g.lower() for g in groups]).values
+
+    def _in_obs(self, obs):
+        '''
+        Boolean mask of observations in obs
+        '''
+        return self._obs_data.index.str.lower()\
+            .isin([ob.lower() for ob in obs])
+
+    def _zero_weights(self, mask):
+        '''
+        Set the ParSen weights of the observations in mask to zero
+        '''
+        rows = np.flatnonzero(mask)
+        self._set_weights(rows, np.zeros(len(rows)))
+
     def drop_regul(self, calc_sensitivity = True):
         '''
         Recalculate sensitivity without regularization observations
         '''
-        for index, row in self._obs_data.iterrows():    
-            # Set weights for regularization info to zero
-            if 'regul' in row['OBGNME'].lower():
-                self._obs_data.set_value(index, 'ParSen_Weight', 0.0)
+        # Set weights for regularization info to zero
+        regul = self._obs_data['OBGNME'].str.lower().str.contains('regul')
+        self._zero_weights(regul.values)
         if calc_sensitivity is True:
             self.df = self.calc_sensitivity()
         
@@ -203,10 +495,8 @@ class ParSen(object):
         '''
         Recalculate sensitivity without groups
         '''
-        for index, row in self._obs_data.iterrows():    
-            # Set weights for obs in groups to zero
-            if row['OBGNME'].lower() in drop_groups:
-                self._obs_data.set_value(index, 'ParSen_Weight', 0.0)
+        # Set weights for obs in groups to zero
+        self._zero_weights(self._in_groups(drop_groups))
         if calc_sensitivity is True:
             self.df = self.calc_sensitivity()
 
@@ -214,10 +504,8 @@ class ParSen(object):
         '''
         Recalculate sensitivity with only groups
         '''
-        for index, row in self._obs_data.iterrows():
-            # Set weights for obs not in groups to zero
-            if row['OBGNME'].lower() not in keep_groups:
-                self._obs_data.set_value(index, 'ParSen_Weight', 0.0)
+        # Set weights for obs not in groups to zero
+        self._zero_weights(~self._in_groups(keep_groups))
         if calc_sensitivity is True:
             self.df = self.calc_sensitivity()
         
@@ -225,10 +513,8 @@ class ParSen(object):
         '''
         Recalculate sensitvity with only obs
         '''
-        for index, row in self._obs_data.iterrows():
-            # Set weights for obs not in keep_obs to zero
-            if row['OBGNME'].lower() not in keep_obs:
-                self._obs_data.set_value(index, 'ParSen_Weight', 0.0)
+        # Set weights for obs not in keep_obs to zero
+        self._zero_weights(~self._in_obs(keep_obs))
         if calc_sensitivity is True:
             self.df = self.calc_sensitivity()
         
@@ -236,10 +522,8 @@ class ParSen(object):
         '''
         Recalculate sensitivity without obs
         '''
-        for index, row in self._obs_data.iterrows():
-            # Set weights for obs in obs to zero
-            if row['OBGNME'].lower() in remove_obs:
-                self._obs_data.set_value(index, 'ParSen_Weight', 0.0)
+        # Set weights for obs in obs to zero
+        self._zero_weights(self._in_obs(remove_obs))
         if calc_sensitivity is True:
             self.df = self.calc_sensitivity()
            
@@ -257,8 +541,7 @@ class ParSen(object):
             Series of n_tail least sensitive parameters
 
         '''
-        return self.df.sort(columns='Sensitivity', ascending=False)\
-            .tail(n=n_tail)['Sensitivity']
+        return self.df.iloc[self._rank(-n_tail)]['Sensitivity']
 
     def head(self, n_head):
         ''' Get the most sensitive parameters
@@ -272,8 +555,7 @@ class ParSen(object):
         pandas Series
             Series of n_head most sensitive parameters
         '''
-        return self.df.sort(columns='Sensitivity', ascending=False)\
-            .head(n=n_head)['Sensitivity']
+        return self.df.iloc[self._rank(n_head)]['Sensitivity']
 
     def par(self, parameter):
         '''Return the sensitivity of a single parameter
@@ -309,19 +591,7 @@ class ParSen(object):
 
         '''
         group = group.lower()
-        if n is None:
-            n_head = len(self.df.index)
-        else:
-            n_head = n
-
-        if n_head > 0:
-            sensitivity = self.df.sort(columns='Sensitivity',
-                                       ascending = False).ix[self.df['Parameter Group'] == group].head(n=n_head)
-        if n_head < 0:
-            n_head = abs(n_head)
-            sensitivity = self.df.sort(columns='Sensitivity',
-                                       ascending = False).ix[self.df['Parameter Group'] == group].tail(n=n_head)
-
+        sensitivity = self.df.iloc[self._rank(n, group)]
         sensitivity.index.name = 'Parameter'
         return sensitivity
 
@@ -362,30 +632,9 @@ class ParSen(object):
         Matplotlib plot
             Bar plot of mean of sensitivity by parameter group
         '''
-        if n is None:
-            n_head = len(self.df.index)
-        else:
-            n_head = n
-
-        if group is None:
-
-            if n_head > 0:
-                sensitivity = self.df.sort(columns='Sensitivity',
-                                           ascending=False).head(n=n_head)
-            if n_head < 0:
-                n_head = abs(n_head)
-                sensitivity = self.df.sort(columns='Sensitivity',
-                                           ascending=False).tail(n=n_head)
-
         if group is not None:
             group = group.lower()
-            if n_head > 0:
-                sensitivity = self.df.sort(columns='Sensitivity',
-                                           ascending=False).ix[self.df['Parameter Group'] == group].head(n=n_head)         
-            if n_head < 0:
-                n_head = abs(n_head)
-                sensitivity = self.df.sort(columns='Sensitivity',
-                                           ascending=False).ix[self.df['Parameter Group'] == group].tail(n=n_head)
+        sensitivity = self.df.iloc[self._rank(n, group)]
 
         if 'ylabel' not in kwds:
             kwds['ylabel'] = 'Parameter'
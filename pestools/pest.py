@@ -5,13 +5,17 @@ Created on Fri Jan 16 13:35:24 2015
 @author: egc
 """
 import os
+import hashlib
 import numpy as np
 import pandas as pd
+import mat_handler
 from mat_handler import jco as Jco
 from mat_handler import cov as Cov
 from pst_handler import pst as Pst
 from Cor import Cor
 
+# Number of decompositions of the weighted jco kept in the SVD cache
+SVD_CACHE_ENTRIES = 4
 
 
 class Pest(object):
@@ -25,12 +29,27 @@ class Pest(object):
 
     basename : string
     pest basename or pest control file (includes path)
+
+    svd_cache : {True, False, str}, optional
+    folder to keep the SVD of the weighted jco in between sessions, so it is
+    not recomputed until the jco or the weights change.  True (default) for
+    basename + '.svd_cache' in the run folder, False to not keep it.
+
+    Pest is also a session: the jco, pst, residuals, covariance and
+    correlation are each loaded once, on first use, and reused until the
+    files they were loaded from change (by modification time and size) or
+    refresh() is called.  Objects created from the session (ParSen, IdentPar,
+    Res, Cor) share these artifacts, so the entries of the cached matrices
+    are read-only; ParSen gets a view of the jco (see matrix.view) that it
+    can reorder or drop rows from without changing the session's.  The
+    parameter_data and observation_data DataFrames are copies; jco_df is
+    shared and read-only.
     """
 
     def __init__(self, basename, obs_info_file=None, par_info_file=None,
                  name_col='Name', x_col='X', y_col='Y', type_col='Type',
                  error_col='Error', basename_col='basename', datetime_col='datetime', group_cols=[],
-                 obs_info_kwds={}):
+                 obs_info_kwds={}, svd_cache=True):
 
         self.basename = os.path.split(basename)[-1].split('.')[0]
         self.run_folder = os.path.split(basename)[0]
@@ -38,6 +57,15 @@ class Pest(object):
             self.run_folder = os.getcwd()
 
         self.pstfile = os.path.join(self.run_folder, self.basename + '.pst')
+        self.jcofile = os.path.join(self.run_folder, self.basename + '.jco')
+
+        # artifact name -> (file stamps, artifact)
+        self._artifacts = {}
+
+        if svd_cache is True:
+            svd_cache = os.path.join(self.run_folder,
+                                     self.basename + '.svd_cache')
+        self.svd_cache_dir = svd_cache if svd_cache else None
         
         # Thinking this will get pass along later to the Res class or similar
         self.obs_info_file = obs_info_file
@@ -56,39 +84,92 @@ class Pest(object):
         else:
             self.parinfo = pd.DataFrame()
 
+    def _cached(self, name, files, loader):
+        '''
+        Get a session artifact, loading it if it has not been loaded yet or
+        if any of the files it depends on have changed since it was loaded
+
+        Parameters
+        ----------
+        name : str
+            artifact name
+        files : list
+            files the artifact is loaded from
+        loader : callable
+            function that loads the artifact
+        '''
+        stamps = [Pst.file_stamp(f) if os.path.exists(f) else None
+                  for f in files]
+        if name in self._artifacts and self._artifacts[name][0] == stamps:
+            return self._artifacts[name][1]
+        artifact = loader()
+        if isinstance(artifact, mat_handler.matrix):
+            artifact.set_read_only()
+        self._artifacts[name] = (stamps, artifact)
+        return artifact
+
+    def refresh(self, *names):
+        '''
+        Drop cached session artifacts so they are reloaded on next use
+
+        Parameters
+        ----------
+        names : str, optional
+            artifacts to drop, e.g. 'jco', 'pst', 'res', 'cov', 'cor',
+            'qhalfx'.
+            All artifacts are dropped if none are given.
+        '''
+        if len(names) == 0:
+            self._artifacts = {}
+        for name in names:
+            self._artifacts.pop(name, None)
+
     def IdentPar(self, jco=None, par_info_file=None):
         '''
         IdentPar class
         '''
         from identpar import IdentPar
         if jco is None:
-            jco = self.pstfile.strip('pst')+'jco'
-        identpar = IdentPar(jco, par_info_file)
+            jco = self.jcofile
+        identpar = IdentPar(jco, par_info_file, pest=self)
         return identpar
     
+    def Watcher(self, **kwargs):
+        '''
+        Watcher class, to follow the run while PEST is running
+        '''
+        from watcher import Watcher
+        watcher = Watcher(os.path.join(self.run_folder, self.basename),
+                          pest=self, **kwargs)
+        return watcher
+
     @property    
     def _jco(self):
         '''
         Matrix class of jco
         '''
-        jco = Jco()
-        jco.from_binary(os.path.splitext(self.pstfile)[0]+'.jco')
-        return jco
+        def load():
+            jco = Jco()
+            jco.from_binary(self.jcofile)
+            return jco
+        return self._cached('jco', [self.jcofile], load)
+
     @property
     def jco_df(self):
         '''
-        DataFrame of jco
+        DataFrame of jco.  It is shared by the session and its values are
+        the read-only entries of the cached jco; copy it to modify it.
         '''
-        jco_df = self._jco.to_dataframe()
-        return jco_df
+        return self._cached('jco_df', [self.jcofile],
+                            lambda: self._jco.to_dataframe())
 
     @property
     def pst(self):
         '''
         Pst Class
         '''
-        pst = Pst(self.pstfile)
-        return pst
+        return self._cached('pst', [self.pstfile],
+                            lambda: Pst(self.pstfile))
         
 
     def ParSen(self, **kwargs):
@@ -96,7 +177,7 @@ class Pest(object):
         ParSen class
         '''
         from parsen import ParSen
-        parsen = ParSen(basename=self.pstfile, jco_df = self.jco_df,
+        parsen = ParSen(basename=self.pstfile, jco=self._jco.view(),
                         res_df = self.res_df, 
                         parameter_data = self.parameter_data, **kwargs)
         return parsen
@@ -114,33 +195,51 @@ class Pest(object):
         '''
         from res import Res
         #res_file = self.pstfile.rstrip('pst')+res_extension
-        res = Res(res_file, obs_info_file)
+        if obs_info_file is None or obs_info_file == self.obs_info_file:
+            res = Res(res_file, pest=self)
+        else:
+            res = Res(res_file, obs_info_file)
 
         return res
+
+    @property
+    def resfile(self):
+        '''
+        Residual file, basename.res or basename.rei
+        '''
+        resfile = os.path.join(self.run_folder, self.basename + '.res')
+        if not os.path.exists(resfile):
+            rei = os.path.join(self.run_folder, self.basename + '.rei')
+            if os.path.exists(rei):
+                resfile = rei
+        return resfile
     
     @property
     def res_df(self):
         '''
         Residual DataFrame
         '''
-        res = self.pst.res
-        return res
+        resfile = self.resfile
+        return self._cached('res', [resfile],
+                            lambda: self.pst.load_resfile(resfile))
 
     @property
     def parameter_data(self):
         '''
-        DataFrame of parameter data
+        DataFrame of parameter data, a copy of the session's parsed control
+        file data
         '''
-        parameter_data = self.pst.parameter_data
+        parameter_data = self.pst.parameter_data.copy()
         return parameter_data
         
     @property
     def observation_data(self):
         '''
-        DataFrame of observation data
+        DataFrame of observation data indexed by observation name, a copy
+        of the session's parsed control file data
         '''
-        observation_data = self.pst.observation_data
-        observation_data.index = observation_data.obsnme
+        observation_data = self.pst.observation_data.set_index('obsnme',
+                                                              drop=False)
         return observation_data
 
     @property
@@ -153,27 +252,87 @@ class Pest(object):
         
     @property
     def _cov(self):
-        weights = self.res_df['weight'].values
+        '''
+        Cov Matrix class of the parameter covariance
+        '''
+        return self._cached('cov', [self.pstfile, self.resfile, self.jcofile],
+                            self._calc_cov)
+
+    @property
+    def weights(self):
+        '''
+        Observation weights from the residuals, in jco row order
+        '''
+        weights = pd.Series(self.res_df['weight'].values,
+                            index=self.res_df['name'].values)
+        return weights.reindex(self._jco.row_names).fillna(0.0).values
+
+    @property
+    def normal_matrix(self):
+        '''
+        Cov Matrix class of the weighted normal matrix J^T*Q*J
+        '''
+        def load():
+            normal = mat_handler.normal_matrix(self._jco, self.weights)
+            return Cov(x=normal, names=self._jco.col_names)
+        return self._cached('normal_matrix',
+                            [self.resfile, self.jcofile], load)
+
+    @property
+    def qhalfx(self):
+        '''
+        Jco Matrix class of the weighted jco Q^(1/2)*J.  Its (economy) SVD
+        is computed the first time it is used and shared by the session,
+        and is kept in the SVD cache (see svd_cache) for later sessions.
+        '''
+        def load():
+            weights = self.weights
+            x = self._jco.x
+            if self._jco.issparse:
+                x = x.tocsr().multiply(weights[:, np.newaxis]).tocsr()
+            else:
+                x = x * weights[:, np.newaxis]
+            qhalfx = Jco(x=x, row_names=self._jco.row_names,
+                         col_names=self._jco.col_names)
+            qhalfx.set_svd_mode('economy')
+            if self.svd_cache_dir is not None:
+                try:
+                    qhalfx.svd_cache = mat_handler.svd_cache(
+                        self.svd_cache_dir, max_entries=SVD_CACHE_ENTRIES)
+                except OSError:
+                    # e.g. a read-only run folder, the SVD is not kept
+                    pass
+                # Keyed on the jco file and the weights, not the entries
+                qhalfx.svd_cache_id = '{} {} {}'.format(
+                    os.path.basename(self.jcofile),
+                    Pst.file_stamp(self.jcofile),
+                    hashlib.sha1(np.ascontiguousarray(weights,
+                                                      dtype=np.float64))
+                    .hexdigest())
+            return qhalfx
+        return self._cached('qhalfx', [self.resfile, self.jcofile], load)
+
+    def _calc_cov(self):
+        weights = self.weights
         phi = self.pst.phi
         pars = self._jco.col_names
         
         # Calc Covariance Matrix
         # See eq. 2.17 in PEST Manual
         # Note: Number of observations are number of non-zero weighted observations
-        q = np.diag(np.diag(np.tile(weights**2, (len(weights), 1))))
-        cov = np.dot((phi/(np.count_nonzero(weights)-len(pars))),
-                     (np.linalg.inv(np.dot(np.dot(self._jco.x.T, q),self._jco.x))))
-        cov = Cov(x=cov, names = pars)
+        cov = self.normal_matrix.inv
+        cov *= phi/(np.count_nonzero(weights)-len(pars))
         return cov
 
     @property
     def cov_df(self):
-        cov_df = self.cov.to_dataframe()
+        cov_df = self._cov.to_dataframe()
         return cov_df
         
     @property
     def cor(self):
-        return Cor(self._cov)
+        return self._cached('cor', [self.pstfile, self.resfile, self.jcofile],
+                            lambda: Cor(self._cov))
 
     def _read_obs_info_file(self, obs_info_file, name_col='Name', x_col='X', y_col='Y', type_col='Type',
                             error_col='Error', basename_col='basename', datetime_col='datetime', group_cols=[],
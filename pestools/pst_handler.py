@@ -1,25 +1,146 @@
 import os
+import re
 import copy
+import json
+from collections import OrderedDict
+from StringIO import StringIO
 import numpy as np
 import pandas
+from rec_handler import rec
 pandas.options.display.max_colwidth=100
 
+#--names of the positional entries on each line of the control data section
+CONTROL_DATA_FIELDS = [["rstfle", "pestmode"],
+                       ["npar", "nobs", "npargp", "nprior", "nobsgp",
+                        "maxcompdim", "derzerolim"],
+                       ["ntplfle", "ninsfle", "precis", "dpoint", "numcom",
+                        "jacfile", "messfile"],
+                       ["rlambda1", "rlamfac", "phiratsuf", "phiredlam",
+                        "numlam", "jacupdate"],
+                       ["relparmax", "facparmax", "facorig", "iboundstick",
+                        "upvecbend", "absparmax"],
+                       ["phiredswh", "noptswitch", "splitswh"],
+                       ["noptmax", "phiredstp", "nphistp", "nphinored",
+                        "relparstp", "nrelpar", "phistopthresh", "lastrun",
+                        "phiabandon"],
+                       ["icov", "icor", "ieig", "ires", "jcosave",
+                        "verboserec", "jcosaveitn", "reisaveitn",
+                        "parsaveitn", "parsaverun"]]
+
+#--control data entries that are text rather than numbers
+CONTROL_DATA_TEXT = ["rstfle", "pestmode", "precis", "dpoint"]
+
+#--snapshot format version, bump if the snapshot contents change
+SNAPSHOT_VERSION = 2
+
+#--parsed tables stored in the snapshot
+SNAPSHOT_TABLES = ["parameter_data", "tied", "observation_data",
+                   "prior_information", "parameter_groups",
+                   "model_input_output"]
+
+#--sections that are parsed into tables and not kept as text
+BULK_SECTIONS = ["parameter data", "observation data", "prior information"]
+
+#--residual file columns that are always numbers
+RES_FLOAT_COLUMNS = ["measured", "modelled", "residual", "weight"]
+
+#--number of parsed residual files kept by read_resfile()
+RESFILE_CACHE_SIZE = 4
+
+#--resfile name -> (file stamp, residual dataframe)
+_resfile_cache = OrderedDict()
+
+
+def read_resfile(resfile):
+    """read a residual (.res or .rei) file.  Numeric columns are read as
+        floats, observation names are lower cased in bulk and observation
+        groups are lower cased categoricals.  The parsed table is memoized
+        by file name, modification time and size, so the same (shared)
+        dataframe is returned until the file changes; copy it before
+        modifying it in place
+    Args:
+        resfile : [str] residual file name
+    Returns:
+        pandas.DataFrame with lower case column names
+    Raises:
+        Exception if the header line is not found
+    """
+    key = os.path.abspath(resfile)
+    stamp = pst.file_stamp(resfile)
+    if key in _resfile_cache and _resfile_cache[key][0] == stamp:
+        return _resfile_cache[key][1]
+
+    f = open(resfile, 'r')
+    while True:
+        line = f.readline()
+        if line == '':
+            f.close()
+            raise Exception("read_resfile(): EOF before finding " +
+                            "header in resfile: " + resfile)
+        lower = line.lower()
+        if "name" in lower and "residual" in lower:
+            header = lower.strip().split()
+            break
+    dtypes = dict([(col, np.float64) for col in RES_FLOAT_COLUMNS
+                   if col in header])
+    dtypes["name"] = object
+    dtypes["group"] = object
+    res_df = pandas.read_csv(f, header=None, names=header,
+                             delim_whitespace=True, dtype=dtypes)
+    f.close()
+
+    res_df["name"] = [n.lower() for n in res_df["name"].values]
+    #--lower case the group names once per group, not once per observation
+    codes, groups = pandas.factorize(res_df["group"].values)
+    lowered, lowered_codes = np.unique([g.lower() for g in groups],
+                                       return_inverse=True)
+    res_df["group"] = pandas.Categorical.from_codes(lowered_codes[codes],
+                                                    categories=lowered)
+
+    _resfile_cache[key] = (stamp, res_df)
+    while len(_resfile_cache) > RESFILE_CACHE_SIZE:
+        _resfile_cache.popitem(last=False)
+    return res_df
+
+def read_parfile(parfile):
+    """read a parameter value (.par or .bpa) file
+    Args:
+        parfile : [str] parameter value file name
+    Returns:
+        pandas.DataFrame with parnme (lower case), parval1, scale and
+        offset columns, indexed by parnme
+    Raises:
+        None
+    """
+    f = open(parfile, 'r')
+    header = f.readline()
+    par_df = pandas.read_csv(f, header=None,
+                             names=["parnme", "parval1", "scale", "offset"],
+                             sep="\s+", dtype={"parnme": object})
+    f.close()
+    par_df["parnme"] = [p.lower() for p in par_df["parnme"].values]
+    par_df.index = par_df.parnme
+    return par_df
+
 class pst(object):
     """basic class for handling pest control files to support linear analysis
     as well as replicate some of the functionality of the pest utilities
     """
-    def __init__(self,filename, load=True, resfile=None):
+    def __init__(self,filename, load=True, resfile=None, snapshot=True):
         """constructor of pst object
         Args:
             filename : [str] pest control file name
             load : [bool] flag for loading
             resfile : [str] residual filename
+            snapshot : [bool] flag to load from (and save) a binary snapshot
+                of the parsed control file, see pst.snapshot_filename
         Returns:
             None
         Raises:
             Assertion error if filename cannot be found
         """
         pass
+        self.snapshot = snapshot
         self.null_prior = pandas.DataFrame({"pilbl": None,
                                             "obgnme": None}, index=[])
         self.filename = filename
@@ -43,10 +164,17 @@ class pst(object):
                            "pargp": self.sfmt, "scale": self.ffmt,
                            "offset": self.ffmt, "dercom": self.ifmt}
         self.par_converters = {"parnme": str.lower, "pargp": str.lower}
+        self.par_dtypes = {"parnme": object, "partrans": object,
+                           "parchglim": object, "pargp": object}
         self.obs_fieldnames = "OBSNME OBSVAL WEIGHT OBGNME".lower().split()
         self.obs_format = {"obsnme": self.sfmt, "obsval": self.ffmt,
                            "weight": self.ffmt, "obgnme": self.sfmt}
         self.obs_converters = {"obsnme": str.lower, "obgnme": str.lower}
+        self.obs_dtypes = {"obsnme": object, "obgnme": object}
+        self.pargp_fieldnames = "PARGPNME INCTYP DERINC DERINCLB FORCEN " +\
+                                "DERINCMUL DERMTHD SPLITTHRESH SPLITRELDIFF " +\
+                                "SPLITACTION"
+        self.pargp_fieldnames = self.pargp_fieldnames.lower().split()
 
         self.prior_format = {"pilbl": self.sfmt, "equation": self.sfmt_long,
                              "obgnme": self.sfmt, "weight": self.ffmt}
@@ -204,95 +332,444 @@ class pst(object):
 
 
     def load_resfile(self,resfile):
-        """load the residual file
+        """load the residual file, see read_resfile()
+        Args:
+            resfile : [str] residual file name
+        Returns:
+            pandas.DataFrame that is a copy of the memoized table from
+            read_resfile(), so it can be modified in place
+        Raises:
+            Exception if the header line is not found
         """
-        pass
-        converters = {"name": str.lower, "group": str.lower}
-        f = open(resfile, 'r')
-        while True:
-            line = f.readline()
-            if line == '':
-                raise Exception("pst.get_residuals: EOF before finding "+
-                                "header in resfile: " + resfile)
-            if "name" in line.lower():
-                header = line.lower().strip().split()
-                break
-        res_df = pandas.read_csv(f, header=None, names=header, sep="\s+",
-                                 converters=converters)
-        f.close()
-        return res_df
+        return read_resfile(resfile).copy(deep=True)
 
 
     def load(self, filename):
-        """load the pest control file
+        """load the pest control file in a single read.  The parameter data,
+            observation data and prior information sections are parsed in
+            bulk and the text of every other section is kept in
+            self.sections.  The control data, parameter groups, model
+            command line and model input/output sections are parsed into
+            structured data.  If self.snapshot is True, the parsed data are
+            loaded from an up-to-date snapshot if there is one, otherwise a
+            snapshot is saved after parsing
+        Args:
+            filename : [str] pest control file name
+        Returns:
+            None
+        Raises:
+            Exception if a required section is missing or incomplete
         """
-        pass
-        f = open(filename, 'r')
-        f.readline()
-        f.readline()
-        line = f.readline()
-        raw = line.strip().split()
-        self.mode = raw[1].lower()
+        if self.snapshot and self.load_snapshot(filename):
+            return
+        self.sections = self.read_sections(filename)
+        for section in ["control data", "parameter data", "observation data"]:
+            if section not in self.sections:
+                raise Exception("pst.load(): section not found: * " + section)
+
+        self.control_data = self.__parse_control_data(
+            self.sections["control data"].splitlines())
+        self.mode = self.control_data["pestmode"].lower()
         if self.mode == "estimation":
             self.estimation = True
         else:
             self.estimation = False
-        raw = f.readline().strip().split()
-        npar, nobs, nprior = int(raw[0]), int(raw[1]), int(raw[3])
-        f.close()
-        f = open(filename, 'r')
-        while True:
-            line = f.readline()
-            if line == '':
-                raise Exception("EOF before parameter data section found")
-            if "* parameter data" in line.lower():
-                break
-        par = pandas.read_csv(f, header=None, names=self.par_fieldnames,
-                              nrows=npar,delimiter="\s+",
-                              converters=self.par_converters)
+        npar = self.control_data["npar"]
+        nobs = self.control_data["nobs"]
+        nprior = self.control_data["nprior"]
+
+        #--names are lowercased in bulk on the raw text
+        self.parameter_groups = self.__parse_table(
+            self.sections.get("parameter groups", '').lower(),
+            self.pargp_fieldnames,
+            {"pargpnme": object, "inctyp": object, "forcen": object,
+             "dermthd": object, "splitaction": object}, na_filter=True)
+
+        text = self.sections["parameter data"].lower()
+        par = self.__parse_table(text, self.par_fieldnames, self.par_dtypes,
+                                 nrows=npar)
+        if par.shape[0] < npar:
+            raise Exception("pst.load(): EOF during parameter data section")
         self.parameter_data = par
-        f.close()
-        f = open(filename, 'r')
-        while True:
-            line = f.readline()
-            if line == '':
-                raise Exception("EOF before obs data section found")
-            if "* observation data" in line.lower():
-                break
-        obs = pandas.read_csv(f, header=None, names=self.obs_fieldnames,
-                              nrows=nobs, delimiter="\s+",
-                              converters=self.obs_converters)
+        self.tied = self.__parse_table(text, ["parnme", "partied"],
+                                       {"parnme": object, "partied": object},
+                                       skiprows=npar)
+
+        text = self.sections["observation data"].lower()
+        obs = self.__parse_table(text, self.obs_fieldnames, self.obs_dtypes,
+                                 nrows=nobs)
+        if obs.shape[0] < nobs:
+            raise Exception("pst.load(): EOF during observation data section")
         self.observation_data = obs
-        f.close()
+
+        self.model_command_line = [line.strip() for line in
+                                   self.sections.get("model command line",
+                                                     '').splitlines()
+                                   if len(line.strip()) > 0]
+        self.model_input_output = self.__parse_model_io(
+            self.sections.get("model input/output", '').splitlines())
+
         if nprior == 0:
             self.prior_information = self.null_prior
         else:
-            pilbl, obgnme, weight, equation = [], [], [], []
-            f = open(filename,'r')
-            while True:
-                line = f.readline()
-                if line == '':
-                    raise Exception("EOF before prior information " +
-                                    "section found")
-                if "* prior information" in line.lower():
-                    for iprior in xrange(nprior):
-                        line = f.readline()
-                        if line == '':
-                            raise Exception("EOF during prior information " +
-                                            "section")
-                        raw = line.strip().split()
-                        pilbl.append(raw[0].lower())
-                        obgnme.append(raw[-1].lower())
-                        weight.append(float(raw[-2]))
-                        eq = ' '.join(raw[1:-2])
-                        equation.append(eq)
-                    break
-            f.close()
-            self.prior_information = pandas.DataFrame({"pilbl": pilbl,
-                                                       "equation": equation,
-                                                       "obgnme": obgnme,
-                                                       "weight": weight})
-            return
+            self.prior_information = self.__parse_prior(
+                self.sections.get("prior information", ''), nprior)
+        for section in BULK_SECTIONS:
+            self.sections.pop(section, None)
+        if self.snapshot:
+            self.save_snapshot(filename)
+
+
+    @staticmethod
+    def snapshot_filename(filename):
+        """the snapshot file for a pest control file: case.pst.npz
+        """
+        return filename + ".npz"
+
+
+    @staticmethod
+    def file_stamp(filename):
+        """the modification time and size of a file, used to invalidate
+            cached data
+        """
+        stat = os.stat(filename)
+        return [stat.st_mtime, stat.st_size]
+
+
+    def save_snapshot(self, filename):
+        """save the parsed control file data to a columnar .npz snapshot
+            next to the control file.  Text columns are stored as fixed
+            width byte strings, with repetitive columns (e.g. group names)
+            stored as unique values and integer codes.  Everything else is
+            stored as json metadata, with text decoded as latin-1 so any
+            bytes in the control file round trip unchanged.
+            Failure to write the snapshot file (e.g. a read-only directory)
+            is not an error
+        Args:
+            filename : [str] pest control file name
+        Returns:
+            bool : True if the snapshot was written
+        Raises:
+            any error other than IOError or OSError, which are caught
+        """
+        snap_file = self.snapshot_filename(filename)
+        tmp_file = snap_file + ".tmp" + str(os.getpid()) + ".npz"
+        arrays = {}
+        meta = {"version": SNAPSHOT_VERSION,
+                "stamp": self.file_stamp(filename),
+                "control_data": self.control_data,
+                "model_command_line": self.model_command_line,
+                "sections": list(self.sections.items()),
+                "tables": {}}
+        for table in SNAPSHOT_TABLES:
+            meta["tables"][table] = self.__snapshot_table(
+                table, getattr(self, table), arrays)
+        arrays["meta"] = np.array(json.dumps(meta, encoding="latin-1"))
+        try:
+            np.savez(tmp_file, **arrays)
+            if os.path.exists(snap_file):
+                os.remove(snap_file)
+            os.rename(tmp_file, snap_file)
+        except (IOError, OSError):
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return False
+        return True
+
+
+    def __snapshot_table(self, table, df, arrays):
+        """private method to add the columns and index of a table to the
+            snapshot arrays
+        Args:
+            table : [str] table name
+            df : [pandas.DataFrame] the table
+            arrays : [dict] snapshot arrays, updated in place
+        Returns:
+            dict : table metadata
+        Raises:
+            None
+        """
+        columns, text_columns, coded_columns = [], [], []
+        for icol, col in enumerate(df.columns):
+            key = table + '/' + str(icol)
+            values = df[col].values
+            if values.dtype == object:
+                isnull = pandas.isnull(values)
+                if isnull.any():
+                    arrays[key + "/null"] = isnull
+                values = values.astype(str)
+                text_columns.append(col)
+                uniques, codes = np.unique(values, return_inverse=True)
+                if uniques.shape[0] <= values.shape[0] / 2:
+                    arrays[key + "/uniques"] = uniques
+                    values = codes.astype(np.int32)
+                    coded_columns.append(col)
+            arrays[key] = values
+            columns.append(col)
+        #--the default integer index is rebuilt, any other index is stored
+        index = df.index
+        if index.dtype != object and \
+                index.equals(pandas.Index(np.arange(index.shape[0]))):
+            index_kind = "default"
+        elif index.dtype == object:
+            index_kind = "text"
+            arrays[table + "/index"] = index.values.astype(str)
+        else:
+            index_kind = "values"
+            arrays[table + "/index"] = index.values
+        return {"columns": columns, "text_columns": text_columns,
+                "coded_columns": coded_columns, "index": index_kind}
+
+
+    def load_snapshot(self, filename):
+        """load the parsed control file data from its snapshot if the
+            snapshot is up to date with the control file's modification
+            time and size.  A snapshot that can't be read is treated as
+            out of date
+        Args:
+            filename : [str] pest control file name
+        Returns:
+            bool : True if the snapshot was loaded
+        Raises:
+            None
+        """
+        snap_file = self.snapshot_filename(filename)
+        if not os.path.exists(snap_file):
+            return False
+        snap = None
+        try:
+            snap = np.load(snap_file)
+            meta = json.loads(str(snap["meta"]))
+            if meta.get("version") != SNAPSHOT_VERSION or \
+                    meta.get("stamp") != self.file_stamp(filename):
+                snap.close()
+                return False
+            tables = {}
+            for table in SNAPSHOT_TABLES:
+                tables[table] = self.__restore_table(
+                    table, meta["tables"][table], snap)
+            snap.close()
+            control_data = dict([(self.__snapshot_text(k),
+                                  self.__snapshot_text(v))
+                                 for k, v in meta["control_data"].items()])
+            model_command_line = [self.__snapshot_text(line) for line in
+                                  meta["model_command_line"]]
+            sections = OrderedDict([(self.__snapshot_text(k),
+                                     self.__snapshot_text(v))
+                                    for k, v in meta["sections"]])
+            mode = control_data["pestmode"].lower()
+        except Exception:
+            if snap is not None:
+                snap.close()
+            return False
+        for table in SNAPSHOT_TABLES:
+            setattr(self, table, tables[table])
+        self.control_data = control_data
+        self.model_command_line = model_command_line
+        self.sections = sections
+        self.mode = mode
+        self.estimation = self.mode == "estimation"
+        return True
+
+
+    def __restore_table(self, table, info, snap):
+        """private method to rebuild a table from the snapshot arrays
+        Args:
+            table : [str] table name
+            info : [dict] table metadata from __snapshot_table
+            snap : [numpy.lib.npyio.NpzFile] the snapshot
+        Returns:
+            pandas.DataFrame
+        Raises:
+            KeyError if the snapshot is incomplete
+        """
+        data = OrderedDict()
+        for icol, col in enumerate(info["columns"]):
+            key = table + '/' + str(icol)
+            values = snap[key]
+            if col in info["coded_columns"]:
+                values = snap[key + "/uniques"].astype(object)[values]
+            elif col in info["text_columns"]:
+                values = values.astype(object)
+            if key + "/null" in snap.files:
+                values[snap[key + "/null"]] = np.nan
+            data[str(col)] = values
+        df = pandas.DataFrame(data, columns=data.keys())
+        if info["index"] == "default":
+            df = df.reset_index(drop=True)
+        elif info["index"] == "text":
+            df.index = pandas.Index(snap[table + "/index"].astype(object),
+                                    dtype=object)
+        else:
+            df.index = snap[table + "/index"]
+        return df
+
+
+    @staticmethod
+    def __snapshot_text(value):
+        """private method to convert json text back to the byte strings it
+            was saved from, see save_snapshot
+        """
+        if isinstance(value, unicode):
+            return value.encode("latin-1")
+        return value
+
+
+    @staticmethod
+    def read_sections(filename):
+        """read a pest control file into its sections with a single read
+        Args:
+            filename : [str] pest control file name
+        Returns:
+            OrderedDict{section name : section text}.  Section names are the
+                lowercase header text after the "*".  PEST++ "++" option
+                lines are collected under "++" wherever they appear
+        Raises:
+            None
+        """
+        f = open(filename, 'r')
+        text = '\n' + f.read().replace('\r\n', '\n')
+        f.close()
+        #--find the section headers: lines that start with "*"
+        headers = []
+        pos = text.find('\n*')
+        while pos != -1:
+            headers.append(pos + 1)
+            pos = text.find('\n*', pos + 1)
+        sections = OrderedDict()
+        options = []
+        for ihead, start in enumerate(headers):
+            eol = text.find('\n', start)
+            if eol == -1:
+                eol = len(text)
+            name = text[start + 1:eol].strip().lower()
+            if ihead + 1 < len(headers):
+                end = headers[ihead + 1]
+            else:
+                end = len(text)
+            block = text[eol + 1:end]
+            if "++" in block:
+                lines = block.splitlines()
+                options.extend([line.strip() for line in lines
+                                if line.strip().startswith("++")])
+                block = '\n'.join([line for line in lines
+                                   if not line.strip().startswith("++")])
+            sections[name] = block
+        if len(options) > 0:
+            sections["++"] = '\n'.join(options)
+        return sections
+
+
+    def __parse_table(self, text, names, dtypes, nrows=None, skiprows=0,
+                      na_filter=False):
+        """parse whitespace-delimited text in bulk into a dataframe
+        Args:
+            text : [str] the table text
+            names : [list of str] the column names
+            dtypes : [dict] column name : dtype for the text columns
+            nrows : [int] number of rows to read.  None to read all rows
+            skiprows : [int] number of leading rows to skip
+            na_filter : [bool] flag to fill missing optional columns with
+                NaN.  Off by default so names like "nan" or "na" stay text
+        Returns:
+            pandas.DataFrame
+        Raises:
+            None
+        """
+        try:
+            return pandas.read_csv(StringIO(text), header=None, names=names,
+                                   sep="\s+", dtype=dtypes, nrows=nrows,
+                                   skiprows=skiprows, na_filter=na_filter)
+        except pandas.io.common.EmptyDataError:
+            return pandas.DataFrame(columns=names)
+
+
+    def __parse_control_data(self, lines):
+        """parse the control data section into a dict.  Entries are named
+            by position on each line (see CONTROL_DATA_FIELDS); text
+            keywords such as "lamforgive" or "noaui" are stored as
+            lowercase keys with a value of True
+        Args:
+            lines : [list of str] control data section lines
+        Returns:
+            dict
+        Raises:
+            Exception if the section is too short
+        """
+        if len(lines) < 2:
+            raise Exception("pst.load(): control data section is incomplete")
+        control_data = {}
+        for line, fields in zip(lines, CONTROL_DATA_FIELDS):
+            ifield = 0
+            for token in line.strip().split():
+                if ifield < len(fields) and fields[ifield] in CONTROL_DATA_TEXT:
+                    control_data[fields[ifield]] = token.lower()
+                    ifield += 1
+                    continue
+                try:
+                    val = float(token.lower().replace('d', 'e'))
+                except ValueError:
+                    control_data[token.lower()] = True
+                    continue
+                if int(val) == val and '.' not in token \
+                        and 'e' not in token.lower():
+                    val = int(val)
+                if ifield < len(fields):
+                    control_data[fields[ifield]] = val
+                    ifield += 1
+        for field in ["npar", "nobs", "nprior"]:
+            if field not in control_data:
+                raise Exception("pst.load(): control data missing " + field)
+        return control_data
+
+
+    def __parse_model_io(self, lines):
+        """parse the model input/output section
+        Args:
+            lines : [list of str] model input/output section lines
+        Returns:
+            pandas.DataFrame with columns type ("tpl" or "ins"), pest_file
+                and model_file
+        Raises:
+            None
+        """
+        ntpl = self.control_data.get("ntplfle", 0)
+        io_type, pest_file, model_file = [], [], []
+        for iline, line in enumerate(lines):
+            raw = line.strip().split()
+            if len(raw) < 2:
+                continue
+            io_type.append("tpl" if iline < ntpl else "ins")
+            pest_file.append(raw[0])
+            model_file.append(raw[1])
+        return pandas.DataFrame({"type": io_type, "pest_file": pest_file,
+                                 "model_file": model_file},
+                                columns=["type", "pest_file", "model_file"])
+
+
+    def __parse_prior(self, text, nprior):
+        """parse the prior information section, joining "&" continuation
+            lines onto the equation they continue
+        Args:
+            text : [str] prior information section text
+            nprior : [int] number of prior information equations
+        Returns:
+            pandas.DataFrame
+        Raises:
+            Exception if fewer than nprior equations are found
+        """
+        text = re.sub(r"\n[ \t]*&", ' ', text)
+        equations = [line.strip() for line in text.splitlines()
+                     if len(line.strip()) > 0]
+        if len(equations) < nprior:
+            raise Exception("pst.load(): EOF during prior information " +
+                            "section")
+        raws = [eq.split() for eq in equations[:nprior]]
+        return pandas.DataFrame({"pilbl": [raw[0].lower() for raw in raws],
+                                 "equation": [' '.join(raw[1:-2])
+                                              for raw in raws],
+                                 "obgnme": [raw[-1].lower() for raw in raws],
+                                 "weight": [float(raw[-2]) for raw in raws]})
 
 
     def write(self,new_filename):
@@ -562,13 +1039,8 @@ class pst(object):
             parfile = self.filename.replace(".pst", ".par")
         assert os.path.exists(parfile), "pst.parrep(): parfile not found: " +\
                                         str(parfile)
-        f = open(parfile, 'r')
-        header = f.readline()
-        par_df = pandas.read_csv(f, header=None,
-                                 names=["parnme", "parval1", "scale", "offset"],
-                                 sep="\s+")
+        par_df = read_parfile(parfile)
         self.parameter_data.index = self.parameter_data.parnme
-        par_df.index = par_df.parnme
         self.parameter_data.parval1 = par_df.parval1
 
 
@@ -673,27 +1145,17 @@ class pst(object):
         Raises:
             None
         """
-        iiter = 1
+        #--only the starting phi of each optimisation iteration
+        components = rec(recfile)
+        components.parse()
+        components = components.phi_components
+        components = components[(components["block"] == "starting") &
+                                (components["iteration"] > 0)]
         iters = {}
-        f = open(recfile,'r')
-        while True:
-            line = f.readline()
-            if line == '':
-                break
-            if "starting phi for this iteration" in line.lower():
-                contributions = {}
-                while True:
-                    line = f.readline()
-                    if line == '':
-                        break
-                    if "contribution to phi" not in line.lower():
-                        iters[iiter] = contributions
-                        iiter += 1
-                        break
-                    raw = line.strip().split()
-                    val = float(raw[-1])
-                    group = raw[-3].lower().replace('\"', '')
-                    contributions[group] = val
+        for iiter, group, phi in zip(components["iteration"],
+                                     components["group"],
+                                     components["phi"]):
+            iters.setdefault(int(iiter), {})[group] = phi
         return iters
 
 
@@ -0,0 +1,348 @@
+import os
+import re
+import numpy as np
+import pandas
+
+#--record file lines that are parsed, one alternative per kind of line.
+#--the outer group of each alternative names the kind of line
+REC_PATTERN = re.compile(r'^[ \t]*(?:' + "|".join([
+    r'(?P<k_iteration>OPTIMISATION ITERATION NO\.[ \t]*:'
+    r'[ \t]*(?P<iteration>\d+))',
+    r'(?P<k_initial>INITIAL CONDITIONS:)',
+    r'(?P<k_results>OPTIMISATION RESULTS)',
+    r'(?P<k_model_calls>Model calls so far[ \t]*:'
+    r'[ \t]*(?P<model_calls>\d+))',
+    r'(?P<k_total_calls>Total model calls[ \t]*:'
+    r'[ \t]*(?P<total_calls>\d+))',
+    r'(?P<k_reg_factor>Current regularisation weight factor[ \t]*[:=]'
+    r'[ \t]*(?P<reg_factor>\S+))',
+    r'(?P<k_meas_phi>Current value of measurement objective function'
+    r'[ \t]*[:=][ \t]*(?P<meas_phi>\S+))',
+    r'(?P<k_regul_phi>Current value of regularisation objective function'
+    r'[ \t]*[:=][ \t]*(?P<regul_phi>\S+))',
+    r'(?P<k_starting_phi>(?:Starting phi for this iteration|'
+    r'Sum of squared weighted residuals \(ie phi\))[ \t]*[:=]'
+    r'[ \t]*(?P<starting_phi>\S+))',
+    r'(?P<k_recalc_factor>Re-calculated regularisation weight factor'
+    r'[ \t]*:[ \t]*(?P<recalc_factor>\S+))',
+    r'(?P<k_recalc_phi>New starting objective function for this itn\.'
+    r' \(ie\. phi\)[ \t]*:[ \t]*(?P<recalc_phi>\S+))',
+    r'(?P<k_contribution>Contribution to phi from .*?group'
+    r'[ \t]*"(?P<group>[^"]+)"[ \t]*[:=][ \t]*(?P<contribution>\S+))',
+    r'(?P<k_lambda>Lambda =[ \t]*(?P<lambda>\S+)[ \t]*----->)',
+    r'(?P<k_trial_phi>Phi =[ \t]*(?P<trial_phi>\S+)[ \t]*\('
+    r'[ \t]*(?P<phi_ratio>\S+)'
+    r' (?:of|times) starting phi\))',
+    r'(?P<k_trial_meas>Meas\. fn\. =[ \t]*(?P<trial_meas>\S+))',
+    r'(?P<k_trial_regul>Regul\. fn\. =[ \t]*(?P<trial_regul>\S+))',
+    r'(?P<k_upgrade>Current parameter values[ \t]+'
+    r'Previous parameter values'
+    r'[^\n]*\n)',
+    r'(?P<k_max_change>Maximum (?P<change>relative|factor) change:'
+    r'[ \t]*(?P<max_change>\S+)[ \t]*\["(?P<max_change_par>[^"]+)"\])',
+    r'(?P<k_optimised>Optimised (?P<optimised>measurement objective '
+    r'function|regularisation objective function|regularisation weight '
+    r'factor)[ \t]*=[ \t]*(?P<optimised_value>\S+))']) + ')', re.MULTILINE)
+
+#--rows of a table of current and previous parameter values
+REC_UPGRADE_ROWS = re.compile(r'(?:[ \t]*\S+[ \t]+[-+0-9.Ee]+[ \t]+\S+'
+                              r'[ \t]+[-+0-9.Ee]+[ \t]*\r?\n)+')
+
+#--columns of rec.iterations
+REC_ITERATION_COLUMNS = ["model_calls", "reg_factor", "meas_phi", "regul_phi",
+                         "starting_phi", "recalc_factor", "recalc_phi",
+                         "max_relative_change", "max_relative_change_par",
+                         "max_factor_change", "max_factor_change_par"]
+
+
+def rec_float(text):
+    """convert a number from a record file to float.  Fortran drops the E
+        of three digit exponents (1.0000-100)
+    Args:
+        text : [str] number
+    Returns:
+        float
+    Raises:
+        ValueError if text is not a number
+    """
+    try:
+        return float(text)
+    except ValueError:
+        return float(re.sub(r'([0-9.])([+-][0-9]+)$', r'\1E\2', text))
+
+
+class rec(object):
+    """streaming parser for PEST run record (.rec) files.  Each call to
+        parse() only reads the text appended since the last call, so it
+        can follow a record file that is still being written.  The parser
+        state (offset and the current iteration) can be saved with
+        rec.state and resumed by passing it to the constructor
+    """
+    def __init__(self, filename, state=None, chunk_size=2**25):
+        """constructor of rec object
+        Args:
+            filename : [str] record file name
+            state : [dict] state from rec.state to resume parsing at, the
+                tables then only hold what is parsed after that state
+            chunk_size : [int] number of bytes to read at once
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.filename = filename
+        self.chunk_size = int(chunk_size)
+        self.offset = 0
+        self.iteration = None
+        self.block = None
+        self.finished = False
+        if state is not None:
+            self.offset = int(state["offset"])
+            self.iteration = state["iteration"]
+            self.block = state["block"]
+            self.finished = bool(state["finished"])
+        self.__iterations = {}
+        self.__components = []
+        self.__lambdas = []
+        self.__upgrades = []
+        self.summary = {}
+
+
+    @property
+    def state(self):
+        """parser state that parsing can be resumed from
+        """
+        return {"offset": self.offset, "iteration": self.iteration,
+                "block": self.block, "finished": self.finished}
+
+
+    def parse(self):
+        """parse the text appended to the record file since the last call.
+            A partly written line or parameter table is left for the next
+            call
+        Args:
+            None
+        Returns:
+            list of iterations with new information
+        Raises:
+            None
+        """
+        updated = set()
+        if not os.path.exists(self.filename):
+            return []
+        f = open(self.filename, 'rb')
+        chunk_size = self.chunk_size
+        while True:
+            f.seek(self.offset)
+            text = f.read(chunk_size)
+            at_eof = len(text) < chunk_size
+            #--only complete lines
+            end = text.rfind('\n') + 1
+            if end == 0:
+                if at_eof:
+                    break
+                chunk_size *= 2
+                continue
+            used = self.__parse_text(text[:end], updated)
+            self.offset += used
+            if at_eof:
+                break
+            if used == 0:
+                #--a table longer than the chunk
+                chunk_size *= 2
+        f.close()
+        return sorted(updated)
+
+
+    def __parse_text(self, text, updated):
+        """parse complete lines of text
+        Args:
+            text : [str] record file text ending with a newline
+            updated : [set] iterations with new information are added
+        Returns:
+            number of characters used, less than len(text) if text ends
+            with an incomplete parameter table
+        Raises:
+            None
+        """
+        pos = 0
+        while True:
+            m = REC_PATTERN.search(text, pos)
+            if m is None:
+                return len(text)
+            kind = m.lastgroup
+            pos = m.end()
+            if kind == "k_iteration":
+                self.iteration = int(m.group("iteration"))
+                self.block = None
+            elif kind == "k_initial":
+                self.iteration = 0
+                self.block = None
+            elif kind == "k_results":
+                self.finished = True
+                self.block = None
+            elif kind == "k_total_calls":
+                self.summary["total_model_calls"] = int(m.group("total_calls"))
+            elif kind == "k_optimised":
+                name = "optimised " + m.group("optimised")
+                self.summary[name] = rec_float(m.group("optimised_value"))
+            elif self.iteration is None:
+                continue
+            elif kind == "k_contribution":
+                if self.block is not None:
+                    self.__components.append(
+                        (self.iteration, self.block,
+                         m.group("group").lower(),
+                         rec_float(m.group("contribution"))))
+            elif kind == "k_starting_phi":
+                value = rec_float(m.group("starting_phi"))
+                if self.finished:
+                    self.block = "final"
+                    self.summary["phi"] = value
+                else:
+                    self.block = "starting"
+                    self.__set(self.iteration, "starting_phi", value)
+            elif kind == "k_recalc_phi":
+                self.block = "recalculated"
+                self.__set(self.iteration, "recalc_phi",
+                           rec_float(m.group("recalc_phi")))
+            elif kind == "k_lambda":
+                self.block = None
+                self.__lambdas.append([self.iteration,
+                                       rec_float(m.group("lambda")),
+                                       np.nan, np.nan, np.nan, np.nan])
+            elif kind in ["k_trial_phi", "k_trial_meas", "k_trial_regul"]:
+                if len(self.__lambdas) == 0 or \
+                        self.__lambdas[-1][0] != self.iteration:
+                    continue
+                trial = self.__lambdas[-1]
+                if kind == "k_trial_phi":
+                    trial[2] = rec_float(m.group("trial_phi"))
+                    trial[3] = rec_float(m.group("phi_ratio"))
+                elif kind == "k_trial_meas":
+                    trial[4] = rec_float(m.group("trial_meas"))
+                else:
+                    trial[5] = rec_float(m.group("trial_regul"))
+            elif kind == "k_upgrade":
+                rows = REC_UPGRADE_ROWS.match(text, pos)
+                if rows is None or rows.end() == len(text):
+                    #--wait for the rest of the table
+                    return m.start()
+                self.__parse_upgrade(rows.group(0))
+                pos = rows.end()
+            elif kind == "k_max_change":
+                change = "max_" + m.group("change") + "_change"
+                self.__set(self.iteration, change,
+                           rec_float(m.group("max_change")))
+                self.__set(self.iteration, change + "_par",
+                           m.group("max_change_par").lower())
+            else:
+                #--iteration header values
+                name = kind[2:]
+                value = m.group(name)
+                value = int(value) if name == "model_calls" else \
+                    rec_float(value)
+                self.__set(self.iteration, name, value)
+            updated.add(self.iteration)
+
+
+    def __set(self, iteration, name, value):
+        """set a value of an iteration
+        """
+        if iteration not in self.__iterations:
+            self.__iterations[iteration] = {}
+        self.__iterations[iteration][name] = value
+
+
+    def __parse_upgrade(self, text):
+        """parse a table of current and previous parameter values
+        Args:
+            text : [str] table lines
+        Returns:
+            None
+        Raises:
+            None
+        """
+        tokens = np.array(text.split())
+        if tokens.shape[0] % 4 != 0:
+            #--not the two column layout
+            return
+        tokens = tokens.reshape(-1, 4)
+        self.__upgrades.append(
+            (self.iteration, np.char.lower(tokens[:, 0]),
+             np.array([rec_float(t) for t in tokens[:, 1]]),
+             np.array([rec_float(t) for t in tokens[:, 3]])))
+
+
+    @property
+    def iterations(self):
+        """pandas.DataFrame of values for each iteration (0 is the initial
+            conditions), indexed by iteration
+        """
+        iterations = pandas.DataFrame.from_dict(self.__iterations,
+                                                orient="index")
+        iterations = iterations.reindex(columns=REC_ITERATION_COLUMNS)
+        iterations.index.name = "iteration"
+        return iterations
+
+
+    @property
+    def phi_components(self):
+        """pandas.DataFrame of phi contributions by group.  block is
+            'starting' for the starting phi of an iteration (and the
+            initial conditions), 'recalculated' for the starting phi after
+            the regularisation weight factor is re-calculated and 'final'
+            for the optimised phi
+        """
+        return pandas.DataFrame(self.__components,
+                                columns=["iteration", "block", "group",
+                                         "phi"])
+
+
+    @property
+    def lambdas(self):
+        """pandas.DataFrame of the lambda trials of each iteration
+        """
+        return pandas.DataFrame(self.__lambdas,
+                                columns=["iteration", "lambda", "phi",
+                                         "phi_ratio", "meas_phi",
+                                         "regul_phi"])
+
+
+    @property
+    def upgrades(self):
+        """pandas.DataFrame of the parameter values after (value) and
+            before (previous) each iteration's upgrade
+        """
+        if len(self.__upgrades) == 0:
+            return pandas.DataFrame(columns=["iteration", "parnme", "value",
+                                             "previous"])
+        return pandas.DataFrame(
+            {"iteration": np.concatenate(
+                [np.repeat(i, len(p)) for i, p, v, pv in self.__upgrades]),
+             "parnme": np.concatenate([p for i, p, v, pv in self.__upgrades]),
+             "value": np.concatenate([v for i, p, v, pv in self.__upgrades]),
+             "previous": np.concatenate(
+                 [pv for i, p, v, pv in self.__upgrades])},
+            columns=["iteration", "parnme", "value", "previous"])
+
+
+    def phi_by_group(self, block="starting"):
+        """phi contribution by group for each iteration
+        Args:
+            block : [str] 'starting', 'recalculated' or 'final', see
+                rec.phi_components
+        Returns:
+            pandas.DataFrame indexed by iteration with a column per group
+        Raises:
+            None
+        """
+        components = self.phi_components
+        components = components[components["block"] == block]
+        if len(components) == 0:
+            return pandas.DataFrame(index=pandas.Index([], name="iteration"))
+        phi_by_group = components.pivot_table(index="iteration",
+                                              columns="group", values="phi",
+                                              aggfunc="last")
+        phi_by_group.index.name = "iteration"
+        return phi_by_group
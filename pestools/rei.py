@@ -1,12 +1,71 @@
 __author__ = 'aleaf'
 
 import os
+from itertools import izip
+from multiprocessing import Pool
 import numpy as np
 import pandas as pd
 from res import Res
 from pest import Pest
+from pst_handler import read_resfile
 from matplotlib.backends.backend_pdf import PdfPages
 
+# Total size of rei files (bytes) below which read_reis() reads them in
+# this process unless a number of processes is given; starting the pool
+# and sending the tables back costs more than reading small files
+PARALLEL_MIN_BYTES = 50 * 2**20
+
+
+def _read_rei(reifile):
+    """Read one rei file.  Module level so it can be run by a process pool.
+    """
+    return read_resfile(reifile)
+
+
+def iread_reis(reifiles, processes=None):
+    """Read rei files in a process pool, yielding each table in the order
+    of reifiles as soon as it (and the ones before it) have been read.
+    See read_reis.
+    """
+    if processes is None and \
+            sum([os.path.getsize(f) for f in reifiles]) < PARALLEL_MIN_BYTES:
+        processes = 1
+    if processes == 1 or len(reifiles) < 2:
+        for f in reifiles:
+            yield _read_rei(f)
+        return
+    pool = Pool(processes)
+    try:
+        for res_df in pool.imap(_read_rei, reifiles):
+            yield res_df
+    finally:
+        pool.close()
+        pool.join()
+
+
+def read_reis(reifiles, processes=None):
+    """Read rei files in a process pool
+
+    Parameters
+    ----------
+    reifiles : list
+        rei files to read
+
+    processes : int, optional
+        Number of worker processes.  By default the number of cpus are used
+        if the files total more than PARALLEL_MIN_BYTES, otherwise the files
+        are read in this process, as they are with 1.  On Windows, scripts
+        that use more than one process need an
+        ``if __name__ == '__main__':`` guard.
+
+    Returns
+    -------
+    list of DataFrames
+        Residuals from each file, as returned by pst_handler.read_resfile
+    """
+    return list(iread_reis(reifiles, processes=processes))
+
+
 
 class Rei(object):
     """
@@ -33,10 +92,34 @@ class Rei(object):
         column in obs_info_file containing observation types (e.g. heads, fluxes, etc). A single
         type ('observation') is assigned in the absence of type information
 
+    pest : Pest, optional
+        Pest session to share the parsed control file and observation
+        information with.  A new session is created if not provided.
+
+    processes : int, optional
+        Number of worker processes used to read the rei files, default is
+        the number of cpus
+
+    dtype : numpy dtype, default float32
+        dtype of the stored modelled values, residuals and weights
+
     Attributes
     ----------
-    df : DataFrame
-        contains all of the information from the res or rei file; is used to build phi dataframe
+    modelled, residual : ndarray
+        (iteration x observation) arrays of modelled values and residuals,
+        rows in the order of loaded_iterations and columns in the order of
+        obsnme.  Filled by load().
+
+    weight : ndarray
+        observation weights, one row per iteration if they changed between
+        iterations (e.g. regularisation weight factors), otherwise a single
+        row shared by all iterations
+
+    obsnme, obgnme, measured : Index, Categorical, ndarray
+        observation names, groups and measured values, stored once
+
+    loaded_iterations : list
+        iteration numbers of the rows of the iteration arrays
 
     phi_by_group : DataFrame
         contains phi contribution by group for each iteration
@@ -65,7 +148,10 @@ class Rei(object):
 
     Methods
     -------
-    one2one_plots()
+    load()
+    trajectory()
+    get_phi()
+    plot_one2ones()
 
 
     Notes
@@ -76,48 +162,252 @@ class Rei(object):
     def __init__(self, basename, obs_info_file=None, name_col='Name',
                  x_col='X', y_col='Y', type_col='Type',
                  basename_col='basename', datetime_col='datetime', group_cols=[],
-                 **kwds):
+                 pest=None, processes=None, dtype=np.float32, **kwds):
 
-        #Pest.__init__(self, basename, obs_info_file=obs_info_file)
         self.basename = basename
-        self._Pest = Pest(basename, obs_info_file=obs_info_file)
+        if pest is None:
+            pest = Pest(basename, obs_info_file=obs_info_file, name_col=name_col,
+                        x_col=x_col, y_col=y_col, type_col=type_col,
+                        basename_col=basename_col, datetime_col=datetime_col,
+                        group_cols=group_cols)
+        self._Pest = pest
+        self.run_folder = self._Pest.run_folder
+        self.processes = processes
         self.obsinfo = self._Pest.obsinfo
         self.obs_groups = self._Pest.obs_groups
+        self.reggroups = [g for g in self.obs_groups if 'regul' in g.lower()]
+        self.obsgroups = [g for g in self.obs_groups if g not in self.reggroups]
         self._obstypes = pd.DataFrame({'Type': ['observation'] * len(self.obs_groups)}, index=self.obs_groups)
 
-        #self.phi = self.obsinfo.copy()
+        self.dtype = dtype
+        self.obsnme = None
+        self.obgnme = None
+        self.measured = None
+        self.loaded_iterations = []
+        self._modelled = None
+        self._residual = None
+        self._weight = None
+
         self.phi = pd.DataFrame()
         self.phi_by_group = pd.DataFrame(columns=self.obs_groups)
         self.phi_by_type = pd.DataFrame()
         self.phi_by_component = pd.DataFrame()
 
-        # list rei files for run
-        reifiles = [f for f in os.listdir(os.path.split(basename)[0])
-                    if os.path.split(basename)[1] + '.rei' in f]
-
-        # sort by iteration number (may not be the most elegant approach)
         self.reifiles = {}
-        for f in reifiles:
-            try:
-                i = int(f.split('.')[-1])
-                self.reifiles[i] = os.path.join(self.run_folder, f)
-            except:
-                continue
+        self.find_reifiles()
         # for SVDA runs, may not have .0 (initial) rei file. Get rei file for base run.
         if 0 not in self.reifiles.keys():
             self._read_svda()
-            self.reifiles[0] = os.path.join(self.run_folder, self.BASEPESTFILE[:-4] + '.rei')
+            if self.BASEPESTFILE is not None:
+                reifile = os.path.join(self.run_folder,
+                                       os.path.splitext(self.BASEPESTFILE)[0] + '.rei')
+                if os.path.exists(reifile):
+                    self.reifiles[0] = reifile
+
+    def find_reifiles(self):
+        """List the rei files of the run folder into Rei.reifiles, keyed by
+        iteration number.  Can be called again to pick up new files.
+
+        Returns
+        -------
+        list
+            iteration numbers of rei files not found before
+        """
+        prefix = self._Pest.basename + '.rei.'
+        new = []
+        for f in os.listdir(self.run_folder):
+            if f.lower().startswith(prefix.lower()):
+                try:
+                    i = int(f[len(prefix):])
+                except ValueError:
+                    continue
+                if i not in self.reifiles:
+                    self.reifiles[i] = os.path.join(self.run_folder, f)
+                    new.append(i)
+        return sorted(new)
+
+    def _read_svda(self):
+        """Get the base PEST control file from the svd assist section of the
+        control file (None if it is not an SVD-assisted run)
+        """
+        self.BASEPESTFILE = None
+        svda = self._Pest.pst.sections.get('svd assist', '').split()
+        if len(svda) > 0:
+            self.BASEPESTFILE = svda[0]
+
+    @property
+    def iterations(self):
+        """Sorted list of iteration numbers with rei files
+        """
+        return sorted(self.reifiles.keys())
+
+    def load(self, processes=None):
+        """Read all of the rei files in a process pool (see read_reis) into
+        the iteration arrays
+
+        Parameters
+        ----------
+        processes : int, optional
+            Number of worker processes, default is Rei.processes
+        """
+        if processes is None:
+            processes = self.processes
+        iterations = [i for i in self.iterations
+                      if i not in self.loaded_iterations]
+        reifiles = [self.reifiles[i] for i in iterations]
+        for i, res_df in izip(iterations, iread_reis(reifiles, processes)):
+            self.add_iteration(i, res_df)
+
+    def add_iteration(self, iteration, res_df):
+        """Add the residuals of one iteration to the iteration arrays
+
+        Parameters
+        ----------
+        iteration : int
+            iteration number
+
+        res_df : DataFrame
+            residuals as returned by pst_handler.read_resfile.  The first
+            iteration added sets the observations; observations missing
+            from later iterations are NaN.
+        """
+        if iteration in self.loaded_iterations:
+            raise ValueError('Rei.add_iteration(): iteration {} is already '
+                             'loaded'.format(iteration))
+        if self.obsnme is None:
+            nobs = len(res_df)
+            self.obsnme = pd.Index(res_df['name'].values)
+            self.obgnme = pd.Categorical(res_df['group'])
+            self.measured = res_df['measured'].values.astype(np.float64)
+            self._modelled = np.empty((1, nobs), dtype=self.dtype)
+            self._residual = np.empty((1, nobs), dtype=self.dtype)
+            self._weight = res_df['weight'].values.astype(self.dtype)
+        elif not np.array_equal(res_df['name'].values, self.obsnme.values):
+            res_df = res_df.set_index('name').reindex(self.obsnme)
+
+        row = len(self.loaded_iterations)
+        self._modelled = self.__grow(self._modelled, row + 1)
+        self._residual = self.__grow(self._residual, row + 1)
+        self._modelled[row] = res_df['modelled'].values
+        self._residual[row] = res_df['residual'].values
+
+        weight = res_df['weight'].values.astype(self.dtype)
+        if self._weight.ndim == 1 and \
+                not np.array_equal(weight, self._weight):
+            # weights changed, keep a row of weights per iteration from now on
+            shared = self._weight
+            self._weight = np.empty(self._residual.shape, dtype=self.dtype)
+            self._weight[:row] = shared
+        if self._weight.ndim == 2:
+            self._weight = self.__grow(self._weight, row + 1)
+            self._weight[row] = weight
+        self.loaded_iterations.append(iteration)
+
+    def __grow(self, x, nrows):
+        """Make room for nrows in an iteration array, doubling its capacity
+        so that adding iterations one at a time stays cheap
+        """
+        if x.shape[0] >= nrows:
+            return x
+        grown = np.empty((max(nrows, 2 * x.shape[0]), x.shape[1]),
+                         dtype=x.dtype)
+        grown[:x.shape[0]] = x
+        return grown
+
+    @property
+    def modelled(self):
+        """(iteration x observation) array of modelled values
+        """
+        return self._modelled[:len(self.loaded_iterations)]
+
+    @property
+    def residual(self):
+        """(iteration x observation) array of residuals
+        """
+        return self._residual[:len(self.loaded_iterations)]
+
+    @property
+    def weight(self):
+        """observation weights, (iteration x observation) if they changed
+        between iterations, otherwise one row for all iterations
+        """
+        if self._weight.ndim == 1:
+            return self._weight
+        return self._weight[:len(self.loaded_iterations)]
+
+    @property
+    def weighted_residual(self):
+        """(iteration x observation) array of weighted residuals
+        """
+        return self.residual * self.weight
+
+    def trajectory(self, obsnme, values='residual'):
+        """Values of observations for each loaded iteration
+
+        Parameters
+        ----------
+        obsnme : str or list
+            observation name(s)
+
+        values : {'residual', 'modelled', 'weighted_residual', 'weight'}
+            values to get
+
+        Returns
+        -------
+        Pandas Series (one observation) or DataFrame (columns are the
+        observations) indexed by iteration
+        """
+        if self.obsnme is None:
+            self.load()
+        names = [obsnme] if isinstance(obsnme, basestring) else list(obsnme)
+        cols = self.obsnme.get_indexer([n.lower() for n in names])
+        if (cols < 0).any():
+            raise KeyError('Rei.trajectory(): observations not found: ' +
+                           str([n for n, c in zip(names, cols) if c < 0]))
+        x = getattr(self, values)
+        if x.ndim == 1:
+            x = np.repeat(x[np.newaxis], len(self.loaded_iterations), axis=0)
+        df = pd.DataFrame(x[:, cols], index=self.loaded_iterations,
+                          columns=self.obsnme[cols])
+        df.index.name = 'Pest iteration'
+        if isinstance(obsnme, basestring):
+            return df.iloc[:, 0]
+        return df
+
+    def res(self, iteration):
+        """Res object for one iteration, using the loaded residuals
+
+        Parameters
+        ----------
+        iteration : int
+            iteration number
+        """
+        if iteration not in self.loaded_iterations:
+            self.load()
+        row = self.loaded_iterations.index(iteration)
+        weight = self.weight if self.weight.ndim == 1 else self.weight[row]
+        res_df = pd.DataFrame({'name': self.obsnme.values,
+                               'group': self.obgnme,
+                               'measured': self.measured,
+                               'modelled': self.modelled[row],
+                               'residual': self.residual[row],
+                               'weight': weight},
+                              columns=['name', 'group', 'measured',
+                                       'modelled', 'residual', 'weight'])
+        return Res(self.reifiles[iteration], pest=self._Pest, res_df=res_df)
 
     def plot_one2ones(self, groupinfo, outpdf='', **kwds):
 
         if len(outpdf) == 0:
             outpdf = self.basename + '_reis.pdf'
 
+        self.load()
+
         print 'plotting...'
         pdf = PdfPages(outpdf)
-        for i in self.reifiles.iterkeys():
+        for i in self.iterations:
             print '{}'.format(self.reifiles[i])
-            r = Res(self.reifiles[i])
+            r = self.res(i)
             fig, ax = r.plot_one2one(groupinfo, title='Iteration {}'.format(i), **kwds)
 
             pdf.savefig(fig, **kwds)
@@ -126,33 +416,42 @@ class Rei(object):
 
     def get_phi(self):
         print 'getting phi by group for each iteration...'
-        for i in self.reifiles.iterkeys():
-            print '{}'.format(self.reifiles[i])
-            r = Res(self.reifiles[i])
-            phi = r.phi.Weighted_Sq_Residual
-            #phi.name = i
-            self.phi[i] = phi
-            #self.phi = self.phi.append(phi.T)
-            #self.phi_by_group = self.phi_by_group.append(phi.T)
-            #self.phi_by_group.index.name = 'Pest iteration'
+        self.load()
+
+        # weighted squared residual of each observation, one column per iteration
+        phi = self.weighted_residual.astype(np.float64)**2
+        self.phi = pd.DataFrame(phi.T, index=self.obsnme,
+                                columns=self.loaded_iterations)
+
+        # phi by group for each iteration, summing each row by group code
+        niter, ngroups = phi.shape[0], len(self.obgnme.categories)
+        codes = self.obgnme.codes + ngroups * np.arange(niter)[:, np.newaxis]
+        phi_by_group = np.bincount(codes.ravel(),
+                                   weights=np.nan_to_num(phi).ravel(),
+                                   minlength=niter * ngroups)
+        self.phi_by_group = pd.DataFrame(phi_by_group.reshape(niter, ngroups),
+                                         index=self.loaded_iterations,
+                                         columns=list(self.obgnme.categories))
+        self.phi_by_group.index.name = 'Pest iteration'
 
         # get phi just for observation groups
-        self.phi_obs_by_group = self.phi_by_group.ix[:, self.obsgroups]
+        obsgroups = [g for g in self.phi_by_group.columns if g not in self.reggroups]
+        reggroups = [g for g in self.phi_by_group.columns if g in self.reggroups]
+        self.phi_obs_by_group = self.phi_by_group.ix[:, obsgroups]
 
-        # get phi by observation type for each iteration
+        # get phi by observation type for each iteration (rebuilt from
+        # scratch, so iterations loaded since the last call are included)
+        self.phi_by_type = pd.DataFrame(index=self.phi_by_group.index)
         for type in np.unique(self._obstypes.Type):
-            typegroups = self._obstypes[self._obstypes.Type == type].index.tolist()
+            typegroups = [g for g in self._obstypes[self._obstypes.Type == type].index
+                          if g in self.phi_by_group.columns]
             self.phi_by_type[type] = self.phi_by_group.ix[:, typegroups].sum(axis=1)
             self.phi_by_type.index.name = 'Pest iteration'
 
         # get phi by component for each iteration
+        self.phi_by_component = pd.DataFrame(index=self.phi_by_group.index)
         self.phi_by_component['Measurement Phi'] = self.phi_obs_by_group.sum(axis=1)
-        if len(self.reggroups) > 0:
-            self.phi_by_component['Regularisation Phi'] = self.phi_by_group.ix[:, self.reggroups].sum(axis=1)
+        if len(reggroups) > 0:
+            self.phi_by_component['Regularisation Phi'] = self.phi_by_group.ix[:, reggroups].sum(axis=1)
         self.phi_by_component['Phi Total'] = self.phi_by_component.sum(axis=1)
         self.phi_by_component.index.name = 'Pest iteration'
-
-
-
-
-
@@ -4,8 +4,18 @@ import pandas as pd
 import plots
 from pest import Pest
 import numpy as np
+from pst_handler import read_resfile
 #from pst_handler import pst as Pst
 
+# Column names used by Res for the (lower case) residual file columns
+RES_COLUMNS = {'name': 'Name', 'group': 'Group', 'measured': 'Measured',
+               'modelled': 'Modelled', 'residual': 'Residual',
+               'weight': 'Weight', 'weight*measured': 'Weight*Measured',
+               'weight*modelled': 'Weight*Modelled',
+               'weight*residual': 'Weight*Residual',
+               'measurement_sd': 'Measurement_sd',
+               'natural_weight': 'Natural_weight'}
+
 
 class Res(object):
     """ Res Class
@@ -31,6 +41,14 @@ class Res(object):
         column in obs_info_file containing observation types (e.g. heads, fluxes, etc). A single
         type ('observation') is assigned in the absence of type information
 
+    pest : Pest, optional
+        Pest session to share loaded artifacts (control file, observation
+        information) with.  A new session is created if not provided.
+
+    res_df : DataFrame, optional
+        Residuals as returned by pst_handler.read_resfile, used instead of
+        reading res_file
+
     Attributes
     ----------
     df : DataFrame
@@ -51,15 +69,18 @@ class Res(object):
     def __init__(self, res_file, obs_info_file=None, name_col='Name',
                  x_col='X', y_col='Y', type_col='Type',
                  basename_col='basename', datetime_col='datetime', group_cols=[],
-                 obs_info_kwds={},
+                 obs_info_kwds={}, pest=None, res_df=None,
                  **kwds):
 
         # Expose the Pest class for convience but not all attributes make sense
-        # when dealing with the Res class alone so make private
-        self._Pest = Pest(res_file, obs_info_file=obs_info_file, name_col=name_col,
-                                           x_col=x_col, y_col=y_col, type_col=type_col,
-                                           basename_col=basename_col, datetime_col=datetime_col,
-                                           group_cols=group_cols, obs_info_kwds=obs_info_kwds)
+        # when dealing with the Res class alone so make private.  A Pest
+        # session can be passed in to share its loaded artifacts.
+        if pest is None:
+            pest = Pest(res_file, obs_info_file=obs_info_file, name_col=name_col,
+                        x_col=x_col, y_col=y_col, type_col=type_col,
+                        basename_col=basename_col, datetime_col=datetime_col,
+                        group_cols=group_cols, obs_info_kwds=obs_info_kwds)
+        self._Pest = pest
         '''
         if obs_info_file is not None:
             self._Pest._read_obs_info_file(obs_info_file=obs_info_file, name_col=name_col,
@@ -73,17 +94,12 @@ class Res(object):
         self._obstypes = pd.DataFrame({'Type': ['observation'] * len(self.obs_groups)}, index=self.obs_groups)
 
 
-        check = open(res_file, 'r')
-        line_num = 0
-        while True:
-            current_line = check.readline()
-            if "name" in current_line.lower() and "residual" in current_line.lower():
-                break
-            else:
-                line_num += 1
-
-        self.df = pd.read_csv(res_file, skiprows=line_num, delim_whitespace=True)
-        self.df.index = [n.lower() for n in self.df['Name']]
+        # Residual table is shared with other readers of res_file, so Res
+        # works on its own copy
+        if res_df is None:
+            res_df = read_resfile(res_file)
+        self.df = res_df.rename(columns=RES_COLUMNS, copy=True)
+        self.df.index = self.df['Name'].values
 
         # Apply weighted residual and calculate phi contributions
         self.df['Weighted_Residual'] = self.df['Residual'] * self.df['Weight']
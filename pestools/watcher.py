@@ -0,0 +1,256 @@
+import os
+import time
+import pandas as pd
+from pest import Pest
+from rei import Rei
+from pst_handler import pst as Pst
+from pst_handler import read_resfile, read_parfile
+from rec_handler import rec as Rec
+
+
+class Watcher(object):
+    """
+    Watcher Class
+
+    Follows a running PEST job.  Each poll() reads only the text appended to
+    the record file since the last poll, and only the iteration files
+    (.rei.N, .bpa.N) and jco written since the last poll.
+
+    Parameters
+    ----------
+    basename : str
+        basename for pest run (including path)
+
+    pest : Pest, optional
+        Pest session to share the parsed control file with.  A new session
+        is created if not provided.
+
+    settle : float, default 2.0
+        Seconds since a file was last modified before it is read, so files
+        that PEST is still writing are left for a later poll
+
+    processes : int, optional
+        Number of worker processes for reading rei files, see Rei
+
+    Attributes
+    ----------
+    rei : Rei
+        residuals of each iteration that has a .rei.N file
+
+    rec : rec
+        record file parser, see rec_handler.rec for the iterations, lambda
+        trials and parameter upgrades parsed so far
+
+    starting_phi : Series
+        starting phi of each iteration from the record file
+
+    phi_by_group : DataFrame
+        starting phi contribution by group for each iteration from the
+        record file
+
+    phi_by_type : DataFrame
+        phi_by_group summed by observation type
+
+    parameters : DataFrame
+        parameter values from each .bpa.N file, one column per iteration
+
+    best_parameters : Series
+        best parameter values so far, from the .bpa file
+
+    jco_stamp : list
+        modification time and size of the jco when it was last seen
+
+    Methods
+    -------
+    poll()
+    watch()
+    """
+
+    def __init__(self, basename, pest=None, settle=2.0, processes=None):
+
+        if pest is None:
+            pest = Pest(basename)
+        self._Pest = pest
+        self.run_folder = self._Pest.run_folder
+        self.settle = settle
+        self.rei = Rei(basename, pest=self._Pest, processes=processes)
+
+        prefix = os.path.join(self.run_folder, self._Pest.basename)
+        self.recfile = prefix + '.rec'
+        self.bpafile = prefix + '.bpa'
+        self.jcofile = self._Pest.jcofile
+
+        self.jco_stamp = None
+        self.best_parameters = None
+        self.__reset_rec()
+        self._parameters = {}
+        self._bpa_stamp = None
+
+    def __reset_rec(self):
+        """Forget what has been read from the record file
+        """
+        self.rec = Rec(self.recfile)
+
+    @property
+    def rec_offset(self):
+        """Bytes of the record file read so far
+        """
+        return self.rec.offset
+
+    def poll(self):
+        """Read any new output of the run
+
+        Returns
+        -------
+        dict
+            what changed: 'rec' (iterations with new phi information),
+            'rei' and 'bpa' (iterations with new files) and 'jco' (True if
+            the jco was rewritten)
+        """
+        changes = {'rec': self._poll_rec(), 'rei': self._poll_rei(),
+                   'bpa': self._poll_bpa(), 'jco': self._poll_jco()}
+        return changes
+
+    def watch(self, interval=30.0, callback=None, max_polls=None):
+        """Poll the run every interval seconds until interrupted (Ctrl-C)
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between polls
+
+        callback : function, optional
+            Called as callback(watcher, changes) after each poll that found
+            new output.  The default prints the latest phi by group.
+
+        max_polls : int, optional
+            Stop after this many polls
+        """
+        if callback is None:
+            callback = self._print_changes
+        npolls = 0
+        try:
+            while max_polls is None or npolls < max_polls:
+                changes = self.poll()
+                npolls += 1
+                if any(changes.values()):
+                    callback(self, changes)
+                if max_polls is None or npolls < max_polls:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def _print_changes(watcher, changes):
+        if len(changes['rec']) > 0:
+            i = changes['rec'][-1]
+            print 'iteration {}: starting phi {}'.format(
+                i, watcher.starting_phi.get(i))
+        if len(changes['rei']) > 0:
+            print 'new rei files for iterations {}'.format(changes['rei'])
+        if len(changes['bpa']) > 0:
+            print 'new bpa files for iterations {}'.format(changes['bpa'])
+        if changes['jco']:
+            print 'jco updated'
+
+    def _settled(self, filename):
+        """True if filename exists and has not been modified for self.settle
+        seconds
+        """
+        return os.path.exists(filename) and \
+            time.time() - os.path.getmtime(filename) >= self.settle
+
+    def _poll_rec(self):
+        """Parse the text appended to the record file since the last poll
+        """
+        if not os.path.exists(self.recfile):
+            return []
+        if os.path.getsize(self.recfile) < self.rec.offset:
+            # record file was restarted
+            self.__reset_rec()
+        updated = self.rec.parse()
+        return [i for i in updated if i > 0]
+
+    def _poll_rei(self):
+        """Add settled new rei files to self.rei, in iteration order
+        """
+        self.rei.find_reifiles()
+        added = []
+        for i in self.rei.iterations:
+            if i in self.rei.loaded_iterations:
+                continue
+            if not self._settled(self.rei.reifiles[i]):
+                break
+            self.rei.add_iteration(i, read_resfile(self.rei.reifiles[i]))
+            added.append(i)
+        return added
+
+    def _poll_bpa(self):
+        """Read settled new .bpa.N files, and the .bpa file if it changed
+        """
+        prefix = self._Pest.basename + '.bpa.'
+        added = []
+        for f in os.listdir(self.run_folder):
+            if not f.lower().startswith(prefix.lower()):
+                continue
+            try:
+                i = int(f[len(prefix):])
+            except ValueError:
+                continue
+            bpafile = os.path.join(self.run_folder, f)
+            if i not in self._parameters and self._settled(bpafile):
+                self._parameters[i] = read_parfile(bpafile)['parval1']
+                added.append(i)
+        if self._settled(self.bpafile):
+            stamp = Pst.file_stamp(self.bpafile)
+            if stamp != self._bpa_stamp:
+                self._bpa_stamp = stamp
+                self.best_parameters = read_parfile(self.bpafile)['parval1']
+        return sorted(added)
+
+    def _poll_jco(self):
+        """Check if the jco was rewritten.  The Pest session reloads it on
+        its next use.
+        """
+        if not self._settled(self.jcofile):
+            return False
+        stamp = Pst.file_stamp(self.jcofile)
+        changed = stamp != self.jco_stamp
+        self.jco_stamp = stamp
+        return changed
+
+    @property
+    def starting_phi(self):
+        """Starting phi of each iteration
+        """
+        starting_phi = self.rec.iterations['starting_phi']
+        starting_phi = starting_phi[starting_phi.index > 0].dropna()
+        starting_phi.index.name = 'Pest iteration'
+        return starting_phi
+
+    @property
+    def phi_by_group(self):
+        """Starting phi contribution by group for each iteration
+        """
+        phi_by_group = self.rec.phi_by_group('starting')
+        phi_by_group = phi_by_group[phi_by_group.index > 0]
+        phi_by_group.index.name = 'Pest iteration'
+        phi_by_group.columns.name = None
+        return phi_by_group
+
+    @property
+    def phi_by_type(self):
+        """Starting phi contribution by observation type for each iteration
+        """
+        phi_by_group = self.phi_by_group
+        types = self.rei._obstypes.Type
+        types = [types.get(g, 'observation') for g in phi_by_group.columns]
+        return phi_by_group.groupby(types, axis=1).sum()
+
+    @property
+    def parameters(self):
+        """Parameter values from each .bpa.N file, one column per iteration
+        """
+        parameters = pd.DataFrame(self._parameters)
+        parameters.columns.name = 'Pest iteration'
+        return parameters
@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CC_DIR = os.path.join(os.path.dirname(TESTS_DIR), 'cc')
+# the pestools modules import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'pestools'))
+
+import mat_handler
+import pst_handler
+
+
+def copy_cc(tmpdir, files):
+    """Copy files from the cc example into tmpdir, as (source, target) name
+    pairs, so snapshots and other output are not written into cc
+    """
+    for source, target in files:
+        shutil.copy(os.path.join(CC_DIR, source), str(tmpdir.join(target)))
+
+
+@pytest.fixture
+def columbia(tmpdir):
+    """Basename of a copy of the Columbia example run, with a synthetic
+    (sparse, reproducible) jco for its observations and parameters
+    """
+    copy_cc(tmpdir, [('Columbia.pst', 'columbia.pst'),
+                     ('columbia.res', 'columbia.res'),
+                     ('columbia.rec', 'columbia.rec')])
+    basename = str(tmpdir.join('columbia'))
+    pst = pst_handler.pst(basename + '.pst', snapshot=False)
+    res = pst_handler.read_resfile(basename + '.res')
+    rs = np.random.RandomState(0)
+    x = rs.randn(res.shape[0], pst.npar)
+    x[np.abs(x) < 1.5] = 0.0
+    jco = mat_handler.jco(x=x, row_names=list(res['name']),
+                          col_names=pst.par_names)
+    jco.to_binary(basename + '.jco')
+    return basename
+
+
+@pytest.fixture
+def svda(tmpdir):
+    """Basename of a copy of the Columbia SVD-assist run, with its .rei.N
+    files and the base control file
+    """
+    files = [('Columbia_SVDA.pst', 'columbia_svda.pst'),
+             ('Columbia.pst', 'columbia.pst'),
+             ('columbia_svda.rec', 'columbia_svda.rec')]
+    files += [('columbia_svda.rei.%d' % i, 'columbia_svda.rei.%d' % i)
+              for i in range(1, 17)]
+    copy_cc(tmpdir, files)
+    return str(tmpdir.join('columbia_svda'))
+
+
+def random_matrix(nrow, ncol, seed=0, density=0.3):
+    """Reproducible random matrix with about density non-zero entries
+    """
+    rs = np.random.RandomState(seed)
+    x = rs.randn(nrow, ncol)
+    x[rs.rand(nrow, ncol) > density] = 0.0
+    return x
+
+
+def names(prefix, n):
+    return ['%s%d' % (prefix, i) for i in range(n)]
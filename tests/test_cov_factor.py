@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import mat_handler
+from mat_handler import cov as Cov
+from mat_handler import matrix as Matrix
+
+NAMES = ['a', 'b', 'c', 'd', 'e']
+
+
+@pytest.fixture
+def x():
+    a = np.random.RandomState(0).randn(5, 5)
+    return a.dot(a.T) + 5 * np.eye(5)
+
+
+def test_inv_and_solve(x):
+    cov = Cov(x=x.copy(), names=NAMES)
+    assert np.allclose(cov.inv.x, np.linalg.inv(x))
+    rhs = np.arange(5.)
+    assert np.allclose(cov.solve(rhs), np.linalg.solve(x, rhs))
+    other = Matrix(x=rhs[::-1, np.newaxis], row_names=NAMES[::-1],
+                   col_names=['r'])
+    assert np.allclose(cov.solve(other).x[:, 0], np.linalg.solve(x, rhs))
+
+
+def test_not_positive_definite(x):
+    x = x.copy()
+    x[0, 0] = -100.0
+    cov = Cov(x=x, names=NAMES)
+    assert cov.chol is None
+    assert np.allclose(cov.inv.x, np.linalg.inv(x))
+
+
+def test_x_read_only_while_factor_cached(x):
+    cov = Cov(x=x.copy(), names=NAMES)
+    cov.x[0, 0] += 1.0
+    cov.inv
+    with pytest.raises(ValueError):
+        cov.x[0, 0] += 10.0
+    expected = x.copy()
+    expected[0, 0] += 1.0
+    assert np.allclose(cov.inv.x, np.linalg.inv(expected))
+
+
+@pytest.mark.parametrize('op', ['iadd', 'isub', 'imul'])
+def test_in_place_operators_drop_factor(x, op):
+    cov = Cov(x=x.copy(), names=NAMES)
+    cov.inv
+    if op == 'iadd':
+        cov += 1.0
+        expected = x + 1.0
+    elif op == 'isub':
+        cov -= 1.0
+        expected = x - 1.0
+    else:
+        cov *= 2.0
+        expected = x * 2.0
+    assert np.allclose(cov.inv.x, np.linalg.inv(expected))
+    assert np.allclose(cov.x, expected)
+
+
+def test_condition_on(x):
+    cov = Cov(x=x.copy(), names=NAMES)
+    cond = cov.condition_on(['b', 'd'])
+    keep, given = [0, 2, 4], [1, 3]
+    expected = x[np.ix_(keep, keep)] - x[np.ix_(keep, given)].dot(
+        np.linalg.solve(x[np.ix_(given, given)], x[np.ix_(given, keep)]))
+    assert cond.row_names == ['a', 'c', 'e']
+    assert np.allclose(cond.x, expected)
+    # repeated conditioning reuses the cached block factor
+    assert np.allclose(cov.condition_on(['b', 'd']).x, expected)
+
+
+def test_block_factors_are_bounded(x):
+    cov = Cov(x=x.copy(), names=NAMES)
+    for given in itertools.combinations(range(5), 2):
+        keep = [i for i in range(5) if i not in given]
+        given = list(given)
+        expected = x[np.ix_(keep, keep)] - x[np.ix_(keep, given)].dot(
+            np.linalg.solve(x[np.ix_(given, given)],
+                            x[np.ix_(given, keep)]))
+        cond = cov.condition_on([NAMES[i] for i in given])
+        assert np.allclose(cond.x, expected)
+        assert len(cov._cov__block_factors) <= \
+            mat_handler.BLOCK_FACTOR_CACHE_SIZE
+    assert len(cov._cov__block_factors) == mat_handler.BLOCK_FACTOR_CACHE_SIZE
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from conftest import random_matrix, names
+from mat_handler import matrix as Matrix
+from mat_handler import jco as Jco
+
+
+@pytest.fixture
+def x():
+    return random_matrix(20, 6, seed=5, density=1.0)
+
+
+def diagonal(values, prefix):
+    return Matrix(x=np.asarray(values, dtype=float)[:, np.newaxis],
+                  row_names=names(prefix, len(values)),
+                  col_names=names(prefix, len(values)), isdiagonal=True)
+
+
+def test_diagonal_products(x):
+    jco = Jco(x=x, row_names=names('o', 20), col_names=names('p', 6))
+    rows = np.arange(1., 21.)
+    cols = np.arange(1., 7.)
+    assert np.allclose((diagonal(rows, 'o') * jco).x, rows[:, None] * x)
+    assert np.allclose((jco * diagonal(cols, 'p')).x, x * cols)
+
+
+def test_diagonal_sums(x):
+    square = Matrix(x=x[:6], row_names=names('p', 6), col_names=names('p', 6))
+    diag = diagonal(np.arange(1., 7.), 'p')
+    d = np.diag(np.arange(1., 7.))
+    assert np.allclose((square + diag).x, x[:6] + d)
+    assert np.allclose((square - diag).x, x[:6] - d)
+    assert np.allclose((diag - square).x, d - x[:6])
+    assert np.allclose((diag + diag).x, 2 * np.arange(1., 7.)[:, None])
+
+
+def test_in_place_operators(x):
+    jco = Jco(x=x.copy(), row_names=names('o', 20), col_names=names('p', 6))
+    data = jco.x
+    jco *= diagonal(np.arange(1., 7.), 'p')
+    assert jco.x is data
+    assert np.allclose(jco.x, x * np.arange(1., 7.))
+    jco += 1.0
+    jco -= x
+    assert jco.x is data
+    assert np.allclose(jco.x, x * np.arange(1., 7.) + 1.0 - x)
+    square = Matrix(x=x[:6].copy(), row_names=names('p', 6),
+                    col_names=names('p', 6))
+    square += diagonal(np.arange(1., 7.), 'p')
+    assert np.allclose(square.x, x[:6] + np.diag(np.arange(1., 7.)))
+
+
+def test_in_place_resets_svd(x):
+    jco = Jco(x=x.copy(), row_names=names('o', 20), col_names=names('p', 6))
+    jco.set_svd_mode('economy')
+    jco.s
+    jco *= 2.0
+    assert np.allclose(jco.s.x[:, 0],
+                       np.linalg.svd(2 * x, compute_uv=False))
+
+
+def test_in_place_scaling_copies_names(x):
+    jco = Jco(x=x.copy(), row_names=names('o', 20), col_names=names('p', 6))
+    d = diagonal(np.arange(1., 7.), 'p')
+    jco *= d
+    assert jco.col_names == d.col_names
+    assert jco.col_names is not d.col_names
+    jco.drop(['p0'], axis=1)
+    assert d.col_names == names('p', 6)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from conftest import random_matrix, names
+from mat_handler import matrix as Matrix
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 1000000])
+def test_from_ascii_roundtrip(tmpdir, chunk_size):
+    x = random_matrix(11, 7, seed=3, density=1.0)
+    filename = str(tmpdir.join('test.mat'))
+    Matrix(x=x, row_names=names('r', 11),
+           col_names=names('c', 7)).to_ascii(filename)
+    mat = Matrix()
+    mat.from_ascii(filename, chunk_size=chunk_size)
+    assert np.allclose(mat.x, x, rtol=1e-6)
+    assert mat.row_names == names('r', 11)
+    assert mat.col_names == names('c', 7)
+
+
+def test_from_ascii_fortran_exponents(tmpdir):
+    filename = str(tmpdir.join('fortran.mat'))
+    open(filename, 'w').write('2 3 2\n'
+                              ' 1.0 -1.23455+300 2.5\n'
+                              ' 3.0-300 4E+01 -7.1-305\n'
+                              '* row names\na\nb\n'
+                              '* column names\nc\nd\ne\n')
+    mat = Matrix()
+    mat.from_ascii(filename)
+    assert np.array_equal(mat.x, [[1.0, 1.0e+30, 2.5], [0.0, 40.0, 0.0]])
+
+
+def test_from_ascii_bad_value(tmpdir):
+    filename = str(tmpdir.join('bad.mat'))
+    open(filename, 'w').write('1 2 2\n 1.0 x\n* row names\na\n'
+                              '* column names\nc\nd\n')
+    with pytest.raises(Exception, match="can't cast x to float"):
+        Matrix().from_ascii(filename)
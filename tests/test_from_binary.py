@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from conftest import random_matrix, names
+from mat_handler import jco as Jco
+
+
+@pytest.fixture
+def binary(tmpdir):
+    x = random_matrix(57, 9)
+    jco = Jco(x=x, row_names=names('OBS', 57), col_names=names('PAR', 9))
+    filename = str(tmpdir.join('test.jco'))
+    jco.to_binary(filename)
+    return filename, x
+
+
+def test_from_binary_roundtrip(binary):
+    filename, x = binary
+    jco = Jco()
+    jco.from_binary(filename)
+    assert np.array_equal(jco.x, x)
+    assert jco.row_names == names('obs', 57)
+    assert jco.col_names == names('par', 9)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 10 ** 6])
+def test_from_binary_mmap_chunked(binary, chunk_size):
+    filename, x = binary
+    jco = Jco()
+    jco.from_binary(filename, mmap=True, chunk_size=chunk_size)
+    assert isinstance(jco.x, np.ndarray)
+    assert np.array_equal(jco.x, x)
+    assert jco.row_names == names('obs', 57)
+    assert jco.col_names == names('par', 9)
+
+
+def test_from_binary_deprecated_format(tmpdir):
+    filename = str(tmpdir.join('old.jco'))
+    np.array([9, 57, 0], dtype=np.int32).tofile(filename)
+    with pytest.raises(TypeError):
+        Jco().from_binary(filename)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from pest import Pest
+from pst_handler import read_resfile
+
+
+@pytest.fixture
+def pest(columbia):
+    return Pest(columbia)
+
+
+def expected_cumulative(columbia, pest):
+    """Cumulative identifiabilities from a numpy SVD of Q^(1/2)*J
+    """
+    res = read_resfile(columbia + '.res').set_index('name')
+    weights = res['weight'].reindex(pest._jco.row_names).values
+    u, s, vt = np.linalg.svd(pest._jco.x * weights[:, np.newaxis],
+                             full_matrices=False)
+    return np.cumsum(vt.T ** 2, axis=1)
+
+
+def test_identifiability(columbia, pest):
+    identpar = pest.IdentPar()
+    expected = expected_cumulative(columbia, pest)
+    df = identpar.identifiability([1, 10, 597])
+    assert list(df.columns) == [1, 10, 597]
+    assert list(df.index) == pest._jco.col_names
+    assert np.allclose(df.values, expected[:, [0, 9, 596]])
+    # every parameter is identifiable with all singular values
+    assert np.allclose(df[597].values, 1.0)
+    assert identpar.identifiability().shape == (597, 597)
+    with pytest.raises(ValueError):
+        identpar.identifiability(598)
+    with pytest.raises(ValueError):
+        identpar.identifiability(0)
+
+
+def test_svd_is_shared(pest):
+    identpar = pest.IdentPar()
+    cumulative = identpar.cumulative
+    assert identpar.qhalfx is pest.qhalfx
+    assert pest.IdentPar().qhalfx is pest.qhalfx
+    assert identpar.cumulative is cumulative
+    # the cached weighted jco is not writeable
+    with pytest.raises(ValueError):
+        pest.qhalfx.x[0, 0] = 1.0
+
+
+def test_identifiability_dataframe(columbia, pest):
+    identpar = pest.IdentPar()
+    identpar.get_identifiability_dataframe(5)
+    assert identpar.ident_df.shape == (597, 5)
+    assert np.allclose(identpar.ident_df.sum(axis=1).values,
+                       expected_cumulative(columbia, pest)[:, 4])
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from mat_handler import matrix as Matrix
+from mat_handler import cov as Cov
+
+
+@pytest.fixture
+def mat():
+    return Matrix(x=np.arange(8.).reshape(4, 2), row_names=['a', 'b', 'c', 'd'],
+                  col_names=['x', 'y'])
+
+
+def test_indices(mat):
+    assert list(mat.indices(['C', 'a'], axis=0)) == [2, 0]
+    assert list(mat.indices(np.array(['y', 'x']), axis=1)) == [1, 0]
+    rows, cols = mat.indices(['d', 'x'])
+    assert list(rows) == [3] and list(cols) == [0]
+    with pytest.raises(Exception):
+        mat.indices(['z'], axis=0)
+
+
+def test_duplicate_names_resolve_to_first(mat):
+    mat.row_names = ['a', 'b', 'a', 'd']
+    assert list(mat.indices(['a'], axis=0)) == [0]
+
+
+def test_in_place_rename(mat):
+    mat.indices(['b'], axis=0)
+    mat.row_names[1] = 'z'
+    mat.row_names = mat.row_names
+    assert list(mat.indices(['z'], axis=0)) == [1]
+    with pytest.raises(Exception):
+        mat.indices(['b'], axis=0)
+
+
+def test_in_place_sort(mat):
+    mat.indices(['a', 'd'], axis=0)
+    mat.row_names.sort(reverse=True)
+    assert list(mat.indices(['d', 'a'], axis=0)) == [0, 3]
+    sub = mat.get(row_names=['d'])
+    assert np.array_equal(sub.x, [[0., 1.]])
+
+
+def test_align_and_drop(mat):
+    mat.align(['y', 'x'], axis=1)
+    assert mat.col_names == ['y', 'x']
+    assert np.array_equal(mat.x[0], [1., 0.])
+    mat.drop(['b'], axis=0)
+    assert mat.row_names == ['a', 'c', 'd']
+    cov = Cov(x=np.array([[1.], [2.], [3.]]), names=['p', 'q', 'r'],
+              isdiagonal=True)
+    cov.drop(['q'], axis=0)
+    assert cov.row_names == ['p', 'r'] and cov.col_names == ['p', 'r']
+    assert np.array_equal(cov.x, [[1.], [3.]])
+
+
+def test_index_is_kept_on_misses(mat):
+    mat.indices(['a'], axis=0)
+    index = mat._matrix__name_index[0]
+    with pytest.raises(Exception):
+        mat.indices(['a', 'z'], axis=0)
+    assert mat._matrix__name_index[0] is index
+    mat.row_names = ['d', 'c', 'b', 'a']
+    assert list(mat.indices(['a'], axis=0)) == [3]
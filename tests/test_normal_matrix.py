@@ -0,0 +1,45 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+from conftest import random_matrix, names
+import mat_handler
+from mat_handler import jco as Jco
+
+
+@pytest.fixture
+def x():
+    return random_matrix(103, 7, seed=7)
+
+
+@pytest.fixture
+def weights():
+    weights = np.random.RandomState(8).rand(103)
+    weights[::5] = 0.0
+    return weights
+
+
+@pytest.mark.parametrize('block_size, nthreads', [(10, 1), (10, 4),
+                                                  (10000, None)])
+def test_normal_matrix(x, weights, block_size, nthreads):
+    expected = x.T.dot(np.diag(weights ** 2)).dot(x)
+    normal = mat_handler.normal_matrix(x, weights, block_size=block_size,
+                                       nthreads=nthreads)
+    assert np.allclose(normal, expected)
+    sparse = mat_handler.normal_matrix(sp.csc_matrix(x), weights,
+                                       block_size=block_size,
+                                       nthreads=nthreads)
+    assert np.allclose(sparse, expected)
+
+
+def test_normal_matrix_from_matrix(x, weights):
+    jco = Jco(x=x, row_names=names('o', 103), col_names=names('p', 7))
+    assert np.allclose(mat_handler.normal_matrix(jco, weights),
+                       x.T.dot(x * weights[:, np.newaxis] ** 2))
+
+
+def test_normal_matrix_zero_weights(x):
+    assert np.array_equal(mat_handler.normal_matrix(x, np.zeros(103)),
+                          np.zeros((7, 7)))
+    with pytest.raises(AssertionError):
+        mat_handler.normal_matrix(x, np.ones(5))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from parsen import ParSen
+from pst_handler import read_resfile
+
+
+@pytest.fixture
+def res(columbia):
+    return read_resfile(columbia + '.res')
+
+
+def sensitivity(parsen, keep):
+    """Sensitivities computed directly with the weights outside keep zeroed
+    """
+    weights = parsen._obs_data['WEIGHT'].values * keep
+    x = parsen._jco.x
+    return np.sqrt(np.sum((x * weights[:, np.newaxis]) ** 2, axis=0)) / \
+        np.count_nonzero(weights)
+
+
+def check(parsen, keep):
+    assert np.array_equal(parsen._obs_data['ParSen_Weight'].values != 0,
+                          (parsen._obs_data['WEIGHT'].values * keep) != 0)
+    assert np.allclose(parsen.df['Sensitivity'].values,
+                       sensitivity(parsen, keep))
+
+
+def test_drop_regul(columbia, res):
+    parsen = ParSen(basename=columbia)
+    parsen.drop_regul()
+    check(parsen, ~res['group'].str.contains('regul').values)
+    assert np.allclose(ParSen(basename=columbia, drop_regul=True)
+                       .df['Sensitivity'].values,
+                       parsen.df['Sensitivity'].values)
+
+
+def test_drop_and_keep_groups(columbia, res):
+    groups = ['HEAD_BEST', 'wcrs2']
+    parsen = ParSen(basename=columbia)
+    parsen.drop_groups(groups)
+    check(parsen, ~res['group'].isin(['head_best', 'wcrs2']).values)
+    parsen = ParSen(basename=columbia, keep_groups=groups)
+    check(parsen, res['group'].isin(['head_best', 'wcrs2']).values)
+
+
+def test_keep_and_remove_obs(columbia, res):
+    obs = list(res['name'][:40:3].str.upper())
+    parsen = ParSen(basename=columbia, keep_obs=obs)
+    check(parsen, res.index.isin(range(0, 40, 3)))
+    parsen = ParSen(basename=columbia)
+    parsen.remove_obs(obs)
+    check(parsen, ~res.index.isin(range(0, 40, 3)))
+
+
+def test_filters_combine(columbia, res):
+    parsen = ParSen(basename=columbia, drop_regul=True,
+                    remove_obs=[res['name'][0]])
+    keep = ~res['group'].str.contains('regul').values
+    keep[0] = False
+    check(parsen, keep)
+    # the original weights are kept
+    assert np.array_equal(parsen._obs_data['WEIGHT'].values,
+                          res['weight'].values)
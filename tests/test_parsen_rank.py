@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from parsen import ParSen
+
+
+@pytest.fixture
+def parsen(columbia):
+    return ParSen(basename=columbia)
+
+
+def full_sort(df):
+    """Parameter names, most sensitive first, by a stable full sort
+    """
+    order = np.argsort(-df['Sensitivity'].values, kind='mergesort')
+    return list(df.index[order])
+
+
+@pytest.mark.parametrize('n', [1, 5, 59, 60, 597, 1000])
+def test_head_and_tail(parsen, n):
+    ranked = full_sort(parsen.df)
+    assert list(parsen.head(n).index) == ranked[:n]
+    assert list(parsen.tail(n).index) == ranked[-n:]
+
+
+def test_head_and_tail_of_zero(parsen):
+    assert len(parsen.head(0)) == 0
+    assert len(parsen.tail(0)) == 0
+    # also once the full ranking has been cached
+    parsen.head(None)
+    assert len(parsen.head(0)) == 0
+    assert len(parsen.tail(0)) == 0
+    assert len(parsen.group('kp', n=0)) == 0
+
+
+def test_group(parsen):
+    df = parsen.df[parsen.df['Parameter Group'] == 'kp']
+    ranked = full_sort(df)
+    assert list(parsen.group('KP', n=3).index) == ranked[:3]
+    assert list(parsen.group('kp', n=-3).index) == ranked[-3:]
+    assert list(parsen.group('kp').index) == ranked
+    assert len(parsen.group('not_a_group')) == 0
+
+
+def test_ranks_follow_the_dataframe(parsen):
+    parsen.head(None)
+    parsen.remove_obs(parsen._jco.row_names[:2000])
+    assert list(parsen.head(3).index) == full_sort(parsen.df)[:3]
+    assert list(parsen.tail(3).index) == full_sort(parsen.df)[-3:]
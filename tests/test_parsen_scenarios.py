@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from mat_handler import jco as Jco
+from parsen import ParSen
+from pst_handler import read_resfile
+
+
+@pytest.fixture
+def parsen(columbia):
+    return ParSen(basename=columbia)
+
+
+def test_scenarios_equal_keep_groups(columbia, parsen):
+    scenarios = parsen.group_scenarios()
+    df = parsen.scenarios(scenarios, chunk_size=1000)
+    assert list(df.columns) == [name for name, groups in scenarios]
+    for name, groups in scenarios[:3]:
+        expected = ParSen(basename=columbia, keep_groups=groups).df
+        assert np.allclose(df[name].values, expected['Sensitivity'].values)
+
+
+def test_leave_one_out_equals_drop_groups(columbia, parsen):
+    group = parsen.group_scenarios()[0][0]
+    df = parsen.scenarios(parsen.group_scenarios(leave_one_out=True))
+    expected = ParSen(basename=columbia, drop_groups=[group]).df
+    assert np.allclose(df['without ' + group].values,
+                       expected['Sensitivity'].values)
+
+
+def test_mask_scenarios(parsen):
+    n = len(parsen._obs_data)
+    df = parsen.scenarios(OrderedDict([('all', np.ones(n, dtype=bool)),
+                                       ('half', np.ones(n) * 0.5)]))
+    assert np.allclose(df['all'].values, parsen.df['Sensitivity'].values)
+    assert np.allclose(df['half'].values, 0.5 * df['all'].values)
+    with pytest.raises(ValueError):
+        parsen.scenarios([('short', np.ones(n - 1))])
+
+
+def test_empty_selection(parsen):
+    n = len(parsen._obs_data)
+    df = parsen.scenarios([('none', []), ('all', np.ones(n))])
+    assert df['none'].isnull().all()
+    assert np.allclose(df['all'].values, parsen.df['Sensitivity'].values)
+
+
+def test_leave_one_out_of_one_group(columbia):
+    res = read_resfile(columbia + '.res')
+    jco = Jco()
+    jco.from_binary(columbia + '.jco')
+    jco.drop(list(res['name'][res['group'] != 'head_best']), axis=0)
+    parsen = ParSen(basename=columbia, jco=jco)
+    scenarios = parsen.group_scenarios(leave_one_out=True)
+    assert scenarios == [('without head_best', [])]
+    assert parsen.scenarios(scenarios)['without head_best'].isnull().all()
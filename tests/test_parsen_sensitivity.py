@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from parsen import ParSen
+from pst_handler import read_resfile
+
+
+def expected_sensitivity(x, weights):
+    """Composite sensitivity of each parameter, one jco column at a time
+    """
+    n = np.count_nonzero(weights)
+    return np.array([np.sqrt(np.sum((x[:, j] * weights) ** 2)) / n
+                     for j in range(x.shape[1])])
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_calc_sensitivity(columbia, sparse):
+    parsen = ParSen(basename=columbia, sparse=sparse)
+    assert parsen._jco.issparse == sparse
+    x = parsen._jco.x.toarray() if sparse else parsen._jco.x
+    res = read_resfile(columbia + '.res').set_index('name')
+    weights = res['weight'].reindex(parsen._jco.row_names).values
+    assert np.allclose(parsen.df['Sensitivity'].values,
+                       expected_sensitivity(x, weights))
+    assert list(parsen.df.index) == parsen._jco.col_names
+    assert parsen.df['Parameter Group'].iloc[0] == 'kp'
+
+
+def test_sparse_equals_dense(columbia):
+    dense = ParSen(basename=columbia, drop_regul=True)
+    sparse = ParSen(basename=columbia, sparse=True, drop_regul=True)
+    assert np.allclose(dense.df['Sensitivity'].values,
+                       sparse.df['Sensitivity'].values)
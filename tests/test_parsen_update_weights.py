@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from parsen import ParSen
+
+
+def recalculated(parsen):
+    """Sensitivities from a full recompute with the current weights
+    """
+    return parsen.calc_sensitivity()['Sensitivity'].values
+
+
+@pytest.fixture(params=[False, True], ids=['dense', 'sparse'])
+def parsen(request, columbia):
+    return ParSen(basename=columbia, sparse=request.param)
+
+
+def test_update_weights(parsen):
+    obs = parsen._jco.row_names
+    parsen.update_weights({obs[0]: 3.0, obs[5].upper(): 0.0, obs[7]: 1.5})
+    weights = parsen._obs_data['ParSen_Weight']
+    assert list(weights.iloc[[0, 5, 7]]) == [3.0, 0.0, 1.5]
+    assert np.allclose(parsen.df['Sensitivity'].values, recalculated(parsen))
+
+
+def test_update_weights_after_filters(parsen):
+    ob = parsen._jco.row_names[0]
+    group = parsen._obs_data['OBGNME'].iloc[-1]
+    parsen.drop_groups([group], calc_sensitivity=False)
+    parsen.drop_regul(calc_sensitivity=False)
+    parsen.update_weights({ob: 3.0})
+    assert np.allclose(parsen.df['Sensitivity'].values, recalculated(parsen),
+                       rtol=1e-10, atol=0.0)
+
+
+def test_update_weights_last_entry_wins(parsen):
+    ob = parsen._jco.row_names[2]
+    parsen.update_weights(pd.Series([10.0, 2.0], index=[ob, ob.upper()]))
+    assert parsen._obs_data['ParSen_Weight'].iloc[2] == 2.0
+    assert np.allclose(parsen.df['Sensitivity'].values, recalculated(parsen))
+
+
+def test_update_unknown_obs(parsen):
+    with pytest.raises(KeyError):
+        parsen.update_weights({'not_an_ob': 1.0})
@@ -0,0 +1,79 @@
+import os
+import time
+import numpy as np
+import pytest
+
+from pest import Pest
+from pst_handler import read_resfile
+
+
+def test_artifacts_are_memoized(columbia):
+    pest = Pest(columbia)
+    jco = pest._jco
+    assert pest._jco is jco
+    assert pest.pst is pest.pst
+    assert pest.res_df is pest.res_df
+    pest.refresh('jco')
+    assert pest._jco is not jco
+    assert np.array_equal(pest._jco.x, jco.x)
+
+
+def test_artifacts_reload_when_files_change(columbia):
+    pest = Pest(columbia)
+    jco = pest._jco
+    jcofile = columbia + '.jco'
+    stat = os.stat(jcofile)
+    os.utime(jcofile, (stat.st_atime, stat.st_mtime + 10))
+    assert pest._jco is not jco
+
+
+def test_cached_jco_is_read_only(columbia):
+    pest = Pest(columbia)
+    x = pest._jco.x.copy()
+    with pytest.raises(ValueError):
+        pest._jco.x[0, 0] = 1.0
+    jco = pest._jco
+    jco *= 2.0
+    assert jco is not pest._jco
+    assert np.array_equal(jco.x, 2.0 * x)
+    assert np.array_equal(pest._jco.x, x)
+
+
+def test_parsen_gets_a_view_of_the_jco(columbia):
+    pest = Pest(columbia)
+    parsen = pest.ParSen()
+    assert parsen._jco is not pest._jco
+    assert np.array_equal(parsen._jco.x, pest._jco.x)
+    parsen._jco.drop(parsen._jco.row_names[:3], axis=0)
+    assert pest._jco.shape[0] == parsen._jco.shape[0] + 3
+
+
+def test_weights_and_cov(columbia):
+    pest = Pest(columbia)
+    res = read_resfile(columbia + '.res').set_index('name')
+    weights = res['weight'].reindex(pest._jco.row_names).fillna(0.0).values
+    assert np.array_equal(pest.weights, weights)
+    x = pest._jco.x
+    normal = x.T.dot(x * weights[:, np.newaxis] ** 2)
+    assert np.allclose(pest.normal_matrix.x, normal)
+    cov = np.linalg.inv(normal) * pest.pst.phi / \
+        (np.count_nonzero(weights) - x.shape[1])
+    assert np.allclose(pest.cov_df.values, cov)
+    assert pest.cor is pest.cor
+
+
+def test_data_frames_are_not_shared(columbia):
+    pest = Pest(columbia)
+    obs = pest.observation_data
+    assert list(obs.index[:2]) == list(obs['obsnme'][:2])
+    # the session's parsed data is not changed
+    assert list(pest.pst.observation_data.index[:2]) == [0, 1]
+    obs.loc[obs.index[0], 'weight'] = 99.0
+    assert pest.observation_data['weight'].iloc[0] == 0.2
+    pars = pest.parameter_data
+    pars.loc[pars.index[0], 'parval1'] = 99.0
+    assert pest.parameter_data['parval1'].iloc[0] == 2.42
+    jco_df = pest.jco_df
+    assert jco_df is pest.jco_df
+    with pytest.raises(ValueError):
+        jco_df.iloc[0, 0] = 99.0
@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import copy_cc
+from pst_handler import pst as Pst
+
+
+@pytest.fixture
+def pst(tmpdir):
+    copy_cc(tmpdir, [('Columbia.pst', 'columbia.pst')])
+    return Pst(str(tmpdir.join('columbia.pst')), snapshot=False)
+
+
+def test_control_data(pst):
+    cd = pst.control_data
+    assert (cd['npar'], cd['nobs'], cd['nprior']) == (597, 4599, 5890)
+    assert (cd['npargp'], cd['nobsgp']) == (4, 23)
+    assert cd['pestmode'] == 'regularisation' and pst.mode == 'regularisation'
+    assert not pst.estimation
+    assert cd['rlambda1'] == 20.0 and cd['noptmax'] == -1
+    # keywords
+    assert cd['lamforgive'] is True and cd['noaui'] is True
+
+
+def test_tables(pst):
+    par = pst.parameter_data
+    assert par.shape == (597, 10)
+    assert list(par.iloc[0][['parnme', 'partrans', 'pargp']]) == \
+        ['kpkpx_tc2', 'log', 'kp']
+    assert par.iloc[0]['parval1'] == 2.42
+    obs = pst.observation_data
+    assert obs.shape == (4599, 4)
+    assert list(obs.iloc[0]) == ['7089222501_b', 858.13, 0.2, 'head_best']
+    assert len(pst.obs_groups) == 12
+    prior = pst.prior_information
+    assert prior.shape[0] == 5890
+    assert prior.iloc[0]['equation'] == '1.0 * log(kh_c) = 1.477121'
+    assert prior.iloc[0]['obgnme'] == 'regul_kp'
+    assert pst.tied.shape[0] == 0
+    assert pst.parameter_groups.shape[0] == 4
+
+
+def test_sections(pst):
+    assert pst.model_command_line == ['Columbia.bat']
+    assert pst.model_input_output.shape == (10, 3)
+    assert list(pst.model_input_output['type']).count('tpl') == 7
+    assert 'regularisation' in pst.sections
+    # the bulk sections are parsed into tables, not kept as text
+    assert 'parameter data' not in pst.sections
+
+
+def test_missing_section(tmpdir):
+    filename = str(tmpdir.join('bad.pst'))
+    open(filename, 'w').write('pcf\n* control data\nrestart estimation\n'
+                              '1 1 1 0 1\n')
+    with pytest.raises(Exception):
+        Pst(filename, snapshot=False)
@@ -0,0 +1,87 @@
+import os
+import pandas as pd
+import pytest
+
+from conftest import copy_cc, CC_DIR
+import pst_handler
+from pst_handler import pst as Pst
+
+
+def assert_same_pst(a, b):
+    for table in ['parameter_data', 'tied', 'observation_data',
+                  'prior_information', 'parameter_groups',
+                  'model_input_output']:
+        pd.util.testing.assert_frame_equal(getattr(a, table),
+                                           getattr(b, table))
+    assert a.control_data == b.control_data
+    assert a.model_command_line == b.model_command_line
+    assert a.sections == b.sections
+    assert (a.mode, a.estimation) == (b.mode, b.estimation)
+
+
+@pytest.mark.parametrize('source', ['Columbia.pst', 'Columbia_SVDA.pst'])
+def test_snapshot_equals_parse(tmpdir, source):
+    filename = str(tmpdir.join(source.lower()))
+    copy_cc(tmpdir, [(source, source.lower())])
+    parsed = Pst(filename)
+    assert os.path.exists(Pst.snapshot_filename(filename))
+    snapshot = Pst(filename, load=False)
+    assert snapshot.load_snapshot(filename)
+    assert_same_pst(parsed, snapshot)
+    assert_same_pst(parsed, Pst(filename, snapshot=False))
+
+
+def test_snapshot_out_of_date(tmpdir):
+    filename = str(tmpdir.join('columbia.pst'))
+    copy_cc(tmpdir, [('Columbia.pst', 'columbia.pst')])
+    Pst(filename)
+    open(filename, 'a').write('\n')
+    assert not Pst(filename, load=False).load_snapshot(filename)
+
+
+@pytest.mark.parametrize('text', ['Columbia_\xe9.bat',
+                                  'Columbia_\xc3\xa9.bat'])
+def test_snapshot_non_ascii(tmpdir, text):
+    filename = str(tmpdir.join('columbia.pst'))
+    pst_text = open(os.path.join(CC_DIR, 'Columbia.pst')).read()
+    open(filename, 'w').write(pst_text.replace('Columbia.bat', text))
+    first = Pst(filename)
+    assert first.model_command_line == [text]
+    second = Pst(filename)
+    assert second.model_command_line == [text]
+    assert_same_pst(first, second)
+    assert Pst(filename, load=False).load_snapshot(filename)
+
+
+def test_snapshot_unreadable(tmpdir):
+    filename = str(tmpdir.join('columbia.pst'))
+    copy_cc(tmpdir, [('Columbia.pst', 'columbia.pst')])
+    expected = Pst(filename, snapshot=False)
+    open(Pst.snapshot_filename(filename), 'w').write('not a snapshot')
+    assert_same_pst(Pst(filename), expected)
+    # the bad snapshot is replaced
+    assert Pst(filename, load=False).load_snapshot(filename)
+
+
+def test_snapshot_write_failure(tmpdir):
+    filename = str(tmpdir.join('columbia.pst'))
+    copy_cc(tmpdir, [('Columbia.pst', 'columbia.pst')])
+    pst = Pst(filename, snapshot=False)
+    # a folder in the way of the snapshot file
+    os.mkdir(Pst.snapshot_filename(filename))
+    assert not pst.save_snapshot(filename)
+    assert sorted(os.listdir(str(tmpdir))) == ['columbia.pst',
+                                              'columbia.pst.npz']
+
+
+def test_snapshot_serialization_errors_surface(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('columbia.pst'))
+    copy_cc(tmpdir, [('Columbia.pst', 'columbia.pst')])
+    pst = Pst(filename, snapshot=False)
+
+    def dumps(*args, **kwargs):
+        raise TypeError('not serializable')
+
+    monkeypatch.setattr(pst_handler.json, 'dumps', dumps)
+    with pytest.raises(TypeError):
+        pst.save_snapshot(filename)
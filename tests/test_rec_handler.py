@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CC_DIR
+from pst_handler import pst as Pst
+from rec_handler import rec as Rec, rec_float
+
+RECFILE = os.path.join(CC_DIR, 'columbia_svda.rec')
+REC_TEXT = open(RECFILE, 'rb').read()
+
+
+@pytest.fixture(scope='module')
+def parsed():
+    rec = Rec(RECFILE)
+    rec.parse()
+    return rec
+
+
+def assert_same_rec(a, b):
+    pd.util.testing.assert_frame_equal(a.iterations, b.iterations)
+    for table in ['phi_components', 'lambdas', 'upgrades']:
+        pd.util.testing.assert_frame_equal(getattr(a, table),
+                                           getattr(b, table))
+    assert a.summary == b.summary
+
+
+def test_parse(parsed):
+    iterations = parsed.iterations
+    assert list(iterations.index) == range(17)
+    assert iterations.loc[0, 'starting_phi'] == 10176.0
+    assert iterations.loc[16, 'meas_phi'] == 4795.5
+    assert iterations.loc[16, 'model_calls'] == 4044
+    assert len(parsed.lambdas) == 154
+    assert len(parsed.upgrades) == 2400
+    assert parsed.summary['phi'] == 5563.4
+    assert parsed.summary['total_model_calls'] == 4354
+    assert parsed.finished
+    by_group = parsed.phi_by_group()
+    assert list(by_group.index) == range(17)
+    assert by_group.shape[1] == 23
+    assert np.allclose(by_group.sum(axis=1).values,
+                       iterations['starting_phi'].values, rtol=1e-3)
+
+
+def test_rec_float():
+    assert rec_float('1.5E+02') == 150.0
+    assert rec_float('1.0000-100') == 1.0e-100
+    with pytest.raises(ValueError):
+        rec_float('phi')
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_incremental_parse(tmpdir, parsed, seed):
+    recfile = str(tmpdir.join('run.rec'))
+    rec = Rec(recfile, chunk_size=4096)
+    assert rec.parse() == []
+    cuts = sorted(np.random.RandomState(seed).randint(0, len(REC_TEXT), 20))
+    for cut in cuts + [len(REC_TEXT)]:
+        open(recfile, 'wb').write(REC_TEXT[:cut])
+        rec.parse()
+        assert rec.offset <= cut
+    assert rec.offset == len(REC_TEXT)
+    assert_same_rec(rec, parsed)
+
+
+def test_resume_from_state(tmpdir, parsed):
+    recfile = str(tmpdir.join('run.rec'))
+    cut = len(REC_TEXT) // 2
+    open(recfile, 'wb').write(REC_TEXT[:cut])
+    first = Rec(recfile)
+    first.parse()
+    open(recfile, 'wb').write(REC_TEXT)
+    second = Rec(recfile, state=first.state)
+    assert second.parse()[-1] == 16
+    for table in ['lambdas', 'upgrades']:
+        both = pd.concat([getattr(first, table), getattr(second, table)],
+                         ignore_index=True)
+        pd.util.testing.assert_frame_equal(both, getattr(parsed, table))
+    assert second.summary == parsed.summary
+
+
+def test_empty_file(tmpdir):
+    recfile = str(tmpdir.join('run.rec'))
+    assert Rec(recfile).parse() == []
+    open(recfile, 'wb').write('')
+    rec = Rec(recfile)
+    assert rec.parse() == []
+    assert len(rec.iterations) == 0
+    assert len(rec.lambdas) == 0 and len(rec.upgrades) == 0
+    assert len(rec.phi_by_group()) == 0
+    assert rec.summary == {} and not rec.finished
+
+
+def test_contribution_separators(tmpdir):
+    recfile = str(tmpdir.join('run.rec'))
+    open(recfile, 'wb').write(
+        'OPTIMISATION ITERATION NO.        : 1\n'
+        '  Starting phi for this iteration:   10.0\n'
+        '  Contribution to phi from observation group "zero_streams":   0.0\n'
+        '  Contribution to phi from observation group "head_best"=   4.0\n'
+        '  Contribution to phi from regularisation group "regul_kp":'
+        '   6.0\n')
+    rec = Rec(recfile)
+    assert rec.parse() == [1]
+    assert list(rec.phi_components['group']) == ['zero_streams', 'head_best',
+                                                 'regul_kp']
+    assert list(rec.phi_by_group().loc[1, ['zero_streams', 'head_best',
+                                           'regul_kp']]) == [0.0, 4.0, 6.0]
+
+
+def test_get_phi_components_from_recfile(parsed):
+    pst = Pst(filename=None, load=False)
+    components = pst.get_phi_components_from_recfile(RECFILE)
+    assert sorted(components.keys()) == range(1, 17)
+    assert len(components[16]) == 23
+    assert components[16]['zero_streams'] == 0.0
+    starting = parsed.phi_by_group().loc[16]
+    assert components[16] == dict(starting)
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pst_handler import read_resfile
+from rei import Rei
+
+
+@pytest.fixture
+def rei(svda):
+    return Rei(svda, processes=1)
+
+
+def residuals(residual, weight):
+    """Small residual table in read_resfile() form
+    """
+    return pd.DataFrame({'name': ['a', 'b', 'c'],
+                         'group': pd.Categorical(['g1', 'g2', 'g1']),
+                         'measured': [1.0, 2.0, 3.0],
+                         'modelled': [1.0, 2.0, 3.0] - np.array(residual),
+                         'residual': residual, 'weight': weight})
+
+
+def test_add_iteration(rei):
+    rei.add_iteration(0, residuals([1.0, 2.0, 3.0], [1.0, 1.0, 0.5]))
+    rei.add_iteration(1, residuals([0.5, 1.0, 1.5], [1.0, 1.0, 0.5]))
+    assert rei.loaded_iterations == [0, 1]
+    assert rei.residual.dtype == np.float32
+    assert np.array_equal(rei.residual, [[1.0, 2.0, 3.0], [0.5, 1.0, 1.5]])
+    assert np.array_equal(rei.modelled[1], [0.5, 1.0, 1.5])
+    # unchanged weights are stored once
+    assert rei.weight.shape == (3,)
+    assert np.array_equal(rei.weighted_residual[0], [1.0, 2.0, 1.5])
+    with pytest.raises(ValueError):
+        rei.add_iteration(1, residuals([0.0, 0.0, 0.0], [1.0, 1.0, 0.5]))
+
+
+def test_weights_that_change(rei):
+    rei.add_iteration(0, residuals([1.0, 2.0, 3.0], [1.0, 1.0, 0.5]))
+    rei.add_iteration(1, residuals([1.0, 2.0, 3.0], [2.0, 1.0, 0.5]))
+    rei.add_iteration(2, residuals([1.0, 2.0, 3.0], [2.0, 1.0, 0.5]))
+    assert np.array_equal(rei.weight, [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5],
+                                       [2.0, 1.0, 0.5]])
+    assert np.array_equal(rei.trajectory('A', values='weight').values,
+                          [1.0, 2.0, 2.0])
+
+
+def test_observations_are_aligned(rei):
+    rei.add_iteration(0, residuals([1.0, 2.0, 3.0], [1.0, 1.0, 1.0]))
+    later = residuals([4.0, 5.0, 6.0], [1.0, 1.0, 1.0]).iloc[[2, 0]]
+    rei.add_iteration(1, later)
+    assert np.array_equal(rei.residual[1, [0, 2]], [4.0, 6.0])
+    assert np.isnan(rei.residual[1, 1])
+
+
+def test_trajectory(rei, svda):
+    df = rei.trajectory(['7089222501_B', '1089192101_b'])
+    assert list(df.index) == range(1, 17)
+    assert df.index.name == 'Pest iteration'
+    for i in [1, 16]:
+        res = read_resfile('%s.rei.%d' % (svda, i))
+        assert np.allclose(df.loc[i].values, res['residual'].values[:2],
+                           rtol=1e-6)
+    modelled = rei.trajectory('7089222501_b', values='modelled')
+    assert isinstance(modelled, pd.Series)
+    assert np.allclose(modelled.values, rei.modelled[:, 0])
+    with pytest.raises(KeyError):
+        rei.trajectory('not_an_ob')
+
+
+def test_get_phi(rei, svda):
+    rei.get_phi()
+    res = read_resfile(svda + '.rei.16')
+    phi = (res['residual'] * res['weight']) ** 2
+    by_group = phi.groupby(res['group'].astype(str)).sum()
+    assert np.allclose(rei.phi_by_group.loc[16, by_group.index].values,
+                       by_group.values, rtol=1e-4)
+    regul = by_group.index.str.startswith('regul')
+    component = rei.phi_by_component.loc[16]
+    assert np.isclose(component['Measurement Phi'], by_group[~regul].sum(),
+                      rtol=1e-4)
+    assert np.isclose(component['Regularisation Phi'], by_group[regul].sum(),
+                      rtol=1e-4)
+    assert np.isclose(component['Phi Total'], phi.sum(), rtol=1e-4)
+
+
+def test_res(rei, svda):
+    res = rei.res(3)
+    expected = read_resfile(svda + '.rei.3')
+    assert list(res.df['Name']) == list(expected['name'])
+    assert np.allclose(res.df['Residual'].values, expected['residual'].values,
+                       rtol=1e-6)
+    assert np.allclose(res.df['Weight'].values, expected['weight'].values)
+
+
+def test_get_phi_after_new_iterations(svda):
+    for i in range(2, 17):
+        os.rename('%s.rei.%d' % (svda, i), '%s.tmp.%d' % (svda, i))
+    rei = Rei(svda, processes=1)
+    rei.get_phi()
+    first = rei.phi_by_component.loc[1].copy()
+    os.rename(svda + '.tmp.2', svda + '.rei.2')
+    rei.find_reifiles()
+    rei.get_phi()
+    for df in [rei.phi_by_group, rei.phi_by_type, rei.phi_by_component]:
+        assert list(df.index) == [1, 2]
+    component = rei.phi_by_component
+    assert np.allclose(component.loc[1].values, first.values)
+    assert np.allclose(component['Phi Total'].values,
+                       component['Measurement Phi'].values +
+                       component['Regularisation Phi'].values)
+    assert np.allclose(rei.phi_by_type.sum(axis=1).values,
+                       rei.phi_by_group.sum(axis=1).values)
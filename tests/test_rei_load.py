@@ -0,0 +1,61 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pest import Pest
+from pst_handler import read_resfile
+from rei import Rei, read_reis, iread_reis
+
+
+@pytest.mark.parametrize('processes', [None, 1, 2])
+def test_read_reis(svda, processes):
+    reifiles = ['%s.rei.%d' % (svda, i) for i in range(1, 6)]
+    tables = read_reis(reifiles, processes=processes)
+    assert len(tables) == 5
+    for reifile, table in zip(reifiles, tables):
+        pd.util.testing.assert_frame_equal(table, read_resfile(reifile))
+
+
+def test_iread_reis_keeps_order(svda):
+    reifiles = ['%s.rei.%d' % (svda, i) for i in [3, 1, 2]]
+    residuals = [res_df['residual'].iloc[0]
+                 for res_df in iread_reis(reifiles, processes=2)]
+    assert residuals == [read_resfile(f)['residual'].iloc[0]
+                         for f in reifiles]
+
+
+def test_rei_files(svda):
+    rei = Rei(svda)
+    assert rei.iterations == range(1, 17)
+    # the base run has no .rei in the fixture
+    assert rei.BASEPESTFILE == 'columbia.pst'
+    assert 0 not in rei.reifiles
+    assert rei.find_reifiles() == []
+
+
+def test_load_shares_the_session(svda):
+    pest = Pest(svda)
+    rei = Rei(svda, pest=pest, processes=2)
+    assert rei._Pest is pest
+    rei.load()
+    assert rei.loaded_iterations == range(1, 17)
+    last = read_resfile(svda + '.rei.16')
+    assert list(rei.obsnme) == list(last['name'])
+    assert np.allclose(rei.residual[-1], last['residual'].values, rtol=1e-6)
+    # loading again only reads new files
+    assert rei.obs_groups == pest.obs_groups
+    assert rei._Pest.pst is pest.pst
+    rei.load()
+    assert rei.loaded_iterations == range(1, 17)
+
+
+def test_load_new_files(svda):
+    rei = Rei(svda, processes=1)
+    rei.load()
+    shutil.copy(svda + '.rei.16', svda + '.rei.17')
+    assert rei.find_reifiles() == [17]
+    rei.load()
+    assert rei.loaded_iterations == range(1, 18)
+    assert np.array_equal(rei.residual[-1], rei.residual[-2])
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from pest import Pest
+from parsen import ParSen
+from pst_handler import pst as Pst, read_resfile
+from res import Res
+
+
+@pytest.fixture
+def resfile(columbia):
+    return columbia + '.res'
+
+
+def test_read_resfile(resfile):
+    res = read_resfile(resfile)
+    assert res.shape == (10489, 11)
+    assert list(res.iloc[0][['name', 'group']]) == ['7089222501_b',
+                                                    'head_best']
+    assert res['residual'].iloc[0] == 7.788813
+    assert res['weight'].dtype == np.float64
+    # memoized until the file changes
+    assert read_resfile(resfile) is res
+    open(resfile, 'a').write('\n')
+    assert read_resfile(resfile) is not res
+
+
+def test_load_resfile_is_a_copy(resfile):
+    pst = Pst(filename=None, load=False, resfile=resfile)
+    res = pst.load_resfile(resfile)
+    res.loc[res.index[0], 'residual'] = 999.0
+    res['weight'].values[1] = 5.0
+    assert read_resfile(resfile)['residual'].iloc[0] == 7.788813
+    assert read_resfile(resfile)['weight'].iloc[1] == 0.2
+    assert pst.load_resfile(resfile)['residual'].iloc[0] == 7.788813
+    assert Res(resfile).df['Residual'].iloc[0] == 7.788813
+
+
+def test_session_residuals_are_not_shared(columbia):
+    pest = Pest(columbia)
+    res = pest.res_df
+    res.loc[res.index[0], 'residual'] = 999.0
+    assert read_resfile(columbia + '.res')['residual'].iloc[0] == 7.788813
+    assert Pest(columbia).res_df['residual'].iloc[0] == 7.788813
+    parsen = ParSen(basename=columbia)
+    assert parsen.res_df['residual'].iloc[0] == 7.788813
+
+
+def test_res_does_not_modify_the_cache(resfile):
+    res = Res(resfile)
+    res.df.iloc[0, list(res.df.columns).index('Residual')] = 12345.0
+    res.df['Measured'].values[0] = 12345.0
+    assert read_resfile(resfile)['measured'].iloc[0] == 858.13
+    res.df.loc[res.df.index[0], 'Residual'] = 999.0
+    res.df['Weight'] *= 0
+    assert read_resfile(resfile)['residual'].iloc[0] == 7.788813
+    assert Res(resfile).df['Weight'].sum() > 0
@@ -0,0 +1,60 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+from conftest import random_matrix, names
+from mat_handler import jco as Jco
+from mat_handler import matrix as Matrix
+
+
+@pytest.fixture
+def dense():
+    return random_matrix(40, 6, seed=1)
+
+
+@pytest.fixture
+def sparse_jco(tmpdir, dense):
+    filename = str(tmpdir.join('test.jco'))
+    Jco(x=dense, row_names=names('o', 40),
+        col_names=names('p', 6)).to_binary(filename)
+    jco = Jco()
+    jco.from_binary(filename, sparse=True)
+    return jco
+
+
+def test_from_binary_sparse(sparse_jco, dense):
+    assert sparse_jco.issparse
+    assert sparse_jco.shape == dense.shape
+    assert np.array_equal(sparse_jco.x.toarray(), dense)
+
+
+def test_sparse_get_and_drop(sparse_jco, dense):
+    sub = sparse_jco.get(row_names=names('o', 40)[5:10],
+                         col_names=['p2', 'p3'])
+    assert sub.issparse
+    assert np.array_equal(sub.x.toarray(), dense[5:10, 2:4])
+    sparse_jco.drop(['o1', 'o2'], axis=0)
+    assert sparse_jco.issparse
+    assert np.array_equal(sparse_jco.x.toarray(),
+                          np.delete(dense, [1, 2], axis=0))
+
+
+def test_sparse_products(sparse_jco, dense):
+    jtj = sparse_jco.T * sparse_jco
+    x = jtj.x.toarray() if sp.issparse(jtj.x) else jtj.x
+    assert np.allclose(x, dense.T.dot(dense))
+    diag = Matrix(x=np.arange(1., 41.)[:, np.newaxis],
+                  row_names=names('o', 40), col_names=names('o', 40),
+                  isdiagonal=True)
+    scaled = diag * sparse_jco
+    assert scaled.issparse
+    assert np.allclose(scaled.x.toarray(),
+                       np.arange(1., 41.)[:, np.newaxis] * dense)
+
+
+def test_sparse_to_binary(tmpdir, sparse_jco, dense):
+    filename = str(tmpdir.join('sparse.jco'))
+    sparse_jco.to_binary(filename)
+    jco = Jco()
+    jco.from_binary(filename)
+    assert np.array_equal(jco.x, dense)
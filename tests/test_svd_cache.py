@@ -0,0 +1,111 @@
+import os
+import numpy as np
+import pytest
+
+from conftest import random_matrix, names
+from mat_handler import jco as Jco
+from mat_handler import svd_cache
+from pest import Pest
+
+
+@pytest.fixture
+def x():
+    return random_matrix(30, 8, seed=4, density=1.0)
+
+
+def cached_jco(x, cache):
+    jco = Jco(x=x, row_names=names('o', 30), col_names=names('p', 8))
+    jco.svd_cache = cache
+    jco.set_svd_mode('economy')
+    return jco
+
+
+def test_svd_cache_hit(tmpdir, x):
+    cache = svd_cache(str(tmpdir.join('svd')))
+    s = cached_jco(x, cache).s.x
+    assert len(cache.entries) == 1
+    hit = cached_jco(x, cache)
+    assert np.allclose(hit.s.x, s)
+    assert np.allclose(hit.u.x.dot(np.diag(s[:, 0])).dot(hit.v.x.T), x)
+    assert len(cache.entries) == 1
+
+
+def test_svd_cache_key_depends_on_contents_and_mode(tmpdir, x):
+    cache = svd_cache(str(tmpdir.join('svd')))
+    key = cache.key(x, False, 'economy')
+    assert cache.key(x.copy(), False, 'economy') == key
+    assert cache.key(x * 2.0, False, 'economy') != key
+    assert cache.key(x, False, 'full') != key
+
+
+def test_svd_cache_eviction(tmpdir, x):
+    cache = svd_cache(str(tmpdir.join('svd')), max_entries=1)
+    cached_jco(x, cache).s
+    cached_jco(x * 2.0, cache).s
+    entries = cache.entries
+    assert len(entries) == 1
+    assert not any('.tmp' in f for f in os.listdir(cache.cache_dir))
+    cache.clear()
+    assert len(cache.entries) == 0
+
+
+def test_svd_cache_id(tmpdir, x):
+    cache = svd_cache(str(tmpdir.join('svd')))
+    jco = cached_jco(x, cache)
+    jco.svd_cache_id = 'test.jco 1'
+    s = jco.s.x
+    hit = cached_jco(x * 2.0, cache)
+    hit.svd_cache_id = 'test.jco 1'
+    # keyed on the id, not the entries
+    assert np.array_equal(hit.s.x, s)
+    assert len(cache.entries) == 1
+    # the names are part of the key
+    dropped = cached_jco(x, cache)
+    dropped.drop(['o0'], axis=0)
+    dropped.svd_cache_id = 'test.jco 1'
+    assert not np.array_equal(dropped.s.x, s)
+    assert len(cache.entries) == 2
+    # changing the entries in place drops the id
+    hit *= 2.0
+    assert hit.svd_cache_id is None
+
+
+def test_svd_cache_store_race(tmpdir, x, monkeypatch):
+    cache = svd_cache(str(tmpdir.join('svd')))
+    u, s, vt = np.linalg.svd(x, full_matrices=False)
+    rename = os.rename
+
+    def rename_after_other_process(src, dst):
+        os.makedirs(dst)
+        open(os.path.join(dst, 'u.npy'), 'w').write('')
+        rename(src, dst)
+
+    monkeypatch.setattr(os, 'rename', rename_after_other_process)
+    cache.store('key', u, s, vt.T)
+    assert os.listdir(cache.cache_dir) == ['key']
+
+
+def test_pest_keeps_the_svd(columbia, monkeypatch):
+    s = Pest(columbia).qhalfx.s.x
+    cache_dir = columbia + '.svd_cache'
+    assert len(os.listdir(cache_dir)) == 1
+
+    def no_svd(self):
+        raise AssertionError('SVD recomputed')
+
+    # a new session loads the SVD from the cache
+    monkeypatch.setattr(Jco, '_matrix__compute_svd', no_svd)
+    assert np.array_equal(Pest(columbia).qhalfx.s.x, s)
+    monkeypatch.undo()
+
+    # new weights are a new entry
+    res = open(columbia + '.res').read()
+    open(columbia + '.res', 'w').write(res.replace(' 0.2000000 ',
+                                                   ' 0.3000000 ', 1))
+    assert not np.array_equal(Pest(columbia).qhalfx.s.x, s)
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_pest_without_svd_cache(columbia):
+    Pest(columbia, svd_cache=False).qhalfx.s
+    assert not os.path.exists(columbia + '.svd_cache')
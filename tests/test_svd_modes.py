@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from conftest import names
+from mat_handler import jco as Jco
+
+
+@pytest.fixture
+def x():
+    rs = np.random.RandomState(2)
+    return rs.randn(200, 30).dot(np.diag(np.logspace(0, -3, 30))).dot(
+        rs.randn(30, 30))
+
+
+def make_jco(x, sparse=False):
+    jco = Jco(x=x, row_names=names('o', 200), col_names=names('p', 30))
+    if sparse:
+        jco = Jco(x=jco.to_sparse(), row_names=names('o', 200),
+                  col_names=names('p', 30))
+    return jco
+
+
+@pytest.mark.parametrize('mode, kwargs, nsing', [
+    ('full', {}, 30),
+    ('economy', {}, 30),
+    ('economy', {'nsing': 5}, 5),
+    ('lanczos', {'nsing': 5}, 5),
+    ('randomized', {'nsing': 5, 'seed': 0}, 5)])
+def test_svd_modes(x, mode, kwargs, nsing):
+    jco = make_jco(x)
+    jco.set_svd_mode(mode, **kwargs)
+    s = np.linalg.svd(x, compute_uv=False)
+    assert np.allclose(jco.s.x[:, 0], s[:nsing], rtol=1e-6)
+    assert jco.v.shape == (30, nsing)
+    assert jco.u.shape == (200, 200 if mode == 'full' else nsing)
+
+
+@pytest.mark.parametrize('mode', ['economy', 'lanczos', 'randomized'])
+def test_svd_energy(x, mode):
+    jco = make_jco(x)
+    jco.set_svd_mode(mode, energy=0.99, seed=1)
+    s = np.linalg.svd(x, compute_uv=False)
+    k = np.searchsorted(np.cumsum(s ** 2) / np.sum(s ** 2), 0.99) + 1
+    assert jco.s.shape[0] == k
+    assert np.allclose(jco.s.x[:, 0], s[:k], rtol=1e-6)
+
+
+def test_svd_lanczos_sparse(x):
+    jco = make_jco(x, sparse=True)
+    assert jco.issparse
+    jco.set_svd_mode('lanczos', nsing=4)
+    assert np.allclose(jco.s.x[:, 0], np.linalg.svd(x, compute_uv=False)[:4])
+
+
+def test_svd_mode_arguments(x):
+    jco = make_jco(x)
+    with pytest.raises(Exception):
+        jco.set_svd_mode('full', nsing=3)
+    with pytest.raises(Exception):
+        jco.set_svd_mode('economy', energy=1.5)
+    with pytest.raises(Exception):
+        jco.set_svd_mode('qr')
@@ -0,0 +1,41 @@
+import numpy as np
+
+from conftest import random_matrix, names
+from mat_handler import jco as Jco
+
+
+def read_records(filename):
+    """Header, (index, value) records and names of a pest binary file
+    """
+    jco = Jco()
+    f = open(filename, 'rb')
+    header = np.fromfile(f, jco.binary_header_dt, 1)[0]
+    records = np.fromfile(f, jco.binary_rec_dt, header['icount'])
+    names = f.read()
+    f.close()
+    return header, records, names
+
+
+def test_to_binary_records(tmpdir):
+    x = random_matrix(5, 3, seed=2)
+    filename = str(tmpdir.join('test.jco'))
+    Jco(x=x, row_names=names('o', 5), col_names=names('p', 3)).to_binary(
+        filename)
+    header, records, block = read_records(filename)
+    assert (header['itemp1'], header['itemp2']) == (-3, -5)
+    assert header['icount'] == np.count_nonzero(x)
+    # 1-based, column-major positions of the non-zero entries
+    j = records['j'] - 1
+    assert np.array_equal(x[j % 5, j // 5], records['dtemp'])
+    assert block == ''.join(n.ljust(12) for n in names('p', 3)) + \
+        ''.join(n.ljust(20) for n in names('o', 5))
+
+
+def test_to_binary_long_names_truncated(tmpdir):
+    filename = str(tmpdir.join('long.jco'))
+    Jco(x=np.ones((2, 2)), row_names=['a' * 25, 'b'],
+        col_names=['c' * 15, 'd']).to_binary(filename)
+    jco = Jco()
+    jco.from_binary(filename)
+    assert jco.row_names == ['a' * 20, 'b']
+    assert jco.col_names == ['c' * 12, 'd']
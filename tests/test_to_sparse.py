@@ -0,0 +1,43 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+from conftest import random_matrix, names
+from mat_handler import matrix as Matrix
+
+
+@pytest.fixture
+def x():
+    x = random_matrix(25, 9, seed=6)
+    x[3, 2] = -2.5
+    return x
+
+
+@pytest.mark.parametrize('chunk_size', [1, 10, 1000000])
+def test_to_sparse(x, chunk_size):
+    mat = Matrix(x=x, row_names=names('o', 25), col_names=names('p', 9))
+    csr = mat.to_sparse(chunk_size=chunk_size)
+    assert sp.isspmatrix_csr(csr)
+    assert np.array_equal(csr.toarray(), x)
+    assert csr.nnz == np.count_nonzero(x)
+    assert csr[3, 2] == -2.5
+
+
+def test_to_sparse_trunc_on_magnitude(x):
+    mat = Matrix(x=x, row_names=names('o', 25), col_names=names('p', 9))
+    csc = mat.to_sparse(trunc=1.0, fmt='csc')
+    assert sp.isspmatrix_csc(csc)
+    assert np.array_equal(csc.toarray(), np.where(np.abs(x) > 1.0, x, 0.0))
+    sparse = Matrix(x=sp.csr_matrix(x), row_names=names('o', 25),
+                    col_names=names('p', 9))
+    assert np.array_equal(sparse.to_sparse(trunc=1.0).toarray(),
+                          csc.toarray())
+
+
+def test_to_sparse_diagonal():
+    diag = Matrix(x=np.array([[1.], [0.], [-3.]]), row_names=['a', 'b', 'c'],
+                  col_names=['a', 'b', 'c'], isdiagonal=True)
+    assert np.array_equal(diag.to_sparse().toarray(),
+                          np.diag([1., 0., -3.]))
+    with pytest.raises(Exception):
+        diag.to_sparse(fmt='coo')
@@ -0,0 +1,103 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import CC_DIR
+from pst_handler import read_parfile
+from rec_handler import rec as Rec
+from watcher import Watcher
+
+
+@pytest.fixture
+def run(tmpdir):
+    """Run folder with the control files of the SVD-assist run, but none
+    of its output yet
+    """
+    for source, target in [('Columbia_SVDA.pst', 'columbia_svda.pst'),
+                           ('Columbia.pst', 'columbia.pst')]:
+        shutil.copy(os.path.join(CC_DIR, source), str(tmpdir.join(target)))
+    return str(tmpdir.join('columbia_svda'))
+
+
+REC_TEXT = open(os.path.join(CC_DIR, 'columbia_svda.rec'), 'rb').read()
+
+
+def write_rec(basename, nbytes):
+    """Write the first nbytes of the record file, as PEST would
+    """
+    open(basename + '.rec', 'wb').write(REC_TEXT[:nbytes])
+
+
+def copy_output(basename, source, target):
+    shutil.copy(os.path.join(CC_DIR, source), basename + target)
+
+
+def test_poll(run):
+    watcher = Watcher(run, settle=0)
+    assert watcher.poll() == {'rec': [], 'rei': [], 'bpa': [], 'jco': False}
+
+    size = len(REC_TEXT)
+    write_rec(run, size // 2)
+    for i in [1, 2]:
+        copy_output(run, 'columbia_svda.rei.%d' % i, '.rei.%d' % i)
+    copy_output(run, 'columbia.bpa.1', '.bpa.1')
+    changes = watcher.poll()
+    assert len(changes['rec']) > 0
+    assert changes['rei'] == [1, 2] and changes['bpa'] == [1]
+    assert watcher.rei.loaded_iterations == [1, 2]
+    assert list(watcher.parameters.columns) == [1]
+
+    write_rec(run, size)
+    copy_output(run, 'columbia_svda.rei.3', '.rei.3')
+    copy_output(run, 'columbia.bpa', '.bpa')
+    open(run + '.jco', 'wb').write('jco')
+    changes = watcher.poll()
+    assert changes['rei'] == [3] and changes['bpa'] == [] and changes['jco']
+    assert watcher.rec_offset == size
+    assert watcher.poll() == {'rec': [], 'rei': [], 'bpa': [], 'jco': False}
+
+    # the same as parsing the finished record file at once
+    rec = Rec(run + '.rec')
+    rec.parse()
+    expected = rec.iterations['starting_phi']
+    assert np.array_equal(watcher.starting_phi.values,
+                          expected[expected.index > 0].dropna().values)
+    assert watcher.phi_by_group.shape[0] == len(watcher.starting_phi)
+    assert np.allclose(watcher.phi_by_type.sum(axis=1).values,
+                       watcher.phi_by_group.sum(axis=1).values)
+    bpa = read_parfile(os.path.join(CC_DIR, 'columbia.bpa'))['parval1']
+    assert np.array_equal(watcher.best_parameters.values, bpa.values)
+
+
+def test_files_not_settled(run):
+    watcher = Watcher(run, settle=3600)
+    copy_output(run, 'columbia_svda.rei.1', '.rei.1')
+    copy_output(run, 'columbia.bpa.1', '.bpa.1')
+    open(run + '.jco', 'wb').write('jco')
+    assert watcher.poll() == {'rec': [], 'rei': [], 'bpa': [], 'jco': False}
+    watcher.settle = 0
+    changes = watcher.poll()
+    assert changes['rei'] == [1] and changes['bpa'] == [1] and changes['jco']
+
+
+def test_restarted_record_file(run):
+    watcher = Watcher(run, settle=0)
+    size = len(REC_TEXT)
+    write_rec(run, size)
+    watcher.poll()
+    phi = watcher.starting_phi
+    write_rec(run, size // 3)
+    watcher.poll()
+    assert watcher.rec_offset <= size // 3
+    assert len(watcher.starting_phi) < len(phi)
+
+
+def test_watch(run):
+    calls = []
+    watcher = Watcher(run, settle=0)
+    copy_output(run, 'columbia_svda.rei.1', '.rei.1')
+    watcher.watch(interval=0, max_polls=3,
+                  callback=lambda w, changes: calls.append(changes['rei']))
+    assert calls == [[1]]